@@ -1,42 +1,71 @@
-import os
-from openai import OpenAI
-import dotenv
-from typing import List, Dict, Generator
+import copy
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import List, Dict, Generator, Optional, Callable, Tuple
 
-# Load environment variables
-dotenv.load_dotenv()
+from turn_scheduler import ERROR_RESPONSE, TurnScheduler, ConvergenceCheck, order_drafts
+from utils.context_window import ContextWindow
+from utils.model_routing import complete_text, create_routed_completion
+from utils.retrieval import relevant_context
+from utils.tracing import propagate
+
+logger = logging.getLogger(__name__)
+
+# Characters of each agent's initial context included in the consolidated wrap-up prompt
+WRAP_UP_CONTEXT_CHARS = 1500
+
+# Added to the message agents respond to on the final turn, or in the final round
+FINAL_TURN_PROMPT = "Now, based on the discussion, propose your unique solution that relates to your initial opinions to handle the problematic intern. You can decide to disagree with the other agents."
 
 class AIAgent:
-    def __init__(self, name: str, initial_context: str):
+    def __init__(self, name: str, initial_context: str, history_token_budget: int = 2000, keep_last_turns: int = 8,
+                 cache_responses: bool = False, context_passages: int = 4):
         """
         Initialize an AI agent with a name, and initial context.
         
         :param name: Name of the agent
         :param initial_context: Initial context or background for the agent
+        :param history_token_budget: Maximum tokens of conversation history sent with each request
+        :param keep_last_turns: Number of recent turns always sent verbatim, older ones are summarized
+        :param cache_responses: Whether identical requests may reuse a cached response instead of sampling a new one
+        :param context_passages: Passages of a long initial context retrieved for each response, see `relevant_context`
         """
-        self.client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+        self.cache_responses = cache_responses
+        self.context_passages = context_passages
         self.name = name
         self.context = initial_context
-        self.conversation_history: List[Dict] = []
+        self.history = ContextWindow(token_budget=history_token_budget, keep_last=keep_last_turns)
 
-    def generate_response(self, previous_message: str) -> str:
+    def generate_response(self, previous_message: str, on_token: Optional[Callable[[str], None]] = None) -> str:
         """
         Generate a response based on the conversation history and previous message.
         
         :param previous_message: The last message in the conversation
+        :param on_token: If set, the response is streamed and this is called with each new piece of text
         :return: Generated response from the agent
         """
+        # Keep the history within its token budget before building the prompt
+        self.history.compact(self._summarize_turns)
+        summary = [
+            {"role": "system", "content": f"Summary of the earlier discussion: {self.history.summary}"}
+        ] if self.history.summary else []
+
+        # Only send the parts of a long context that relate to the latest messages
+        query = " ".join([turn['content'] for turn in self.history.turns[-2:]] + [previous_message])
+        context = relevant_context(self.context, query, self.context_passages)
+
         # Build message list for OpenAI API with system context and conversation history
         messages = [
-            {"role": "system", "content": f"You are {self.name} personal AI Agent. You should act exactly like the team member described here : {self.context}. " 
+            {"role": "system", "content": f"You are {self.name} personal AI Agent. You should act exactly like the team member described here : {context}. " 
              "And fight for his opinions against the other ones. Provide a concise, complete thought in one sentence. Do not continue a previous sentence. "
              "Write like people speak in a meeting but in an informal way, you can joke and be sarcastic."
              "Also, don't hesitate to ask relevant questions to other agents instead of giving a thought. If you receive a question which you can't answer, just say that you will find out."
              "As the disscussion progresses, you need to come up with what you think is the best thing to do."},
-        ] + [
+        ] + summary + [
             {"role": "user" if msg['sender'] != self.name else "assistant", 
              "content": msg['content']} 
-            for msg in self.conversation_history
+            for msg in self.history.turns
         ] + [
             {"role": "user", "content": f"Previous context: {previous_message}. " 
              "Provide your perspective or question in a single sentence."}
@@ -44,17 +73,46 @@ class AIAgent:
 
         try:
             # Call OpenAI API to generate response
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
+            return complete_text(
+                "generate_response",
+                on_token=on_token,
                 messages=messages,
-                max_tokens=100,
+                cache=self.cache_responses,
                 temperature=0.7
+            ).strip()
+        except Exception as e:
+            logger.error("Error generating response for %s: %s", self.name, e)
+            return f"{ERROR_RESPONSE}: {e}"
+
+    def _summarize_turns(self, summary: str, turns: List[Dict]) -> Optional[str]:
+        """
+        Fold conversation turns into the running summary of the discussion.
+        
+        The prompt doesn't depend on the agent, so every agent produces the same summary of the shared discussion.
+        
+        :param summary: Current summary, empty if there is none yet
+        :param turns: Turns to fold into the summary, oldest first
+        :return: Updated summary, or None if summarizing failed
+        """
+        transcript = "\n".join(f"{turn['sender']}: {turn['content']}" for turn in turns)
+        messages = [
+            {"role": "system", "content": "You keep a running summary of a meeting discussion. Keep who said what, the open questions and the proposals made."},
+            {"role": "user", "content": f"Current summary: {summary or 'None yet.'}\n\nNew messages:\n{transcript}\n\n"
+             "Write the updated summary in at most 150 words."}
+        ]
+
+        try:
+            response = create_routed_completion(
+                "summarize_history",
+                cache=True,
+                messages=messages,
+                temperature=0
             )
-            
             return response.choices[0].message.content.strip()
         except Exception as e:
-            print(f"Error generating response for {self.name}: {e}")
-            return f"I encountered an error: {e}"
+            # Keep the turns verbatim rather than losing them
+            logger.error("Error summarizing history for %s: %s", self.name, e)
+            return None
 
     def add_to_history(self, sender: str, content: str) -> None:
         """
@@ -63,71 +121,256 @@ class AIAgent:
         :param sender: Name of the message sender
         :param content: Content of the message
         """
-        self.conversation_history.append({
-            'sender': sender,
-            'content': content
-        })
+        self.history.add(sender, content)
+
+def _response_or_error(agent: AIAgent, future: Future) -> str:
+    """
+    Wait for a response generated in the background, in the same format as a failed `generate_response`.
+    
+    :param agent: Agent the response was generated for
+    :param future: Future running `agent.generate_response`
+    :return: Generated response, or an error message if the call raised
+    """
+    try:
+        return future.result()
+    except Exception as e:
+        logger.error("Error generating response for %s: %s", agent.name, e)
+        return f"{ERROR_RESPONSE}: {e}"
 
-def start_discussion(agents: List[AIAgent], initial_prompt: str, max_turns: int = 5) -> Generator[Dict, None, None]:
+def _consolidated_wrap_up(agents: List[AIAgent], initial_prompt: str, transcript: List[Dict]) -> Tuple[str, Dict[str, str]]:
+    """
+    Extract the shared summary and every agent's preparation plan from the transcript in a single JSON call.
+    
+    :param agents: Agents that took part in the discussion
+    :param initial_prompt: Topic of the discussion
+    :param transcript: Responses of the discussion, as yielded by `start_discussion`
+    :return: The three directions as bullet points, and the preparation plans of the agents it could produce one for, by name
+    :raises ValueError: If the response has no valid list of three directions
+    """
+    names = [agent.name for agent in agents]
+    roles = "\n".join(f"- {agent.name}: {agent.context[:WRAP_UP_CONTEXT_CHARS]}" for agent in agents)
+    discussion = "\n".join(f"{entry['agent_name']}: {entry['response']}" for entry in transcript)
+    messages = [
+        {"role": "system", "content": "You wrap up a discussion between AI agents, each representing a team member, ahead of the real meeting. Answer in JSON."},
+        {"role": "user", "content": f"Topic: {initial_prompt}\n\nParticipants and their perspectives:\n{roles}\n\nDiscussion:\n{discussion}\n\n"
+         "Return a JSON object with two keys. \"directions\": a list of exactly three very short directions to solve the problem. "
+         "\"preparations\": an object with one key per participant, using exactly these names: "
+         f"{json.dumps(names)}. Each value is the one point this participant should prepare for the real meeting, in a short sentence "
+         "that focuses on their role and addresses them directly as you."}
+    ]
+
+    response = create_routed_completion(
+        "wrap_up",
+        cache=True,
+        messages=messages,
+        max_tokens=150 + 80 * len(agents),
+        temperature=0,
+        response_format={"type": "json_object"}
+    )
+    result = json.loads(response.choices[0].message.content)
+
+    directions = result.get("directions") if isinstance(result, dict) else None
+    if not isinstance(directions, list) or len(directions) != 3 or not all(isinstance(d, str) and d.strip() for d in directions):
+        raise ValueError(f"Expected three directions, got {directions!r}")
+    summary = "\n".join(f"- {direction.strip()}" for direction in directions)
+
+    # Only keep plans for actual participants, the others fall back to asking their agent
+    preparations = result.get("preparations")
+    if not isinstance(preparations, dict):
+        preparations = {}
+    preparations = {
+        name: preparations[name].strip() for name in names
+        if isinstance(preparations.get(name), str) and preparations[name].strip()
+    }
+    return summary, preparations
+
+def start_discussion(agents: List[AIAgent], initial_prompt: str, max_turns: int = 5, max_concurrency: int = 4,
+                     scheduler: Optional[TurnScheduler] = None,
+                     convergence: Optional[ConvergenceCheck] = None,
+                     consolidated_wrap_up: bool = False,
+                     checkpoint: Optional[Dict] = None,
+                     on_checkpoint: Optional[Callable[[Dict], None]] = None,
+                     parallel_rounds: bool = False) -> Generator[Dict, None, None]:
     """
     Facilitate a discussion between multiple AI agents and collect their summaries and preparations.
     
-    :param agents: List of AI agents participating in the discussion
+    The discussion can be checkpointed after every item the caller has consumed, and resumed from
+    the last checkpoint: items yielded before it are not yielded again, and no call is repeated.
+    
+    In parallel rounds, every agent drafts a response to the same discussion at once, and the drafts
+    are ordered by the scheduler, dropping near-duplicates, before they are yielded one turn each.
+    In the final round every agent proposes a solution, which may take the discussion up to
+    `len(agents) - 1` turns past `max_turns`.
+    
+    :param agents: List of AI agents participating in the discussion, with unique names
     :param initial_prompt: Starting topic or question
     :param max_turns: Maximum number of conversation turns
+    :param max_concurrency: Maximum number of summary and preparation calls running at once
+    :param scheduler: Picks who speaks each turn, round-robin by default
+    :param convergence: If set, the discussion skips to the final turn once this check fires
+    :param consolidated_wrap_up: Extract the summary and all preparation plans in a single call, asking each agent only for what it didn't produce
+    :param checkpoint: Checkpoint to resume from, as passed to `on_checkpoint`. The agents must be the same, in the same order
+    :param on_checkpoint: Called with a JSON-serializable checkpoint once each yielded item has been handled
+    :param parallel_rounds: Draft the responses of each round concurrently instead of one turn after the other
     :return: Generator yielding discussion responses, a shared summary, and individual preparation plans.
     """
-    current_message = initial_prompt
-    current_speaker_index = 0
+    scheduler = scheduler or TurnScheduler()
+    names = [agent.name for agent in agents]
+    if len(set(names)) != len(names):
+        # Turns, drafts and wrap-up items are matched to agents by name
+        raise ValueError(f"Agent names must be unique, got {names}")
+    if checkpoint is None:
+        checkpoint = {
+            'next_turn': 0,
+            'final_turn': max_turns - 1,
+            'current_message': initial_prompt,
+            'transcript': [],
+            'wrap_up': None,
+            'delivered': 0,
+            'pending': []
+        }
+    else:
+        checkpoint = copy.deepcopy(checkpoint)
+        for agent, history in zip(agents, checkpoint['histories']):
+            agent.history = ContextWindow.from_dict(history)
+    transcript = checkpoint['transcript']
+
+    def save():
+        if on_checkpoint is not None:
+            checkpoint['histories'] = [agent.history.to_dict() for agent in agents]
+            on_checkpoint(checkpoint)
 
     # Main discussion loop
-    for turn in range(max_turns):
-        current_agent = agents[current_speaker_index]
-        
-        # On final turn, prompt agents for solution proposals
-        if turn == max_turns - 1:
-            specific_prompt = "Now, based on the discussion, propose your unique solution that relates to your initial opinions to handle the problematic intern. You can decide to disagree with the other agents."
-            current_message += f" {specific_prompt}"
+    while checkpoint['next_turn'] <= checkpoint['final_turn'] or checkpoint.get('pending'):
+        turn = checkpoint['next_turn']
+        if parallel_rounds:
+            if not checkpoint.get('pending'):
+                checkpoint['pending'] = _draft_round(agents, checkpoint, transcript, scheduler, max_concurrency)
+                save()
+            response_dict = checkpoint['pending'][0]
+        else:
+            current_agent = agents[scheduler.next_speaker(names, transcript)]
+            current_message = checkpoint['current_message']
             
-        response = current_agent.generate_response(current_message)
-        
-        response_dict = {
-            'turn': turn,
-            'agent_name': current_agent.name,
-            'response': response
-        }
+            # On final turn, prompt agents for solution proposals
+            if turn == checkpoint['final_turn']:
+                current_message += f" {FINAL_TURN_PROMPT}"
+                
+            response_dict = {
+                'turn': turn,
+                'agent_name': current_agent.name,
+                'response': current_agent.generate_response(current_message)
+            }
         
         yield response_dict
+        transcript.append(response_dict)
 
         # Update all agents' conversation histories
         for agent in agents:
-            agent.add_to_history(current_agent.name, response)
+            agent.add_to_history(response_dict['agent_name'], response_dict['response'])
+
+        checkpoint['current_message'] = response_dict['response']
+        checkpoint['next_turn'] = turn + 1
+        if parallel_rounds:
+            checkpoint['pending'].pop(0)
+
+        # Once the agents converged, go straight to the solution proposals. Drafts dropped as repeats
+        # never reach the transcript, so they count as converging too
+        if (turn < checkpoint['final_turn'] and not checkpoint.get('pending') and convergence is not None
+                and (checkpoint.get('repeated') or convergence.converged(transcript, len(agents)))):
+            checkpoint['final_turn'] = turn + 1
+        save()
+
+    if checkpoint['wrap_up'] is None:
+        checkpoint['wrap_up'] = _wrap_up(agents, initial_prompt, transcript, max_concurrency, consolidated_wrap_up)
+        save()
+
+    # Share summary with all agents, then individual preparation plans, in the same order as the agents
+    summary = f"We discussed extensively with the other AI agents and came up with the following three directions:\n{checkpoint['wrap_up']['summary']}"
+    items = [{'agent_name': agent.name, 'summary': summary} for agent in agents] + [
+        {'agent_name': agent.name, 'preparation': preparation}
+        for agent, preparation in zip(agents, checkpoint['wrap_up']['preparations'])
+    ]
+    for index in range(checkpoint['delivered'], len(items)):
+        yield items[index]
+        checkpoint['delivered'] = index + 1
+        save()
+
+def _draft_round(agents: List[AIAgent], checkpoint: Dict, transcript: List[Dict], scheduler: TurnScheduler,
+                 max_concurrency: int) -> List[Dict]:
+    """
+    Have every agent draft a response to the discussion at once, and pick the ones entering the transcript.
+    
+    The round is the final one if it reaches the final turn: the agents then propose their solutions,
+    and the final turn moves to the round's last response.
+    
+    :param agents: Agents taking part in the discussion
+    :param checkpoint: Checkpoint of the discussion before the round
+    :param transcript: Responses so far
+    :param scheduler: Orders the drafts
+    :param max_concurrency: Maximum number of drafts generated at once
+    :return: Response dicts of the round, in order, with their turns
+    """
+    final = checkpoint['next_turn'] + len(agents) > checkpoint['final_turn']
+    message = checkpoint['current_message'] + (f" {FINAL_TURN_PROMPT}" if final else "")
 
-        current_message = response
-        current_speaker_index = (current_speaker_index + 1) % len(agents)
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        futures = [executor.submit(propagate(agent.generate_response), message) for agent in agents]
+        drafts = [
+            {'agent_name': agent.name, 'response': _response_or_error(agent, future)}
+            for agent, future in zip(agents, futures)
+        ]
 
-    # Generate shared discussion summary
+    # Every agent's proposal is kept, even if it resembles another. Error fallbacks are always kept, so
+    # only repeated responses count as converging
+    selected = order_drafts(drafts, transcript, [agent.name for agent in agents], scheduler, drop_duplicates=not final)
+    checkpoint['repeated'] = len(selected) < len(drafts)
+    if final:
+        checkpoint['final_turn'] = checkpoint['next_turn'] + len(selected) - 1
+    return [{'turn': checkpoint['next_turn'] + offset, **draft} for offset, draft in enumerate(selected)]
+
+def _wrap_up(agents: List[AIAgent], initial_prompt: str, transcript: List[Dict], max_concurrency: int, consolidated: bool) -> Dict:
+    """
+    Generate the shared summary and the preparation plans of a finished discussion.
+    
+    :param agents: Agents that took part in the discussion
+    :param initial_prompt: Topic of the discussion
+    :param transcript: Responses of the discussion, as yielded by `start_discussion`
+    :param max_concurrency: Maximum number of summary and preparation calls running at once
+    :param consolidated: Try a single call for everything first, see `_consolidated_wrap_up`
+    :return: Dict with the summary, and the preparation plans in the same order as the agents
+    """
     summary_prompt = (
         "Based on the discussion with the other AI agents, extract three directions to solve the problem. Output them in three very short bullet points. Do not add anything else to the output."
     )
-    shared_summary = agents[0].generate_response(summary_prompt)
+    preparation_prompt = (
+        "Based on the discussion with the other AI agents, extract the one point your owner should prepare for the real meeting. Output it in a short sentence."
+        "Focus on your role and what is expected from you."
+        "Adress yourself directly to your owner as you."
+    )
 
-    # Share summary with all agents
-    for agent in agents:
-        yield {
-            'agent_name': agent.name,
-            'summary': f"We discussed extensively with the other AI agents and came up with the following three directions:\n{shared_summary}"
-        }
+    shared_summary = None
+    preparations = {}
+    if consolidated:
+        try:
+            shared_summary, preparations = _consolidated_wrap_up(agents, initial_prompt, transcript)
+        except Exception as e:
+            logger.warning("Consolidated wrap-up failed, asking each agent instead: %s", e)
+
+    # The summary and the preparation plans don't depend on each other, so generate them concurrently
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        summary_future = executor.submit(propagate(agents[0].generate_response), summary_prompt) if shared_summary is None else None
+        preparation_futures = [
+            executor.submit(propagate(agent.generate_response), preparation_prompt) if agent.name not in preparations else None
+            for agent in agents
+        ]
 
-    # Generate individual preparation plans
-    for agent in agents:
-        preparation_prompt = (
-            "Based on the discussion with the other AI agents, extract the one point your owner should prepare for the real meeting. Output it in a short sentence."
-            "Focus on your role and what is expected from you."
-            "Adress yourself directly to your owner as you."
-        )
-        preparation = agent.generate_response(preparation_prompt)
-        yield {
-            'agent_name': agent.name,
-            'preparation': preparation
+        if summary_future is not None:
+            shared_summary = _response_or_error(agents[0], summary_future)
+        return {
+            'summary': shared_summary,
+            'preparations': [
+                preparations[agent.name] if future is None else _response_or_error(agent, future)
+                for agent, future in zip(agents, preparation_futures)
+            ]
         }
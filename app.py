@@ -1,34 +1,115 @@
 import os
+import logging
 from slack_bolt import App
 from slack_sdk.errors import SlackApiError
 from slack_bolt.adapter.flask import SlackRequestHandler
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from dotenv import load_dotenv
+
+# Load environment variables from .env file, before the modules below read their settings
+load_dotenv()
+
 from leader_discussion import LeadershipDiscussionBot
 from team_member_discussion import TeamMemberDiscussionBot
-from agents import *
-from utils.transcribe_voice_input import process_speech_bytes_to_text
+from agents import AIAgent, start_discussion
+from utils.transcribe_voice_input import process_speech_bytes_to_text, extension_for_mimetype
 from utils.extract_text_from_pdf import extract_text_from_pdf_url
+from utils.job_queue import KeyedJobQueue, JobQueueFull
+from utils.session_store import StaleStateError, create_session_store
+from utils.artifact_store import get_artifact_store
+from utils.transcript_log import get_transcript_log
+from utils.slack_streaming import SlackMessageStream
+from utils.slack_directory import SlackDirectory
+from utils.slack_delivery import RateLimitedSlackClient, deliver_concurrently
+from utils.event_dedup import create_event_deduplicator
+from utils.discussion_checkpoints import DiscussionCheckpoints
+from meeting import Meeting
+from turn_scheduler import SCHEDULERS, ConvergenceCheck
+from utils import metrics
+from utils.tracing import configure_logging, propagate, set_trace_id, trace
+from utils.prewarm import prewarm
+from concurrent.futures import ThreadPoolExecutor
 import re
-import glob
+import threading
+import time
+import uuid
 
-# Load environment variables from .env file
-load_dotenv()
+# Log with the meeting's trace ID in every line
+configure_logging()
+logger = logging.getLogger(__name__)
 
 # Initialize the Slack app with authentication tokens
+# Listeners only enqueue work, so they can run before the response and ack right away
 app = App(
     token=os.getenv("SLACK_BOT_TOKEN"),
-    signing_secret=os.getenv("SLACK_SIGNING_SECRET")
+    signing_secret=os.getenv("SLACK_SIGNING_SECRET"),
+    process_before_response=True
 )
 
-# Dictionary to track conversation state for each user
-user_state = {}
+# Conversation state for each user, shared by every worker process
+sessions = create_session_store()
+
+# Checkpoints of running agent discussions, so a discussion interrupted by a crash resumes where it stopped
+checkpoints = DiscussionCheckpoints(sessions, lease=float(os.getenv("CONVERGE_DISCUSSION_LEASE", "300")))
+RESUME_INTERVAL = float(os.getenv("CONVERGE_RESUME_INTERVAL", "60"))
+
+# Artifacts and transcripts of meetings nobody touched within the retention period are dropped every PRUNE_INTERVAL seconds
+ARTIFACT_RETENTION = float(os.getenv("CONVERGE_ARTIFACT_RETENTION_DAYS", "30")) * 86400
+TRANSCRIPT_COMPRESS_AFTER = float(os.getenv("CONVERGE_TRANSCRIPT_COMPRESS_DAYS", "2")) * 86400
+PRUNE_INTERVAL = float(os.getenv("CONVERGE_PRUNE_INTERVAL", "3600"))
+
+# Identifies this process when it claims a discussion
+WORKER_ID = uuid.uuid4().hex
+
+# Slack client used by background steps, throttled to Slack's per-method rate limits
+slack = RateLimitedSlackClient(app.client)
+
+# Number of team members a report is delivered to at once
+DELIVERY_WORKERS = int(os.getenv("CONVERGE_DELIVERY_WORKERS", "8"))
+
+# Cached user names, DM channels and bot user ID
+directory = SlackDirectory(slack, ttl=float(os.getenv("CONVERGE_DIRECTORY_TTL", "3600")))
+
+# Attachments are processed on a shared pool, with a time and size limit for each. Work still running at
+# the time limit is stopped, so slow downloads don't hold on to the workers
+attachment_executor = ThreadPoolExecutor(max_workers=int(os.getenv("CONVERGE_ATTACHMENT_WORKERS", "4")))
+ATTACHMENT_TIMEOUT = float(os.getenv("CONVERGE_ATTACHMENT_TIMEOUT", "120"))
+MAX_ATTACHMENT_BYTES = int(os.getenv("CONVERGE_MAX_ATTACHMENT_BYTES", str(50 * 1024 * 1024)))
+
+# Minimum seconds between two edits of a streamed message in the same channel
+STREAM_UPDATE_INTERVAL = float(os.getenv("CONVERGE_STREAM_UPDATE_INTERVAL", "1.0"))
+
+# Who speaks each turn of the agent discussion, and whether it ends early once the agents converge
+TURN_SCHEDULER = os.getenv("CONVERGE_TURN_SCHEDULER", "round_robin")
+EARLY_STOP = os.getenv("CONVERGE_EARLY_STOP", "0") == "1"
+
+# Extract the discussion summary and every preparation plan in one call, instead of one per agent
+CONSOLIDATED_WRAP_UP = os.getenv("CONVERGE_CONSOLIDATED_WRAP_UP", "0") == "1"
+
+# Draft each round of the agent discussion concurrently, instead of one turn after the other
+PARALLEL_ROUNDS = os.getenv("CONVERGE_PARALLEL_ROUNDS", "0") == "1"
+
+# Bot classes by the type recorded in their serialized state
+BOT_CLASSES = {
+    "leadership": LeadershipDiscussionBot,
+    "team_member": TeamMemberDiscussionBot,
+}
+
+# Recently seen event IDs, shared by every worker process
+events = create_event_deduplicator()
+
+# Background workers running conversation steps, one step at a time per user
+job_queue = KeyedJobQueue(
+    max_workers=int(os.getenv("CONVERGE_WORKERS", "8")),
+    max_pending=int(os.getenv("CONVERGE_MAX_PENDING_JOBS", "100"))
+)
+metrics.Gauge("converge_job_queue_pending", "Conversation steps queued or running", lambda: job_queue.pending)
 
 @app.event("message")
 def handle_message_events(body, say, client):
     """
     Main message event handler for Slack messages.
-    Processes incoming messages, manages conversation flow, and coordinates AI agents.
+    Filters incoming messages and queues them for processing, so Slack gets its ack immediately.
     
     Args:
         body: Message event payload from Slack
@@ -44,6 +125,26 @@ def handle_message_events(body, say, client):
     if "event" not in body or "user" not in body["event"] or not body["event"]["user"]:
         return
 
+    # Slack re-delivers events it thinks we missed, only process each message once
+    if events.is_duplicate(body.get("event_id"), body["event"].get("client_msg_id")):
+        logger.info("Skipping duplicate event %s", body.get("event_id"))
+        return
+
+    try:
+        job_queue.submit(body["event"]["user"], process_message_event, body, slack)
+    except JobQueueFull as e:
+        logger.warning("Rejecting message, job queue is full: %s", e)
+        say("I'm handling a lot of conversations right now, please send your message again in a minute.")
+
+def process_message_event(body, client):
+    """
+    Process a queued Slack message.
+    Manages conversation flow and coordinates AI agents. Runs on a background worker.
+    
+    Args:
+        body: Message event payload from Slack
+        client: Slack client instance
+    """
     #print(body["event"])
     user_id = body["event"]["user"]
     text = body["event"]["text"].lower().strip()
@@ -51,208 +152,432 @@ def handle_message_events(body, say, client):
 
     # Process any attached audio or PDF files
     if 'files' in body["event"] and body["event"]["files"]:
-        for file in body["event"]["files"]:
-            if "audio" in file["mimetype"]:
-                headers = {
-                    'Authorization': f'Bearer {os.getenv("SLACK_BOT_TOKEN")}'
-                }
+        attachments, skipped = process_attachments(body["event"]["files"])
+        text += attachments
+
+        if skipped:
+            client.chat_postMessage(
+                channel=body["event"]["channel"],
+                text=f"I couldn't read {', '.join(skipped)}, so I'll continue without them.",
+                thread_ts=thread_ts
+            )
+
+    # Load or initialize state for this user
+    state = load_session(user_id)
+    if state is None:
+        user_name = directory.real_name(user_id)
+        state = {"step": None, "bot": None, "conversation": None, "real_name": user_name, "thread_ts": None, "meeting_id": None}
+
+    # Every log line and metric of this step is attributed to the user's meeting
+    step = state["step"] or "new"
+    with trace(state["meeting_id"]):
+        try:
+            with metrics.STEP_DURATION.time(step=step):
+                advance_conversation(user_id, state, text, thread_ts, client)
+        except Exception:
+            metrics.STEP_ERRORS.inc(step=step)
+            raise
+        finally:
+            try:
+                save_session(user_id, state)
+            except StaleStateError:
+                # Another worker moved the user on meanwhile, e.g. by inviting them to a meeting
+                logger.warning("State of user %s changed during step %s, discarding the step's changes", user_id, step)
+
+def process_attachment(file, deadline=None):
+    """
+    Extract the text of an attached audio or PDF file.
+    
+    Args:
+        file: File object from the Slack message event
+        deadline: `time.monotonic()` time to give up at, stopping the download and processing
         
-                transcript = process_speech_bytes_to_text(
-                    file_type='m4a',
-                    url=file['url_private_download'],
-                    headers=headers
-                )
-                text += f'{transcript} '
-            elif "pdf" in file["mimetype"]:
-                headers = {
-                    'Authorization': f'Bearer {os.getenv("SLACK_BOT_TOKEN")}'
-                }
+    Returns:
+        The transcript or document text, or an empty string for other file types
+    """
+    headers = {
+        'Authorization': f'Bearer {os.getenv("SLACK_BOT_TOKEN")}'
+    }
+
+    if "audio" in file["mimetype"]:
+        return process_speech_bytes_to_text(
+            file_type=extension_for_mimetype(file["mimetype"]),
+            content_type=file["mimetype"],
+            url=file['url_private_download'],
+            headers=headers,
+            file_id=file.get("id"),
+            max_bytes=MAX_ATTACHMENT_BYTES,
+            deadline=deadline
+        )
+    elif "pdf" in file["mimetype"]:
+        return extract_text_from_pdf_url(file["url_private_download"], headers, file_id=file.get("id"), deadline=deadline)
+    return ""
+
+def process_attachments(files):
+    """
+    Extract the text of a message's attachments concurrently.
+    
+    Args:
+        files: File objects from the Slack message event
         
-                text += f'{extract_text_from_pdf_url(file["url_private_download"], headers)} '
+    Returns:
+        The attachments' text joined in their original order, and the names of the
+        attachments skipped for being too large, too slow or failing
+    """
+    skipped = []
+    futures = []
+    for file in files:
+        if file.get("size", 0) > MAX_ATTACHMENT_BYTES:
+            logger.warning("Skipping attachment %s: %s bytes", file.get("name"), file.get("size"))
+            skipped.append(file.get("name", "an attachment"))
+        else:
+            deadline = time.monotonic() + ATTACHMENT_TIMEOUT
+            futures.append((file, deadline, attachment_executor.submit(propagate(process_attachment), file, deadline)))
 
-    # Initialize state for new users
-    if user_id not in user_state:
-        user_info = client.users_info(user=user_id)
-        user_name = user_info["user"]["real_name"] 
-        user_state[user_id] = {"step": None, "bot": None, "conversation": None, "real_name": user_name, "thread_ts": None}
+    text = ""
+    for file, deadline, future in futures:
+        try:
+            result = future.result(timeout=max(0, deadline - time.monotonic()))
+        except Exception as e:
+            future.cancel()
+            logger.error("Error processing attachment %s: %r", file.get("name"), e)
+            skipped.append(file.get("name", "an attachment"))
+            continue
+        if result:
+            text += f'{result} '
+
+    return text, skipped
+
+def load_session(user_id):
+    """
+    Read a user's conversation state from the session store.
+    
+    Args:
+        user_id: Slack user ID
+        
+    Returns:
+        The state dict with a live bot object, or None for unknown users
+    """
+    state = sessions.get(user_id)
+    if state is not None and state["bot"] is not None:
+        state["bot"] = BOT_CLASSES[state["bot"]["type"]].from_dict(state["bot"])
+    return state
 
-    # Get or create DM conversation with user
-    if user_state[user_id]['conversation'] is None:
-        conversations = client.conversations_list(types="im")["channels"]
-        user_conversation = next((conv for conv in conversations if conv["user"] == user_id), None)
+def save_session(user_id, state):
+    """
+    Write a user's conversation state to the session store, unless it changed since it was loaded.
+    
+    Args:
+        user_id: Slack user ID
+        state: State dict as returned by `load_session`. Its version is bumped
         
-        if user_conversation:
-            user_state[user_id]['conversation'] = user_conversation['id']
-        else:
-            ch = client.conversations_open(users=[user_id])
-            user_state[user_id]['conversation'] = ch['channel']['id']
+    Raises:
+        StaleStateError: If another worker saved the user's state since it was loaded
+    """
+    bot = state["bot"].to_dict() if state["bot"] is not None else None
+    version = state.get("version", 0)
+
+    def apply(current):
+        if current is not None and current.get("version", 0) != version:
+            raise StaleStateError(f"State of user {user_id} changed since it was loaded")
+        return {**state, "bot": bot, "version": version + 1}
+
+    sessions.update(user_id, apply)
+    state["version"] = version + 1
+
+def update_meeting(meeting_id, change):
+    """
+    Atomically change a meeting stored in the session store.
     
-    if user_state[user_id]['thread_ts'] is None:
-        user_state[user_id]['thread_ts'] = thread_ts
+    Args:
+        meeting_id: ID of the meeting
+        change: Called with the live Meeting object, may modify it in place
+        
+    Returns:
+        The updated Meeting and the value returned by `change`
+    """
+    result = None
+
+    def apply(data):
+        nonlocal result
+        meeting = Meeting.from_dict(data)
+        result = change(meeting)
+        return meeting.to_dict()
+
+    meeting = Meeting.from_dict(sessions.update(f"meeting:{meeting_id}", apply))
+    return meeting, result
+
+def stream_reply(client, state, generate):
+    """
+    Post a bot reply to a user, streaming it into a placeholder message as it is generated.
+    
+    Args:
+        client: Slack client instance
+        state: The user's conversation state
+        generate: Called with a callback receiving each new piece of text, returns the full text or None on error
+        
+    Returns:
+        The generated text, or None if generating it failed
+    """
+    stream = SlackMessageStream(
+        client,
+        channel=state['conversation'],
+        thread_ts=state['thread_ts'],
+        min_interval=STREAM_UPDATE_INTERVAL,
+        username=f"{state['real_name']} Agent",
+        icon_emoji=":robot_face:"
+    )
+    text = generate(on_token=stream.append)
+    stream.finish(text)
+    return text
+
+def advance_conversation(user_id, state, text, thread_ts, client):
+    """
+    Run the next step of a user's conversation flow, updating `state` in place.
+    
+    Args:
+        user_id: Slack user ID of the sender
+        state: The sender's conversation state
+        text: Message text, including transcribed attachments
+        thread_ts: Thread of the incoming message
+        client: Slack client instance
+    """
+    # Get or create DM conversation with user
+    if state['conversation'] is None:
+        state['conversation'] = directory.dm_channel(user_id)
+    
+    if state['thread_ts'] is None:
+        state['thread_ts'] = thread_ts
 
     # Start new conversation flow
-    if user_state[user_id]["step"] is None:
-        user_state[user_id]["step"] = "start_conversation"
+    if state["step"] is None:
+        state["step"] = "start_conversation"
 
-        user_state[user_id]["bot"] = LeadershipDiscussionBot()
+        # The leader starts a new meeting, which scopes every report written for it
+        state["meeting_id"] = uuid.uuid4().hex
+        set_trace_id(state["meeting_id"])
+        state["bot"] = LeadershipDiscussionBot(meeting_id=state["meeting_id"], participant=user_id)
         
         client.chat_postMessage(
-            channel=user_state[user_id]['conversation'],
+            channel=state['conversation'],
             text="Please describe the situation and decision you need help with. Include context, key concerns, and any initial thoughts.",
-            thread_ts=user_state[user_id]['thread_ts'],
-            username=f"{user_state[user_id]["real_name"]} Agent",
+            thread_ts=state['thread_ts'],
+            username=f"{state['real_name']} Agent",
             icon_emoji=":robot_face:"
         )
         return
     
-    elif user_state[user_id]["step"] == "start_conversation":
-        user_state[user_id]["step"] = "ask_clarifying_questions"
+    elif state["step"] == "start_conversation":
+        state["step"] = "ask_clarifying_questions"
 
-        user_state[user_id]["bot"].collect_initial_situation(text)
-
-        ai_message = user_state[user_id]["bot"].ask_clarifying_questions()
-        client.chat_postMessage(
-            channel=user_state[user_id]['conversation'],
-            text=ai_message,
-            thread_ts=user_state[user_id]['thread_ts'],
-            username=f"{user_state[user_id]["real_name"]} Agent",
-            icon_emoji=":robot_face:"
-        )
+        state["bot"].collect_initial_situation(text)
 
+        stream_reply(client, state, state["bot"].ask_clarifying_questions)
         return
 
-    elif user_state[user_id]["step"] == "ask_clarifying_questions":
-        user_state[user_id]["step"] = "generate_final_report"
+    elif state["step"] == "ask_clarifying_questions":
+        state["step"] = "generate_final_report"
 
-        user_state[user_id]["bot"].handle_clarifying_response(text)
+        state["bot"].handle_clarifying_response(text)
 
         client.chat_postMessage(
-            channel=user_state[user_id]['conversation'],
+            channel=state['conversation'],
             text="Who do you want to include in the meeting?",
-            thread_ts=user_state[user_id]['thread_ts'],
-            username=f"{user_state[user_id]["real_name"]} Agent",
+            thread_ts=state['thread_ts'],
+            username=f"{state['real_name']} Agent",
             icon_emoji=":robot_face:"
         )
         return
 
-    elif user_state[user_id]["step"] == "generate_final_report":
+    elif state["step"] == "generate_final_report":
         # Extract mentioned users and filter out the bot
         mentioned_users = re.findall(r"<@([a-zA-Z0-9]+)>", text)
-        bot_user_id = client.auth_test()['user_id']
+        bot_user_id = directory.bot_user_id()
         mentioned_users = [user.strip().upper() for user in mentioned_users if user != bot_user_id] + [user_id]
+        directory.prefetch(mentioned_users)
 
-        report = user_state[user_id]["bot"].generate_final_report()
+        report = state["bot"].generate_final_report()
+
+        # Register everyone before the invitations go out, so early replies find the meeting
+        meeting = Meeting(state["meeting_id"], leader_id=user_id)
+        for member in dict.fromkeys(mentioned_users):
+            if member == user_id:
+                meeting.add_participant(user_id, state["real_name"], state["conversation"], state["thread_ts"])
+            else:
+                meeting.add_participant(member, directory.real_name(member), directory.dm_channel(member))
+        sessions.put(f"meeting:{meeting.meeting_id}", meeting.to_dict())
 
         client.chat_postMessage(
-            channel=user_state[user_id]['conversation'],
+            channel=state['conversation'],
             text="Thanks, the report was saved and shared with the team.",
-            thread_ts=user_state[user_id]['thread_ts'],
-            username=f"{user_state[user_id]["real_name"]} Agent",
+            thread_ts=state['thread_ts'],
+            username=f"{state['real_name']} Agent",
             icon_emoji=":robot_face:"
         )
 
-        # Share report with all mentioned users
-        for user in mentioned_users:
-            try:
-                target_user_id = user
-                dm_channel = client.conversations_open(users=[target_user_id], return_im=True)
+        def invite(target_user_id):
+            """Move a team member to the meeting and send them the report."""
+            dm_channel = directory.dm_channel(target_user_id)
+            user_name = directory.real_name(target_user_id)
 
+            def join(target_state):
                 # Initialize state for new target users
-                if target_user_id not in user_state:
-                    user_info = client.users_info(user=target_user_id)
-                    user_name = user_info["user"]["real_name"] 
-                    conv = dm_channel['channel']['id']
-                    user_state[target_user_id] = {"step": None, "bot": None, "conversation": conv, "real_name": user_name, "thread_ts": None}
-                user_state[target_user_id]["step"] = "initialize_discussion"
-                
-                # Send report to original user or other team members
-                if target_user_id == user_id:
-                    # leader is ready to wait for the team members to respond
-                    user_state[user_id]["step"] = "start_interagent_discussion"
-
-                    # Create the report based on what he said before
-                    user_state[user_id]["bot"].generate_team_member_report(user_state[user_id]["real_name"])
-
-                    client.chat_postMessage(
-                        channel=user_state[user_id]['conversation'],
-                        text=f"Thanks for sharing your thoughts. here is the report : {report}. I'll go discuss with other AI agents now!",
-                        thread_ts=user_state[user_id]['thread_ts'],
-                        username=f"{user_state[user_id]["real_name"]} Agent",
-                        icon_emoji=":robot_face:"
-                    )
-                else:
-                    client.chat_postMessage(
-                        channel=dm_channel['channel']['id'],
-                        text=f"Hello! New meeting scheduled, your thoughts are needed! {report} What are your thoughts?",
-                        username=f"{user_state[target_user_id]["real_name"]} Agent",
-                        icon_emoji=":robot_face:"
-                    )
+                if target_state is None:
+                    target_state = {"step": None, "bot": None, "conversation": dm_channel, "real_name": user_name, "thread_ts": None}
+                target_state["step"] = "initialize_discussion"
+                target_state["meeting_id"] = state["meeting_id"]
+                target_state["version"] = target_state.get("version", 0) + 1
+                return target_state
+
+            # The team member's own worker may be saving their state at the same time
+            target_state = sessions.update(target_user_id, join)
+
+            client.chat_postMessage(
+                channel=dm_channel,
+                text=f"Hello! New meeting scheduled, your thoughts are needed! {report} What are your thoughts?",
+                username=f"{target_state['real_name']} Agent",
+                icon_emoji=":robot_face:"
+            )
 
-            except Exception as e:
-                print(f"Error sending DM: {e}")
+        # Share report with the other mentioned users concurrently
+        team_members = [user for user in dict.fromkeys(mentioned_users) if user != user_id]
+        delivery_errors = deliver_concurrently(invite, team_members, max_workers=DELIVERY_WORKERS)
 
+        try:
+            # leader is ready to wait for the team members to respond
+            state["step"] = "start_interagent_discussion"
+
+            # Create the report based on what he said before
+            state["bot"].generate_team_member_report()
+
+            client.chat_postMessage(
+                channel=state['conversation'],
+                text=f"Thanks for sharing your thoughts. here is the report : {report}. I'll go discuss with other AI agents now!",
+                thread_ts=state['thread_ts'],
+                username=f"{state['real_name']} Agent",
+                icon_emoji=":robot_face:"
+            )
+
+            # Let the leader know who could not be reached
+            failed = [f"<@{user}> ({error})" for user, error in delivery_errors.items() if error]
+            if failed:
+                client.chat_postMessage(
+                    channel=state['conversation'],
+                    text=f"I couldn't share the report with {', '.join(failed)}.",
+                    thread_ts=state['thread_ts'],
+                    username=f"{state['real_name']} Agent",
+                    icon_emoji=":robot_face:"
+                )
+        except Exception as e:
+            logger.error("Error sending DM: %s", e)
+
+        def mark_leader_ready(meeting):
+            # Members who never got the report can't take part in the discussion
+            for member, error in delivery_errors.items():
+                if error:
+                    meeting.remove_participant(member)
+            meeting.set_step(user_id, Meeting.READY_STEP)
+            return meeting.claim_discussion()
+
+        # The team may have answered before the leader's report was ready
+        meeting, claimed = update_meeting(state["meeting_id"], mark_leader_ready)
+        if claimed:
+            run_agent_discussion(meeting, client)
         return
     
-    elif user_state[user_id]["step"] == "initialize_discussion":
-        user_state[user_id]["step"] = "answer_agent_questions"
+    elif state["step"] == "initialize_discussion":
+        state["step"] = "answer_agent_questions"
 
-        user_state[user_id]["bot"] = TeamMemberDiscussionBot()
-        user_state[user_id]["bot"].initialize_discussion(user_state[user_id]["real_name"])
-        user_state[user_id]["bot"].collect_initial_opinion(text)
+        state["bot"] = TeamMemberDiscussionBot(meeting_id=state["meeting_id"], participant=user_id)
+        state["bot"].initialize_discussion(state["real_name"])
+        state["bot"].collect_initial_opinion(text)
 
-        ai_message = user_state[user_id]["bot"].ask_clarifying_questions()
-
-        client.chat_postMessage(
-            channel=user_state[user_id]['conversation'],
-            text=ai_message,
-            thread_ts=user_state[user_id]['thread_ts'],
-            username=f"{user_state[user_id]["real_name"]} Agent",
-            icon_emoji=":robot_face:"
-        )
+        stream_reply(client, state, state["bot"].ask_clarifying_questions)
         return
         
-    elif user_state[user_id]["step"] == "answer_agent_questions":
-        user_state[user_id]["step"] = "start_interagent_discussion"
+    elif state["step"] == "answer_agent_questions":
+        state["step"] = "start_interagent_discussion"
 
-        user_state[user_id]["bot"].handle_clarifying_response(text)
-        #print(f"User state{user_state[user_id]}")
-        user_state[user_id]["bot"].generate_team_member_report(user_state[user_id]["real_name"])
+        state["bot"].handle_clarifying_response(text)
+        #print(f"User state{state}")
+        state["bot"].generate_team_member_report()
 
         client.chat_postMessage(
-            channel=user_state[user_id]['conversation'],
+            channel=state['conversation'],
             text="Thanks for sharing your thoughts! I need to go discuss with other AI agents now!",
-            thread_ts=user_state[user_id]['thread_ts'],
-            username=f"{user_state[user_id]["real_name"]} Agent",
+            thread_ts=state['thread_ts'],
+            username=f"{state['real_name']} Agent",
             icon_emoji=":robot_face:"
         )
 
-        # Wait for all users to complete their responses
-        all_ready = all(user_state[user]["step"] == "start_interagent_discussion" for user in user_state)
-        if not all_ready:
+        # Mark this user ready; only the last participant to get here starts the discussion
+        def mark_ready(meeting):
+            meeting.set_step(user_id, Meeting.READY_STEP, thread_ts=state["thread_ts"])
+            return meeting.claim_discussion()
+
+        meeting, claimed = update_meeting(state["meeting_id"], mark_ready)
+        if not claimed:
             return
+        run_agent_discussion(meeting, client)
+        return
 
-        # Initialize AI agents for discussion
-        agents = []
-        for user in user_state:
-            try:
-                report_files = glob.glob(f"team_member_report_{user_state[user]['real_name']}_*.txt")
-                if not report_files:
-                    raise FileNotFoundError("No leadership report found")
-                
-                latest_report = max(report_files)
-                with open(latest_report, 'r') as f:
-                    initial_context = f.read()
-            except Exception as e:
-                print(f"Error reading leadership report: {e}")
-                return
-
-            agent = AIAgent(
-                name=user_state[user]["real_name"],
-                initial_context=initial_context
-            )
-            agents.append(agent)
+def transcript_context(meeting_id, user_id, max_messages=12):
+    """
+    Format the last messages of a participant's conversation with their bot as agent context.
+    
+    Args:
+        meeting_id: ID of the meeting
+        user_id: Slack user ID of the participant
+        max_messages: Number of messages to include
+        
+    Returns:
+        The messages as "role: content" lines, or an empty string if there is no transcript
+    """
+    messages = get_transcript_log().tail(meeting_id, user_id, max_messages)
+    return "\n\n".join(f"{message['role']}: {message['content']}" for message in messages if message["role"] != "system")
 
-        # Create discussion channel
+def run_agent_discussion(meeting, client):
+    """
+    Let the participants' agents discuss, then send each participant a summary and preparation plan.
+    
+    Progress is checkpointed after every message, and a discussion that was
+    interrupted resumes from its last checkpoint without re-posting anything.
+    
+    Args:
+        meeting: Meeting whose participants are all ready
+        client: Slack client instance
+    """
+    participants = meeting.participants
+
+    # Initialize AI agents for discussion
+    agents = []
+    for user in meeting.participant_ids():
+        try:
+            initial_context = get_artifact_store().read_latest(meeting.meeting_id, "team_member_report", user)
+            if initial_context is None:
+                # Fall back to the end of the conversation with the participant
+                initial_context = transcript_context(meeting.meeting_id, user)
+            if not initial_context:
+                raise FileNotFoundError("No leadership report found")
+        except Exception as e:
+            logger.error("Error reading leadership report: %s", e)
+            return
+
+        agent = AIAgent(
+            name=participants[user]["agent_name"],
+            initial_context=initial_context
+        )
+        agents.append(agent)
+
+    claimed, checkpoint = checkpoints.claim(meeting.meeting_id, WORKER_ID)
+    if not claimed:
+        logger.info("Discussion is already running or finished")
+        return
+    if checkpoint is not None:
+        logger.info("Resuming discussion at turn %d", checkpoint["next_turn"])
+
+    # Create discussion channel
+    if checkpoint is None:
         try:
             result = client.conversations_create(
                 name="agents_discussion",
@@ -260,13 +585,20 @@ def handle_message_events(body, say, client):
             )
 
         except SlackApiError as e:
-            print("Error creating conversation: {}".format(e))
+            logger.error("Error creating conversation: %s", e)
 
+    try:
         # Run the agent discussion and send updates
         for item in start_discussion(
                 agents, 
                 initial_prompt="The issue we need to resolve is how to handle the problematic intern. Make it a conversation as much as possible. And you can be a bit sarcastic.",
-                max_turns=16
+                max_turns=16,
+                scheduler=SCHEDULERS[TURN_SCHEDULER](),
+                convergence=ConvergenceCheck() if EARLY_STOP else None,
+                consolidated_wrap_up=CONSOLIDATED_WRAP_UP,
+                checkpoint=checkpoint,
+                on_checkpoint=lambda state: checkpoints.save(meeting.meeting_id, WORKER_ID, state),
+                parallel_rounds=PARALLEL_ROUNDS
             ):
 
             try:
@@ -279,27 +611,48 @@ def handle_message_events(body, say, client):
                     )
                 elif 'summary' in item:
                     # Send discussion summaries to users
-                    target_user_id = next(user for user in user_state if user_state[user]["real_name"] == item['agent_name'])
+                    target_user_id = meeting.user_for_name(item['agent_name'])
                     response = client.chat_postMessage(
-                        channel=user_state[target_user_id]['conversation'],
+                        channel=participants[target_user_id]['conversation'],
                         text=item['summary'], 
-                        thread_ts=user_state[target_user_id]['thread_ts'], 
+                        thread_ts=participants[target_user_id]['thread_ts'], 
                         username=f"{item['agent_name']} Agent",
                     )
                 elif 'preparation' in item:
                     # Send preparation plans to users
-                    target_user_id = next(user for user in user_state if user_state[user]["real_name"] == item['agent_name'])
+                    target_user_id = meeting.user_for_name(item['agent_name'])
                     response = client.chat_postMessage(
-                        channel=user_state[target_user_id]['conversation'], 
+                        channel=participants[target_user_id]['conversation'], 
                         text=item['preparation'],
-                        thread_ts=user_state[target_user_id]['thread_ts'],
+                        thread_ts=participants[target_user_id]['thread_ts'],
                         username=f"{item['agent_name']} Agent",
                     )
             except SlackApiError as e:
-                print(f"Error posting message: {e.response['error']}")
-        
-        return
-    
+                logger.error("Error posting message: %s", e.response["error"])
+
+        checkpoints.finish(meeting.meeting_id, WORKER_ID)
+    except Exception:
+        # Let the next scan for stale discussions resume it from its last checkpoint
+        checkpoints.release(meeting.meeting_id, WORKER_ID)
+        raise
+
+def resume_discussions():
+    """Queue the discussions that failed or whose worker stopped checkpointing, e.g. because it crashed, to resume them."""
+    for meeting_id in checkpoints.stale():
+        data = sessions.get(f"meeting:{meeting_id}")
+        if data is None:
+            continue
+        meeting = Meeting.from_dict(data)
+
+        def resume(meeting=meeting):
+            with trace(meeting.meeting_id):
+                run_agent_discussion(meeting, slack)
+
+        try:
+            job_queue.submit(f"discussion:{meeting_id}", resume)
+        except JobQueueFull as e:
+            logger.warning("Could not queue discussion of meeting %s for resumption: %s", meeting_id, e)
+
 
 # Flask app setup for handling Slack requests
 flask_app = Flask(__name__)
@@ -315,5 +668,44 @@ def slack_events():
 
     return handler.handle(request)
 
+def prune_meetings_periodically():
+    """Drop old artifacts and compact idle transcripts every PRUNE_INTERVAL seconds, forever."""
+    while True:
+        time.sleep(PRUNE_INTERVAL)
+        try:
+            get_artifact_store().prune(max_age=ARTIFACT_RETENTION)
+            get_transcript_log().compact(compress_after=TRANSCRIPT_COMPRESS_AFTER, max_age=ARTIFACT_RETENTION)
+        except Exception:
+            logger.exception("Error pruning old meetings")
+
+def resume_discussions_periodically():
+    """Look for discussions to resume every RESUME_INTERVAL seconds, forever."""
+    while True:
+        time.sleep(RESUME_INTERVAL)
+        try:
+            resume_discussions()
+        except Exception:
+            logger.exception("Error looking for discussions to resume")
+
+def start_background_tasks():
+    """
+    Start the server's background work. Called once by each server process, never on import, so processes
+    importing this module, like the PDF extraction workers, don't resume discussions or prune meetings.
+    """
+    # Pick up discussions left unfinished by a previous run, then those whose worker fails or dies later
+    resume_discussions()
+    threading.Thread(target=resume_discussions_periodically, name="converge-resume", daemon=True).start()
+
+    # Clean up old meetings in the background instead of when a meeting starts
+    threading.Thread(target=prune_meetings_periodically, name="converge-prune", daemon=True).start()
+
+@flask_app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    """Expose this process's metrics in the Prometheus text format"""
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
+    if os.getenv("CONVERGE_PREWARM", "1") == "1":
+        prewarm()
+    start_background_tasks()
     flask_app.run(port=3000)
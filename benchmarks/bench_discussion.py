@@ -0,0 +1,245 @@
+"""
+Benchmark the discussion engine against a local fake OpenAI backend.
+
+Runs whole meetings (the leader's and team members' bots, then the agent
+discussion) for every combination of agent count and max_turns, and writes
+wall time, calls, tokens per turn and memory use as JSON.
+
+Usage:
+    python -m benchmarks.bench_discussion --agents 2,3,5 --turns 4,8,16 --output results.json
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Cached responses would hide the cost of repeated prompts, and artifacts and transcripts go to a scratch
+# directory, so runs with the same meeting IDs don't append to each other's logs
+os.environ["CONVERGE_LLM_CACHE_DB"] = ""
+SCRATCH_DIR = tempfile.mkdtemp(prefix="converge_bench_")
+os.environ.setdefault("CONVERGE_ARTIFACT_DIR", os.path.join(SCRATCH_DIR, "artifacts"))
+os.environ.setdefault("CONVERGE_TRANSCRIPT_DIR", os.path.join(SCRATCH_DIR, "transcripts"))
+
+import utils.openai_client as openai_client
+from agents import AIAgent, start_discussion
+from benchmarks.fake_openai import FakeOpenAI
+from turn_scheduler import SCHEDULERS, ConvergenceCheck
+from leader_discussion import LeadershipDiscussionBot
+from team_member_discussion import TeamMemberDiscussionBot
+
+INITIAL_PROMPT = "The issue we need to resolve is how to handle the problematic intern."
+
+
+def _call_stats(calls):
+    """Sum the token counts of a list of recorded calls."""
+    return {
+        "calls": len(calls),
+        "failed_calls": sum(call["failed"] for call in calls),
+        "prompt_tokens": sum(call["prompt_tokens"] for call in calls),
+        "completion_tokens": sum(call["completion_tokens"] for call in calls),
+    }
+
+
+def run_bots(backend, meeting_id, names):
+    """
+    Run the leader's and every team member's conversation with their bots, as the Slack app does.
+
+    Args:
+        backend: Fake OpenAI client receiving the requests
+        meeting_id: ID the reports are stored under
+        names: Participant names, leader first
+
+    Returns:
+        dict: Wall time and call stats of the bot conversations
+    """
+    backend.reset()
+    start = time.perf_counter()
+
+    leader = LeadershipDiscussionBot(meeting_id=meeting_id, participant=names[0])
+    leader.collect_initial_situation("Our intern keeps missing deadlines and the team is split on what to do.")
+    leader.ask_clarifying_questions()
+    leader.handle_clarifying_response("He has been with us for three months.")
+    leader.generate_final_report()
+    leader.generate_team_member_report()
+
+    for name in names[1:]:
+        bot = TeamMemberDiscussionBot(meeting_id=meeting_id, participant=name)
+        bot.initialize_discussion(name)
+        bot.collect_initial_opinion(f"{name} thinks the intern needs clearer goals.")
+        bot.ask_clarifying_questions()
+        bot.handle_clarifying_response("Mostly the quality of the work.")
+        bot.generate_team_member_report()
+
+    return {"wall_time_s": time.perf_counter() - start, **_call_stats(backend.calls)}
+
+
+def run_meeting(backend, agent_count, max_turns, run, scheduler="round_robin", early_stop=False, consolidated=False,
+                parallel_rounds=False, context_sentences=20):
+    """
+    Run one benchmarked meeting.
+
+    Args:
+        backend: Fake OpenAI client receiving the requests
+        agent_count: Number of participants
+        max_turns: Maximum number of discussion turns
+        run: Index of the repetition, used in the meeting ID
+        scheduler: Name of the turn scheduler, see `turn_scheduler.SCHEDULERS`
+        early_stop: Whether the discussion stops early once the agents converge
+        consolidated: Whether the summary and preparation plans are extracted in a single call
+        parallel_rounds: Whether the agents draft each round's responses concurrently
+        context_sentences: Sentences in each agent's initial context, as in a report
+
+    Returns:
+        dict: Results of the run
+    """
+    names = [f"Member {i}" for i in range(agent_count)]
+    meeting_id = f"bench-{agent_count}-{max_turns}-{run}"
+    bots = run_bots(backend, meeting_id, names)
+
+    contexts = {
+        name: " ".join(f"{name} thinks the intern needs clearer goals for project {i}." for i in range(context_sentences))
+        for name in names
+    }
+    backend.reset()
+    tracemalloc.start()
+    memory_before = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+
+    agents = [AIAgent(name=name, initial_context=context) for name, context in contexts.items()]
+    turns = []
+    wrap_up_items = 0
+    seen = 0
+    last = start
+    discussion = start_discussion(
+        agents,
+        initial_prompt=INITIAL_PROMPT,
+        max_turns=max_turns,
+        scheduler=SCHEDULERS[scheduler](),
+        convergence=ConvergenceCheck() if early_stop else None,
+        consolidated_wrap_up=consolidated,
+        parallel_rounds=parallel_rounds,
+    )
+    for item in discussion:
+        if "response" in item:
+            now = time.perf_counter()
+            calls = backend.calls[seen:]
+            seen += len(calls)
+            turns.append({"turn": item["turn"], "agent_name": item["agent_name"], "seconds": now - last, **_call_stats(calls)})
+            last = now
+        else:
+            wrap_up_items += 1
+
+    end = time.perf_counter()
+    memory_after, memory_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    discussion_calls = list(backend.calls)
+    del agents
+
+    return {
+        "agents": agent_count,
+        "max_turns": max_turns,
+        "run": run,
+        "bots": bots,
+        "discussion": {
+            "wall_time_s": end - start,
+            **_call_stats(discussion_calls),
+            "turns_run": len(turns),
+            "turns": turns,
+            "wrap_up": {"seconds": end - last, "items": wrap_up_items, **_call_stats(discussion_calls[seen:])},
+            "memory_growth_kib": (memory_after - memory_before) / 1024,
+            "memory_peak_kib": (memory_peak - memory_before) / 1024,
+        },
+        "calls_per_meeting": bots["calls"] + len(discussion_calls),
+        "wall_time_s": bots["wall_time_s"] + end - start,
+    }
+
+
+def summarize(results):
+    """Aggregate the repetitions of each configuration."""
+    configs = {}
+    for result in results:
+        configs.setdefault((result["agents"], result["max_turns"]), []).append(result)
+
+    summary = []
+    for (agent_count, max_turns), runs in sorted(configs.items()):
+        turn_prompt_tokens = [turn["prompt_tokens"] for run in runs for turn in run["discussion"]["turns"]]
+        summary.append({
+            "agents": agent_count,
+            "max_turns": max_turns,
+            "runs": len(runs),
+            "wall_time_s_median": statistics.median(run["wall_time_s"] for run in runs),
+            "discussion_wall_time_s_median": statistics.median(run["discussion"]["wall_time_s"] for run in runs),
+            "calls_per_meeting": statistics.median(run["calls_per_meeting"] for run in runs),
+            "turns_run_mean": statistics.mean(run["discussion"]["turns_run"] for run in runs),
+            "prompt_tokens_per_turn_mean": statistics.mean(turn_prompt_tokens) if turn_prompt_tokens else 0,
+            "prompt_tokens_per_turn_max": max(turn_prompt_tokens, default=0),
+            "memory_peak_kib_max": max(run["discussion"]["memory_peak_kib"] for run in runs),
+        })
+    return summary
+
+
+def _int_list(value):
+    """Parse a comma-separated list of integers."""
+    return [int(item) for item in value.split(",") if item]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--agents", type=_int_list, default=[2, 3, 5], help="comma-separated agent counts")
+    parser.add_argument("--turns", type=_int_list, default=[4, 8, 16], help="comma-separated max_turns values")
+    parser.add_argument("--repeat", type=int, default=3, help="runs of each configuration")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds before each response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random extra seconds before each response")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="seconds per streamed token")
+    parser.add_argument("--completion-tokens", type=int, default=40, help="tokens in each response")
+    parser.add_argument("--duplicate-rate", type=float, default=0.0, help="share of responses repeating the previous one")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="share of requests failing")
+    parser.add_argument("--failure-status", type=int, default=500, help="HTTP status of failures, 0 for connection errors")
+    parser.add_argument("--scheduler", choices=sorted(SCHEDULERS), default="round_robin", help="turn scheduler")
+    parser.add_argument("--early-stop", action="store_true", help="stop discussions once the agents converge")
+    parser.add_argument("--consolidated", action="store_true", help="extract the summary and preparation plans in a single call")
+    parser.add_argument("--parallel-rounds", action="store_true", help="draft each round's responses concurrently")
+    parser.add_argument("--context-sentences", type=int, default=20, help="sentences in each agent's initial context")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="file to write the JSON results to, instead of stdout")
+    args = parser.parse_args(argv)
+
+    backend = FakeOpenAI(
+        latency=args.latency,
+        jitter=args.jitter,
+        token_latency=args.token_latency,
+        completion_tokens=args.completion_tokens,
+        duplicate_rate=args.duplicate_rate,
+        failure_rate=args.failure_rate,
+        failure_status=args.failure_status,
+        seed=args.seed,
+    )
+    openai_client._client = backend
+
+    results = []
+    for agent_count in args.agents:
+        for max_turns in args.turns:
+            for run in range(args.repeat):
+                results.append(run_meeting(backend, agent_count, max_turns, run, args.scheduler, args.early_stop, args.consolidated,
+                                           args.parallel_rounds, args.context_sentences))
+                print(f"agents={agent_count} max_turns={max_turns} run={run}: {results[-1]['wall_time_s']:.2f}s", file=sys.stderr)
+
+    report = {
+        "config": {name: value for name, value in vars(args).items() if name != "output"},
+        "summary": summarize(results),
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Benchmark the import time of the modules the Slack app loads at startup.
+
+Imports the modules in fresh interpreters, as a new worker does, and writes
+wall time, the slowest imports reported by `python -X importtime`, and which
+lazily loaded libraries were imported anyway, as JSON. Exits with status 1
+if a lazy library was loaded or the median time exceeds --max-ms, so it can
+guard against regressions.
+
+Usage:
+    python -m benchmarks.bench_import --repeat 5 --max-ms 1500 --output results.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from utils.prewarm import LAZY_MODULES
+
+# Everything app.py imports, without connecting to Slack as importing app.py itself does
+STARTUP_MODULES = (
+    "slack_bolt",
+    "slack_bolt.adapter.flask",
+    "flask",
+    "dotenv",
+    "leader_discussion",
+    "team_member_discussion",
+    "agents",
+    "meeting",
+    "turn_scheduler",
+    "utils.transcribe_voice_input",
+    "utils.extract_text_from_pdf",
+    "utils.job_queue",
+    "utils.session_store",
+    "utils.artifact_store",
+    "utils.transcript_log",
+    "utils.slack_streaming",
+    "utils.slack_directory",
+    "utils.slack_delivery",
+    "utils.event_dedup",
+    "utils.discussion_checkpoints",
+    "utils.metrics",
+    "utils.tracing",
+    "utils.prewarm",
+)
+
+# Also loaded lazily, by the OpenAI client on the first request
+LAZY_LIBRARIES = LAZY_MODULES + ("openai", "httpx", "llama_index")
+
+_IMPORT_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+for module in {modules!r}:
+    __import__(module)
+elapsed = time.perf_counter() - start
+print(json.dumps({{"wall_time_ms": elapsed * 1000, "loaded": [m for m in {lazy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(modules, lazy_libraries):
+    """
+    Import `modules` in a fresh interpreter.
+
+    Returns:
+        The wall time, the lazy libraries that were loaded, and the cumulative time of each top-level import
+    """
+    script = _IMPORT_SCRIPT.format(modules=tuple(modules), lazy=tuple(lazy_libraries))
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", script],
+        cwd=root, capture_output=True, text=True, check=True,
+    )
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+
+    # Lines look like "import time:  self [us] | cumulative | imported package", nested imports are indented
+    imports = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|", 2)
+        if cumulative.strip().isdigit() and not name[1:].startswith(" "):
+            imports[name.strip()] = int(cumulative) / 1000
+    result["imports_ms"] = imports
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="interpreters to start")
+    parser.add_argument("--top", type=int, default=10, help="slowest top-level imports to report")
+    parser.add_argument("--max-ms", type=float, help="fail if the median import time exceeds this")
+    parser.add_argument("--output", help="file to write the JSON results to, instead of stdout")
+    args = parser.parse_args(argv)
+
+    runs = []
+    for run in range(args.repeat):
+        runs.append(measure(STARTUP_MODULES, LAZY_LIBRARIES))
+        print(f"run={run}: {runs[-1]['wall_time_ms']:.0f}ms", file=sys.stderr)
+
+    slowest = {}
+    for name in runs[0]["imports_ms"]:
+        slowest[name] = statistics.median(run["imports_ms"].get(name, 0) for run in runs)
+    loaded = sorted({module for run in runs for module in run["loaded"]})
+    median = statistics.median(run["wall_time_ms"] for run in runs)
+
+    report = {
+        "config": {name: value for name, value in vars(args).items() if name != "output"},
+        "summary": {
+            "wall_time_ms_median": median,
+            "wall_time_ms_max": max(run["wall_time_ms"] for run in runs),
+            "lazy_libraries_loaded": loaded,
+            "slowest_imports_ms": dict(sorted(slowest.items(), key=lambda item: -item[1])[:args.top]),
+        },
+        "results": [{name: value for name, value in run.items() if name != "imports_ms"} for run in runs],
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if loaded:
+        print(f"Lazily loaded libraries were imported at startup: {', '.join(loaded)}", file=sys.stderr)
+        return 1
+    if args.max_ms is not None and median > args.max_ms:
+        print(f"Median import time {median:.0f}ms exceeds {args.max_ms:.0f}ms", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
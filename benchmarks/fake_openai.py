@@ -0,0 +1,131 @@
+import json
+import random
+import re
+import threading
+import time
+from typing import Dict, List, Optional
+
+import httpx
+from openai import APIConnectionError, APIStatusError
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+
+from utils.context_window import count_tokens
+
+
+class FakeOpenAI:
+    """
+    Local stand-in for the OpenAI client, answering chat completions without network calls.
+
+    Responses take `latency` seconds (plus up to `jitter`), and `token_latency`
+    seconds per token when streamed. Each response has `completion_tokens`
+    tokens of random words, capped by the request's max_tokens. A share
+    `duplicate_rate` of the responses repeat the previous one, as agents going
+    in circles do. A share `failure_rate` of the requests fails with an HTTP
+    `failure_status` error, or a connection error if the status is 0.
+
+    JSON mode requests get the wrap-up object `start_discussion` asks for,
+    with a preparation plan for every participant named in the prompt.
+
+    Every request is recorded in `calls`, with its token counts.
+    """
+    def __init__(self, latency: float = 0.05, jitter: float = 0.0, token_latency: float = 0.0,
+                 completion_tokens: int = 40, duplicate_rate: float = 0.0, failure_rate: float = 0.0,
+                 failure_status: int = 500, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.token_latency = token_latency
+        self.completion_tokens = completion_tokens
+        self.duplicate_rate = duplicate_rate
+        self.failure_rate = failure_rate
+        self.failure_status = failure_status
+        self.calls: List[Dict] = []
+        self._random = random.Random(seed)
+        self._last_words: List[str] = []
+        self._lock = threading.Lock()
+        self.chat = _Namespace(completions=_Namespace(create=self._create_chat_completion))
+
+    def reset(self) -> None:
+        """Forget the recorded calls."""
+        with self._lock:
+            self.calls = []
+
+    def _create_chat_completion(self, model: str, messages: List[Dict], max_tokens: Optional[int] = None,
+                                stream: bool = False, **kwargs):
+        """Answer a `chat.completions.create` request."""
+        completion_tokens = min(self.completion_tokens, max_tokens or self.completion_tokens)
+        with self._lock:
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            failed = self._random.random() < self.failure_rate
+            if self._last_words and self._random.random() < self.duplicate_rate:
+                words = self._last_words[:completion_tokens]
+            else:
+                words = [f"word{self._random.randrange(1000)}" for _ in range(completion_tokens)]
+            self._last_words = words
+        completion_tokens = len(words)
+
+        prompt_tokens = sum(count_tokens(message["content"]) for message in messages)
+        call = {
+            "started_at": time.perf_counter(),
+            "model": model,
+            "stream": stream,
+            "response_format": kwargs.get("response_format", {}).get("type") if kwargs.get("response_format") else None,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": 0 if failed else completion_tokens,
+            "failed": failed,
+        }
+        with self._lock:
+            self.calls.append(call)
+
+        time.sleep(delay)
+        if failed:
+            raise self._failure()
+
+        content = " ".join(words)
+        if call["response_format"] == "json_object":
+            content = self._wrap_up_json(messages, words)
+        if not stream:
+            return ChatCompletion(
+                id=f"fake-{len(self.calls)}",
+                created=int(time.time()),
+                model=model,
+                object="chat.completion",
+                choices=[{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                usage={"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens},
+            )
+        return self._stream(model, words)
+
+    def _wrap_up_json(self, messages: List[Dict], words: List[str]) -> str:
+        """Answer a consolidated wrap-up request, for the participants listed as a JSON array in the prompt."""
+        match = re.search(r'(\[(?:"[^"]*"(?:, )?)*\])', messages[-1]["content"])
+        names = json.loads(match.group(1)) if match else []
+        third = max(1, len(words) // 3)
+        return json.dumps({
+            "directions": [" ".join(words[i * third:(i + 1) * third]) or "direction" for i in range(3)],
+            "preparations": {name: " ".join(words[:third]) or "prepare" for name in names},
+        })
+
+    def _stream(self, model: str, words: List[str]):
+        """Yield a completion one token at a time."""
+        for i, word in enumerate(words):
+            time.sleep(self.token_latency)
+            yield ChatCompletionChunk(
+                id="fake-stream",
+                created=int(time.time()),
+                model=model,
+                object="chat.completion.chunk",
+                choices=[{"index": 0, "delta": {"content": word if i == 0 else " " + word}, "finish_reason": "stop" if i == len(words) - 1 else None}],
+            )
+
+    def _failure(self) -> Exception:
+        """Build the error raised by a failing request."""
+        request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+        if not self.failure_status:
+            return APIConnectionError(request=request)
+        response = httpx.Response(self.failure_status, request=request)
+        return APIStatusError(f"Fake error {self.failure_status}", response=response, body=None)
+
+
+class _Namespace:
+    """Attribute container mimicking the nested resources of the OpenAI client."""
+    def __init__(self, **attributes):
+        self.__dict__.update(attributes)
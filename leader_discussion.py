@@ -1,11 +1,11 @@
-from openai import OpenAI
-import os
-from typing import List, Dict
-import time
+import logging
+from typing import List, Dict, Optional, Callable
 
-import dotenv
+from utils.artifact_store import get_artifact_store
+from utils.model_routing import complete_text
+from utils.transcript_log import TranscriptHistory
 
-dotenv.load_dotenv()
+logger = logging.getLogger(__name__)
 
 
 class LeadershipDiscussionBot:
@@ -16,30 +16,61 @@ class LeadershipDiscussionBot:
     ask clarifying questions, and generate comprehensive reports with 
     recommendations.
     """
-    def __init__(self):
-        # Initialize OpenAI client
-        self.client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
-        self.conversation_history: List[Dict] = []
+    def __init__(self, meeting_id: Optional[str] = None, participant: Optional[str] = None):
+        self.meeting_id = meeting_id
+        self.participant = participant
+        self.history = TranscriptHistory(meeting_id, participant)
+
+    @property
+    def conversation_history(self) -> List[Dict]:
+        """Messages of the conversation in OpenAI chat format, loaded from the transcript log on first use."""
+        return self.history.messages
+
+    def to_dict(self) -> Dict:
+        """
+        Serialize the bot state so it can be stored between messages.
+        
+        Returns:
+            A JSON-serializable dict, see `from_dict`
+        """
+        return {
+            "type": "leadership",
+            "meeting_id": self.meeting_id,
+            "participant": self.participant,
+            "history": self.history.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "LeadershipDiscussionBot":
+        """
+        Restore a bot from the output of `to_dict`.
+        
+        Args:
+            data: Serialized bot state
+        """
+        bot = cls(meeting_id=data.get("meeting_id"))
+        bot.participant = data.get("participant")
+        # States stored before the transcript log kept the messages inline
+        bot.history = TranscriptHistory.from_dict(data.get("history") or {"messages": data["conversation_history"]})
+        return bot
         
-    def get_ai_response(self, messages: List[Dict]) -> str:
+    def get_ai_response(self, messages: List[Dict], on_token: Optional[Callable[[str], None]] = None,
+                        step: str = "ask_clarifying_questions") -> str:
         """
-        Get a response from the OpenAI API.
+        Get a response from the OpenAI API, on the model routed to this step.
         
         Args:
             messages: List of conversation messages in OpenAI chat format
+            on_token: If set, the response is streamed and this is called with each new piece of text
+            step: Step asking for the response, which selects the model and limits
             
         Returns:
             The AI's response text, or None if there was an error
         """
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=messages,
-                temperature=0.7
-            )
-            return response.choices[0].message.content
+            return complete_text(f"leadership.{step}", on_token=on_token, messages=messages, temperature=0.7)
         except Exception as e:
-            print(f"Error getting AI response: {e}")
+            logger.error("Error getting AI response: %s", e)
             return None
 
     def collect_initial_situation(self, situation) -> None:
@@ -49,20 +80,23 @@ class LeadershipDiscussionBot:
         Args:
             situation: Description of the leadership situation/decision
         """
-        self.conversation_history = [
+        self.history.reset([
             {"role": "system", "content": "You are a leadership advisor helping executives make important decisions. First understand their situation, then ask one clarifying question if needed, and finally provide a comprehensive report."},
             {"role": "user", "content": situation}
-        ]
+        ])
 
-    def ask_clarifying_questions(self) -> None:
+    def ask_clarifying_questions(self, on_token: Optional[Callable[[str], None]] = None) -> None:
         """
         Have the AI ask a clarifying question about the situation.
         
+        Args:
+            on_token: If set, the question is streamed and this is called with each new piece of text
+            
         Returns:
             The AI's question as a string
         """
-        ai_message = self.get_ai_response(self.conversation_history)
-        self.conversation_history.append({"role": "assistant", "content": ai_message})
+        ai_message = self.get_ai_response(self.conversation_history, on_token=on_token)
+        self.history.append({"role": "assistant", "content": ai_message})
         return ai_message
     
     def handle_clarifying_response(self, response) -> None:
@@ -72,7 +106,7 @@ class LeadershipDiscussionBot:
         Args:
             response: The user's response text
         """
-        self.conversation_history.append({"role": "user", "content": response})
+        self.history.append({"role": "user", "content": response})
 
     def generate_final_report(self) -> None:
         """
@@ -87,23 +121,19 @@ class LeadershipDiscussionBot:
                       "Format it professionally for sharing with team members. No headers or footers, and don't style the text."
         }
         
-        self.conversation_history.append(report_prompt)
-        report = self.get_ai_response(self.conversation_history)
-        
-        timestamp = time.strftime("%Y%m%d-%H%M%S")
-        filename = f"leadership_report_{timestamp}.txt"
+        self.history.append(report_prompt)
+        report = self.get_ai_response(self.conversation_history, step="generate_final_report")
         
-        with open(filename, 'w') as f:
-            f.write(report)
+        get_artifact_store().write(self.meeting_id, "leadership_report", report)
         
         return report
     
-    def generate_team_member_report(self, name) -> None:
+    def generate_team_member_report(self) -> str:
         """
         Generate a report summarizing the team member's perspective.
         
-        Args:
-            name: Name of the team member for the report filename
+        Returns:
+            The generated report text
         """
         report_prompt = {
             "role": "user",
@@ -115,17 +145,9 @@ class LeadershipDiscussionBot:
                       "Format it professionally for integration with other team members' feedback."
         }
         
-        self.conversation_history.append(report_prompt)
-        self.team_member_report = self.get_ai_response(self.conversation_history)
+        self.history.append(report_prompt)
+        self.team_member_report = self.get_ai_response(self.conversation_history, step="generate_team_member_report")
         
         # Save individual team member report
-        timestamp = time.strftime("%Y%m%d-%H%M%S")
-        filename = f"team_member_report_{name}_{timestamp}.txt"
-        
-        with open(filename, 'w') as f:
-            f.write(self.team_member_report)
-
-        # Save conversation context for future AI agent interactions
-        context_filename = f"team_member_context_{name}_{timestamp}.txt"
-        with open(context_filename, 'w') as f:
-            f.write(str(self.conversation_history))
+        get_artifact_store().write(self.meeting_id, "team_member_report", self.team_member_report, participant=self.participant or "")
+        return self.team_member_report
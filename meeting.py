@@ -0,0 +1,153 @@
+from typing import Dict, List, Optional
+
+
+class Meeting:
+    """
+    A meeting between a leader and the team members they invited.
+
+    The meeting owns its participants and their conversation steps. It keeps
+    a count of participants ready for the agent discussion and an index of
+    participants by agent name, so readiness checks and recipient lookups
+    don't depend on how many users or meetings the bot has seen.
+
+    Each participant's agent gets a name unique in the meeting: their real
+    name, numbered when another participant has the same one.
+    """
+    READY_STEP = "start_interagent_discussion"
+
+    def __init__(self, meeting_id: str, leader_id: str):
+        """
+        Initialize a meeting without participants.
+
+        Args:
+            meeting_id: Unique ID of the meeting
+            leader_id: Slack user ID of the leader who started it
+        """
+        self.meeting_id = meeting_id
+        self.leader_id = leader_id
+        self.participants: Dict[str, Dict] = {}
+        self.user_ids_by_name: Dict[str, str] = {}
+        self.ready_count = 0
+        self.discussion_started = False
+
+    def add_participant(self, user_id: str, real_name: str, conversation: str, thread_ts: Optional[str] = None,
+                        agent_name: Optional[str] = None) -> None:
+        """
+        Add a participant to the meeting, or refresh their details if they are already in it.
+
+        Args:
+            user_id: Slack user ID of the participant
+            real_name: Real name of the participant
+            conversation: ID of the bot's DM channel with the participant
+            thread_ts: Thread replies to the participant are posted in
+            agent_name: Name of their agent, by default their real name. Numbered if another participant has it
+        """
+        participant = self.participants.setdefault(user_id, {"step": None})
+        if agent_name is None:
+            # Keep the agent's name unless the participant's real name changed
+            agent_name = participant["agent_name"] if participant.get("real_name") == real_name else real_name
+        if participant.get("agent_name") != agent_name:
+            self.user_ids_by_name.pop(participant.get("agent_name"), None)
+            participant["agent_name"] = self._unique_name(agent_name)
+            self.user_ids_by_name[participant["agent_name"]] = user_id
+        participant.update({"real_name": real_name, "conversation": conversation, "thread_ts": thread_ts})
+
+    def _unique_name(self, name: str) -> str:
+        """Return `name`, or `name` followed by the first free number if a participant's agent has it."""
+        unique, number = name, 1
+        while unique in self.user_ids_by_name:
+            number += 1
+            unique = f"{name} ({number})"
+        return unique
+
+    def remove_participant(self, user_id: str) -> None:
+        """
+        Remove a participant from the meeting.
+
+        Args:
+            user_id: Slack user ID of the participant
+        """
+        participant = self.participants.pop(user_id, None)
+        if participant is None:
+            return
+        if participant["step"] == self.READY_STEP:
+            self.ready_count -= 1
+        del self.user_ids_by_name[participant["agent_name"]]
+
+    def set_step(self, user_id: str, step: Optional[str], thread_ts: Optional[str] = None) -> None:
+        """
+        Record the conversation step a participant has reached.
+
+        Args:
+            user_id: Slack user ID of the participant
+            step: Their new step
+            thread_ts: Thread replies to the participant are posted in, if known
+        """
+        participant = self.participants[user_id]
+        self.ready_count += (step == self.READY_STEP) - (participant["step"] == self.READY_STEP)
+        participant["step"] = step
+        if thread_ts is not None:
+            participant["thread_ts"] = thread_ts
+
+    @property
+    def all_ready(self) -> bool:
+        """Whether every participant is ready for the agent discussion."""
+        return bool(self.participants) and self.ready_count == len(self.participants)
+
+    def claim_discussion(self) -> bool:
+        """
+        Mark the agent discussion as started, if everyone is ready and it hasn't started yet.
+
+        Returns:
+            True if the caller should run the discussion
+        """
+        if not self.all_ready or self.discussion_started:
+            return False
+        self.discussion_started = True
+        return True
+
+    def user_for_name(self, agent_name: str) -> Optional[str]:
+        """
+        Find a participant by the name of their agent.
+
+        Args:
+            agent_name: Name of the participant's agent
+
+        Returns:
+            Their Slack user ID, or None if no agent in the meeting has this name
+        """
+        return self.user_ids_by_name.get(agent_name)
+
+    def participant_ids(self) -> List[str]:
+        """Return the participants' Slack user IDs, in the order they were added."""
+        return list(self.participants)
+
+    def to_dict(self) -> Dict:
+        """
+        Serialize the meeting so it can be stored in the session store.
+
+        Returns:
+            A JSON-serializable dict, see `from_dict`
+        """
+        return {
+            "meeting_id": self.meeting_id,
+            "leader_id": self.leader_id,
+            "participants": self.participants,
+            "discussion_started": self.discussion_started,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Meeting":
+        """
+        Restore a meeting from the output of `to_dict`, rebuilding its counters and indexes.
+
+        Args:
+            data: Serialized meeting
+        """
+        meeting = cls(data["meeting_id"], data["leader_id"])
+        for user_id, participant in data["participants"].items():
+            meeting.add_participant(user_id, participant["real_name"], participant["conversation"], participant["thread_ts"],
+                                    participant.get("agent_name"))
+            meeting.set_step(user_id, participant["step"])
+        meeting.discussion_started = data["discussion_started"]
+        return meeting
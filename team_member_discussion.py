@@ -1,12 +1,12 @@
-from openai import OpenAI
-import os
-from typing import List, Dict
-import glob
-import time
+import logging
+from typing import List, Dict, Optional, Callable
 
-import dotenv
+from utils.artifact_store import get_artifact_store
+from utils.model_routing import complete_text
+from utils.retrieval import relevant_context
+from utils.transcript_log import TranscriptHistory
 
-dotenv.load_dotenv()
+logger = logging.getLogger(__name__)
 
 class TeamMemberDiscussionBot:
     """
@@ -16,47 +16,81 @@ class TeamMemberDiscussionBot:
     questions to understand their views, and generates comprehensive summaries of 
     their feedback and suggestions.
     """
-    def __init__(self):
-        self.client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
-        self.conversation_history: List[Dict] = []
+    def __init__(self, meeting_id: Optional[str] = None, participant: Optional[str] = None):
+        self.meeting_id = meeting_id
+        self.participant = participant
+        self.history = TranscriptHistory(meeting_id, participant)
         self.team_member_name: str = ""
         self.leadership_report: str = ""
         self.team_member_report: str = ""
 
+    @property
+    def conversation_history(self) -> List[Dict]:
+        """Messages of the conversation in OpenAI chat format, loaded from the transcript log on first use."""
+        return self.history.messages
+
+    def to_dict(self) -> Dict:
+        """
+        Serialize the bot state so it can be stored between messages.
+        
+        Returns:
+            A JSON-serializable dict, see `from_dict`
+        """
+        return {
+            "type": "team_member",
+            "meeting_id": self.meeting_id,
+            "participant": self.participant,
+            "history": self.history.to_dict(),
+            "team_member_name": self.team_member_name,
+            "leadership_report": self.leadership_report,
+            "team_member_report": self.team_member_report,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "TeamMemberDiscussionBot":
+        """
+        Restore a bot from the output of `to_dict`.
+        
+        Args:
+            data: Serialized bot state
+        """
+        bot = cls(meeting_id=data.get("meeting_id"))
+        bot.participant = data.get("participant")
+        # States stored before the transcript log kept the messages inline
+        bot.history = TranscriptHistory.from_dict(data.get("history") or {"messages": data["conversation_history"]})
+        bot.team_member_name = data["team_member_name"]
+        bot.leadership_report = data["leadership_report"]
+        bot.team_member_report = data["team_member_report"]
+        return bot
+
     def get_latest_leadership_report(self) -> str:
-        """Find and read the most recent leadership report."""
+        """Read the most recent leadership report of this meeting."""
         try:
-            # Get the most recent leadership report file
-            report_files = glob.glob("leadership_report_*.txt")
-            if not report_files:
+            report = get_artifact_store().read_latest(self.meeting_id, "leadership_report")
+            if report is None:
                 raise FileNotFoundError("No leadership report found")
-            
-            latest_report = max(report_files)
-            with open(latest_report, 'r') as f:
-                return f.read()
+            return report
         except Exception as e:
-            print(f"Error reading leadership report: {e}")
+            logger.error("Error reading leadership report: %s", e)
             return None
 
-    def get_ai_response(self, messages: List[Dict]) -> str:
+    def get_ai_response(self, messages: List[Dict], on_token: Optional[Callable[[str], None]] = None,
+                        step: str = "ask_clarifying_questions") -> str:
         """
-        Get a response from the OpenAI API.
+        Get a response from the OpenAI API, on the model routed to this step.
         
         Args:
             messages: List of conversation messages in OpenAI chat format
+            on_token: If set, the response is streamed and this is called with each new piece of text
+            step: Step asking for the response, which selects the model and limits
             
         Returns:
             The AI's response text, or None if there was an error
         """
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=messages,
-                temperature=0.7
-            )
-            return response.choices[0].message.content
+            return complete_text(f"team_member.{step}", on_token=on_token, messages=messages, temperature=0.7)
         except Exception as e:
-            print(f"Error getting AI response: {e}")
+            logger.error("Error getting AI response: %s", e)
             return None
 
     def initialize_discussion(self, user_name) -> None:
@@ -69,15 +103,15 @@ class TeamMemberDiscussionBot:
         # Read the leadership report
         self.leadership_report = self.get_latest_leadership_report()
         if not self.leadership_report:
-            print("Error: Cannot proceed without leadership report")
+            logger.error("Cannot proceed without leadership report")
             return
         
-        # Initialize conversation history
-        self.conversation_history = [
+        # Initialize conversation history, with the opening of a long report until the team member's opinion shows what matters
+        self.history.reset([
             {"role": "system", "content": f"""You are facilitating a discussion with team member {self.team_member_name} 
-             about the situation described in this leadership report: {self.leadership_report}
+             about the situation described in this leadership report: {relevant_context(self.leadership_report, "")}
              Your goal is to understand their perspective deeply and create a comprehensive summary of their views."""},
-        ]
+        ])
 
     def collect_initial_opinion(self, opinion) -> None:
         """
@@ -86,17 +120,23 @@ class TeamMemberDiscussionBot:
         Args:
             opinion: The team member's initial thoughts and feedback
         """
-        self.conversation_history.append({"role": "user", "content": opinion + "\n\nPlease provide one clarifying question to understand better my true priotities and preferences."})
+        passages = relevant_context(self.leadership_report, opinion)
+        if passages != self.leadership_report:
+            self.history.append({"role": "system", "content": f"Parts of the leadership report related to the team member's opinion: {passages}"})
+        self.history.append({"role": "user", "content": opinion + "\n\nPlease provide one clarifying question to understand better my true priotities and preferences."})
 
-    def ask_clarifying_questions(self) -> None:
+    def ask_clarifying_questions(self, on_token: Optional[Callable[[str], None]] = None) -> None:
         """
         Have the AI ask a clarifying question about the team member's perspective.
         
+        Args:
+            on_token: If set, the question is streamed and this is called with each new piece of text
+            
         Returns:
             The AI's question as a string
         """
-        ai_message = self.get_ai_response(self.conversation_history)
-        self.conversation_history.append({"role": "assistant", "content": ai_message})
+        ai_message = self.get_ai_response(self.conversation_history, on_token=on_token)
+        self.history.append({"role": "assistant", "content": ai_message})
         return ai_message
 
     def handle_clarifying_response(self, response) -> None:
@@ -106,14 +146,14 @@ class TeamMemberDiscussionBot:
         Args:
             response: The team member's response text
         """
-        self.conversation_history.append({"role": "user", "content": response})
+        self.history.append({"role": "user", "content": response})
 
-    def generate_team_member_report(self, name) -> None:
+    def generate_team_member_report(self) -> str:
         """
         Generate a report summarizing the team member's perspective.
         
-        Args:
-            name: Name of the team member for the report filename
+        Returns:
+            The generated report text
         """
         report_prompt = {
             "role": "user",
@@ -125,17 +165,9 @@ class TeamMemberDiscussionBot:
                       "Format it professionally for integration with other team members' feedback."
         }
         
-        self.conversation_history.append(report_prompt)
-        self.team_member_report = self.get_ai_response(self.conversation_history)
+        self.history.append(report_prompt)
+        self.team_member_report = self.get_ai_response(self.conversation_history, step="generate_team_member_report")
         
         # Save individual team member report
-        timestamp = time.strftime("%Y%m%d-%H%M%S")
-        filename = f"team_member_report_{name}_{timestamp}.txt"
-        
-        with open(filename, 'w') as f:
-            f.write(self.team_member_report)
-
-        # Save conversation context for future AI agent interactions
-        context_filename = f"team_member_context_{self.team_member_name}_{timestamp}.txt"
-        with open(context_filename, 'w') as f:
-            f.write(str(self.conversation_history))
+        get_artifact_store().write(self.meeting_id, "team_member_report", self.team_member_report, participant=self.participant or "")
+        return self.team_member_report
@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+# The modules live at the top of the repository, which isn't an installed package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def fake_openai(monkeypatch):
+    """Answer chat completions locally, without the response cache."""
+    from benchmarks.fake_openai import FakeOpenAI
+    from utils import openai_client
+
+    backend = FakeOpenAI(latency=0)
+    monkeypatch.setattr(openai_client, "_client", backend)
+    monkeypatch.setattr(openai_client, "_response_cache", None)
+    monkeypatch.setattr(openai_client, "_response_cache_loaded", True)
+    return backend
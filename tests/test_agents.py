@@ -0,0 +1,61 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import agents
+from agents import AIAgent, _wrap_up, start_discussion
+from turn_scheduler import ERROR_RESPONSE, ConvergenceCheck
+
+
+def make_agents():
+    return [AIAgent(name, f"{name} thinks the intern needs clearer goals.") for name in ("Alice", "Bob", "Carol")]
+
+
+def fail(*args, **kwargs):
+    raise TimeoutError("Request timed out.")
+
+
+@pytest.mark.parametrize("parallel_rounds", [False, True])
+def test_failing_agents_use_the_full_turn_budget(fake_openai, monkeypatch, parallel_rounds):
+    monkeypatch.setattr(agents, "complete_text", fail)
+
+    items = list(start_discussion(make_agents(), "How do we handle the intern?", max_turns=12,
+                                  convergence=ConvergenceCheck(), parallel_rounds=parallel_rounds))
+
+    responses = [item["response"] for item in items if "response" in item]
+    assert len(responses) == 12
+    assert all(response.startswith(ERROR_RESPONSE) for response in responses)
+
+
+def wrap_up_with(monkeypatch, content):
+    """Run the consolidated wrap-up on a canned JSON response, counting the per-agent calls it falls back to."""
+    completion = SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+    monkeypatch.setattr(agents, "create_routed_completion", lambda call_site, **kwargs: completion)
+    fallbacks = []
+    monkeypatch.setattr(agents, "complete_text", lambda call_site, **kwargs: fallbacks.append(call_site) or "agent reply")
+
+    transcript = [{"turn": 0, "agent_name": "Alice", "response": "Let's give the intern a mentor."}]
+    return _wrap_up(make_agents(), "How do we handle the intern?", transcript, max_concurrency=4, consolidated=True), fallbacks
+
+
+def test_consolidated_wrap_up_keeps_participants_only(monkeypatch):
+    content = json.dumps({
+        "directions": ["Assign a mentor", "Set weekly goals", "Review in a month"],
+        "preparations": {"Alice": "Find a mentor.", "Bob": "Draft the goals.", "Mallory": "Not in the meeting."},
+    })
+
+    wrap_up, fallbacks = wrap_up_with(monkeypatch, content)
+
+    assert wrap_up["summary"] == "- Assign a mentor\n- Set weekly goals\n- Review in a month"
+    # Carol has no plan in the response, so her agent is asked
+    assert wrap_up["preparations"] == ["Find a mentor.", "Draft the goals.", "agent reply"]
+    assert len(fallbacks) == 1
+
+
+@pytest.mark.parametrize("content", ["not json", json.dumps({"directions": ["Only one"], "preparations": {}})])
+def test_invalid_consolidated_wrap_up_falls_back_to_each_agent(monkeypatch, content):
+    wrap_up, fallbacks = wrap_up_with(monkeypatch, content)
+
+    assert wrap_up == {"summary": "agent reply", "preparations": ["agent reply"] * 3}
+    assert len(fallbacks) == 4
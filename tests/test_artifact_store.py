@@ -0,0 +1,57 @@
+import os
+import time
+
+from utils.artifact_store import ArtifactStore
+
+
+def test_round_trip_returns_the_latest_version(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+
+    assert store.read_latest("m1", "leadership_report") is None
+    store.write("m1", "leadership_report", "first")
+    store.write("m1", "leadership_report", "second")
+
+    assert store.read_latest("m1", "leadership_report") == "second"
+
+
+def test_artifacts_are_keyed_by_participant(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    store.write("m1", "team_member_report", "Alice's report", participant="U1")
+    store.write("m1", "team_member_report", "Bob's report", participant="U2")
+
+    assert store.read_latest("m1", "team_member_report", "U1") == "Alice's report"
+    assert store.read_latest("m1", "team_member_report", "U2") == "Bob's report"
+    assert store.read_latest("m2", "team_member_report", "U1") is None
+
+
+def test_write_leaves_no_temporary_file(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    path = store.write("m1/../m2", "leadership_report", "report")
+
+    assert os.path.dirname(path) == os.path.join(str(tmp_path), "m1-..-m2")
+    assert [name for name in os.listdir(os.path.dirname(path)) if name.endswith(".tmp")] == []
+
+
+def test_prune_keeps_the_latest_versions(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    paths = [store.write("m1", "leadership_report", f"version {i}") for i in range(3)]
+    other = store.write("m1", "team_member_report", "report", participant="U1")
+
+    assert store.prune(keep_versions=2) == 1
+
+    assert [os.path.exists(path) for path in paths] == [False, True, True]
+    assert os.path.exists(other)
+    assert store.read_latest("m1", "leadership_report") == "version 2"
+
+
+def test_prune_deletes_expired_meetings(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    store.write("old", "leadership_report", "report")
+    time.sleep(0.05)
+    store.write("new", "leadership_report", "report")
+
+    store.prune(max_age=0.03)
+
+    assert store.read_latest("old", "leadership_report") is None
+    assert not os.path.exists(os.path.join(str(tmp_path), "old"))
+    assert store.read_latest("new", "leadership_report") == "report"
@@ -0,0 +1,50 @@
+import threading
+
+from utils.context_window import ContextWindow
+
+
+def filled(turns=6):
+    window = ContextWindow(token_budget=10_000, keep_last=2)
+    for i in range(turns):
+        window.add(f"agent {i % 2}", f"message {i}")
+    return window
+
+
+def test_failed_summary_keeps_the_turns():
+    window = filled()
+
+    window.compact(lambda summary, turns: None)
+
+    assert window.summary == ""
+    assert [turn["content"] for turn in window.turns] == [f"message {i}" for i in range(6)]
+
+
+def test_compaction_folds_the_oldest_turns():
+    window = filled()
+
+    window.compact(lambda summary, turns: " ".join(turn["content"] for turn in turns))
+
+    assert window.summary == "message 0 message 1 message 2 message 3"
+    assert [turn["content"] for turn in window.turns] == ["message 4", "message 5"]
+
+
+def test_turns_added_while_summarizing_are_kept():
+    window = filled()
+    started, resume = threading.Event(), threading.Event()
+
+    def summarize(summary, turns):
+        started.set()
+        resume.wait(5)
+        return "summary"
+
+    thread = threading.Thread(target=window.compact, args=(summarize,))
+    thread.start()
+    assert started.wait(5)
+    # Neither blocked by the running compaction nor compacting a second time
+    window.add("agent 0", "message 6")
+    window.compact(lambda summary, turns: "unexpected")
+    resume.set()
+    thread.join(5)
+
+    assert window.summary == "summary"
+    assert [turn["content"] for turn in window.turns] == ["message 4", "message 5", "message 6"]
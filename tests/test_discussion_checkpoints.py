@@ -0,0 +1,60 @@
+import copy
+
+import pytest
+
+from agents import AIAgent, start_discussion
+from utils.discussion_checkpoints import DiscussionCheckpoints, DiscussionLeaseLost
+from utils.session_store import InMemorySessionStore
+
+
+def make_agents():
+    return [AIAgent(name, f"{name} thinks the intern needs clearer goals.") for name in ("Alice", "Bob", "Carol")]
+
+
+def run(agents, checkpoint=None, on_checkpoint=None):
+    return list(start_discussion(agents, "How do we handle the intern?", max_turns=6, checkpoint=checkpoint,
+                                 on_checkpoint=on_checkpoint))
+
+
+def shape(item):
+    return item["agent_name"], sorted(item)
+
+
+def test_released_discussion_is_stale_and_can_be_claimed():
+    checkpoints = DiscussionCheckpoints(InMemorySessionStore(), lease=300)
+    assert checkpoints.claim("m1", "worker-1") == (True, None)
+    checkpoints.save("m1", "worker-1", {"next_turn": 3})
+
+    assert checkpoints.stale() == []
+    assert checkpoints.claim("m1", "worker-2") == (False, None)
+
+    checkpoints.release("m1", "worker-1")
+
+    assert checkpoints.stale() == ["m1"]
+    assert checkpoints.claim("m1", "worker-2") == (True, {"next_turn": 3})
+    with pytest.raises(DiscussionLeaseLost):
+        checkpoints.save("m1", "worker-1", {"next_turn": 4})
+
+
+def test_release_by_a_former_owner_keeps_the_new_owner():
+    checkpoints = DiscussionCheckpoints(InMemorySessionStore(), lease=0)
+    checkpoints.claim("m1", "worker-1")
+    checkpoints.claim("m1", "worker-2")
+
+    checkpoints.release("m1", "worker-1")
+    checkpoints.finish("m1", "worker-2")
+
+    assert checkpoints.stale() == []
+
+
+def test_resumed_discussion_yields_the_remaining_items_only(fake_openai):
+    saved = []
+    full = run(make_agents(), on_checkpoint=lambda state: saved.append(copy.deepcopy(state)))
+    calls = len(fake_openai.calls)
+
+    # Resume after the third item, as if the worker had died there
+    fake_openai.reset()
+    resumed = run(make_agents(), checkpoint=saved[2])
+
+    assert [shape(item) for item in resumed] == [shape(item) for item in full[3:]]
+    assert len(fake_openai.calls) < calls
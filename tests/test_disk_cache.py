@@ -0,0 +1,49 @@
+import time
+
+from utils import metrics
+from utils.disk_cache import DiskCache
+
+
+def lookups(name, result):
+    return metrics.CACHE_LOOKUPS._values.get((name, result), 0)
+
+
+def test_round_trip_counts_hits_and_misses(tmp_path):
+    cache = DiskCache(str(tmp_path / "cache.db"), name="round-trip")
+
+    assert cache.get("key") is None
+    cache.set("key", "value")
+    assert cache.get("key") == "value"
+
+    assert (lookups("round-trip", "hit"), lookups("round-trip", "miss")) == (1, 1)
+
+
+def test_entries_expire_after_the_ttl(tmp_path):
+    cache = DiskCache(str(tmp_path / "cache.db"), ttl=0.05)
+    cache.set("key", "value")
+    time.sleep(0.1)
+
+    assert cache.get("key") is None
+    cache.evict()
+    assert cache._connection().execute("SELECT COUNT(*) FROM cache").fetchone()[0] == 0
+
+
+def test_least_recently_read_entries_are_evicted(tmp_path):
+    cache = DiskCache(str(tmp_path / "cache.db"), max_entries=2)
+    for key in ("a", "b"):
+        cache.set(key, key)
+        time.sleep(0.01)
+    cache.get("a")
+    time.sleep(0.01)
+    cache.set("c", "c")
+
+    cache.evict()
+
+    assert [cache.get(key) for key in ("a", "b", "c")] == ["a", None, "c"]
+
+
+def test_cache_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "cache.db")
+    DiskCache(path).set("key", "value")
+
+    assert DiskCache(path).get("key") == "value"
@@ -0,0 +1,55 @@
+import time
+
+from utils import metrics
+from utils.event_dedup import EventDeduplicator
+
+
+def test_redelivered_event_is_a_duplicate(tmp_path):
+    dedup = EventDeduplicator(str(tmp_path / "events.db"))
+    duplicates = metrics.DUPLICATE_EVENTS._values.get((), 0)
+
+    assert not dedup.is_duplicate("Ev1", "msg-1")
+    assert dedup.is_duplicate("Ev1", "msg-1")
+    assert metrics.DUPLICATE_EVENTS._values[()] == duplicates + 1
+
+
+def test_any_shared_id_makes_a_duplicate(tmp_path):
+    dedup = EventDeduplicator(str(tmp_path / "events.db"))
+
+    assert not dedup.is_duplicate("Ev1", "msg-1")
+    # Slack can deliver the same message as two events with different event IDs
+    assert dedup.is_duplicate("Ev2", "msg-1")
+
+
+def test_empty_ids_are_ignored(tmp_path):
+    dedup = EventDeduplicator(str(tmp_path / "events.db"))
+
+    assert not dedup.is_duplicate(None, "")
+    assert not dedup.is_duplicate(None, "")
+
+
+def test_ids_are_shared_between_instances(tmp_path):
+    path = str(tmp_path / "events.db")
+
+    assert not EventDeduplicator(path).is_duplicate("Ev1")
+    assert EventDeduplicator(path).is_duplicate("Ev1")
+
+
+def test_ids_expire_after_the_window(tmp_path):
+    dedup = EventDeduplicator(str(tmp_path / "events.db"), window=0.05)
+
+    assert not dedup.is_duplicate("Ev1")
+    time.sleep(0.1)
+    assert not dedup.is_duplicate("Ev1")
+
+
+def test_prune_keeps_the_newest_ids(tmp_path):
+    dedup = EventDeduplicator(str(tmp_path / "events.db"), max_entries=2)
+    for event_id in ("Ev1", "Ev2", "Ev3"):
+        dedup.is_duplicate(event_id)
+        time.sleep(0.01)
+
+    dedup.prune()
+
+    assert not dedup.is_duplicate("Ev1")
+    assert dedup.is_duplicate("Ev3")
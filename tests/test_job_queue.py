@@ -0,0 +1,58 @@
+import threading
+import time
+
+import pytest
+
+from utils.job_queue import JobQueueFull, KeyedJobQueue
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def test_jobs_with_the_same_key_run_in_submission_order():
+    queue = KeyedJobQueue(max_workers=4)
+    ran = []
+
+    for i in range(50):
+        queue.submit("user", lambda i=i: (time.sleep(0.001 * (i % 3)), ran.append(i)))
+
+    wait_for(lambda: queue.pending == 0)
+    assert ran == list(range(50))
+
+
+def test_keys_run_concurrently():
+    queue = KeyedJobQueue(max_workers=2)
+    release = threading.Event()
+    ran = []
+
+    queue.submit("slow", release.wait)
+    queue.submit("fast", ran.append, "fast")
+
+    wait_for(lambda: ran == ["fast"])
+    release.set()
+    wait_for(lambda: queue.pending == 0)
+
+
+def test_a_failing_job_does_not_stop_its_key():
+    queue = KeyedJobQueue(max_workers=1)
+    ran = []
+
+    queue.submit("user", lambda: 1 / 0)
+    queue.submit("user", ran.append, "next")
+
+    wait_for(lambda: queue.pending == 0)
+    assert ran == ["next"]
+
+
+def test_full_queue_raises():
+    queue = KeyedJobQueue(max_workers=1, max_pending=1)
+    release = threading.Event()
+
+    queue.submit("user", release.wait)
+    with pytest.raises(JobQueueFull):
+        queue.submit("other", release.wait)
+    release.set()
@@ -0,0 +1,37 @@
+from meeting import Meeting
+
+
+def test_participants_with_the_same_name_get_unique_agent_names():
+    meeting = Meeting("meeting", leader_id="U1")
+    meeting.add_participant("U1", "Alex Kim", "D1")
+    meeting.add_participant("U2", "Alex Kim", "D2")
+    meeting.add_participant("U3", "Sam Lee", "D3")
+
+    names = [meeting.participants[user]["agent_name"] for user in meeting.participant_ids()]
+
+    assert names == ["Alex Kim", "Alex Kim (2)", "Sam Lee"]
+    assert [meeting.user_for_name(name) for name in names] == ["U1", "U2", "U3"]
+
+
+def test_agent_names_survive_a_round_trip_after_a_removal():
+    meeting = Meeting("meeting", leader_id="U1")
+    meeting.add_participant("U1", "Alex Kim", "D1")
+    meeting.add_participant("U2", "Alex Kim", "D2")
+    meeting.remove_participant("U1")
+
+    restored = Meeting.from_dict(meeting.to_dict())
+
+    assert restored.participants["U2"]["agent_name"] == "Alex Kim (2)"
+    assert restored.user_for_name("Alex Kim (2)") == "U2"
+    assert restored.user_for_name("Alex Kim") is None
+
+
+def test_refreshing_a_participant_keeps_their_agent_name():
+    meeting = Meeting("meeting", leader_id="U1")
+    meeting.add_participant("U1", "Alex Kim", "D1")
+    meeting.add_participant("U2", "Alex Kim", "D2")
+    meeting.add_participant("U2", "Alex Kim", "D2", thread_ts="1.0")
+
+    assert meeting.participants["U2"]["agent_name"] == "Alex Kim (2)"
+    assert meeting.participants["U2"]["thread_ts"] == "1.0"
+    assert meeting.user_for_name("Alex Kim") == "U1"
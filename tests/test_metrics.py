@@ -0,0 +1,68 @@
+import pytest
+
+from utils import metrics
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    """Register the metrics of a test apart from the app's."""
+    monkeypatch.setattr(metrics, "REGISTRY", [])
+    return metrics.REGISTRY
+
+
+def test_counter_exposition(registry):
+    counter = metrics.Counter("test_requests_total", "Requests by outcome", labels=("outcome",))
+    counter.inc(outcome="ok")
+    counter.inc(2, outcome="error")
+
+    assert metrics.render() == (
+        "# HELP test_requests_total Requests by outcome\n"
+        "# TYPE test_requests_total counter\n"
+        'test_requests_total{outcome="error"} 2\n'
+        'test_requests_total{outcome="ok"} 1\n'
+    )
+
+
+def test_label_values_are_escaped(registry):
+    counter = metrics.Counter("test_errors_total", "Errors", labels=("error",))
+    counter.inc(error='bad "quote"\\\nline')
+
+    assert 'test_errors_total{error="bad \\"quote\\"\\\\\\nline"} 1' in metrics.render().splitlines()
+
+
+def test_histogram_buckets_are_cumulative(registry):
+    histogram = metrics.Histogram("test_duration_seconds", "Durations", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 5.0):
+        histogram.observe(value)
+
+    assert metrics.render().splitlines()[2:] == [
+        'test_duration_seconds_bucket{le="0.1"} 1',
+        'test_duration_seconds_bucket{le="1.0"} 3',
+        'test_duration_seconds_bucket{le="+Inf"} 4',
+        "test_duration_seconds_sum 6.25",
+        "test_duration_seconds_count 4",
+    ]
+
+
+def test_gauge_reads_its_callback_when_rendered(registry):
+    pending = [3]
+    metrics.Gauge("test_pending", "Pending jobs", lambda: pending[0])
+    pending[0] = 5
+
+    assert metrics.render().splitlines() == ["# HELP test_pending Pending jobs", "# TYPE test_pending gauge", "test_pending 5"]
+
+
+def test_wrong_labels_are_rejected(registry):
+    counter = metrics.Counter("test_calls_total", "Calls", labels=("method",))
+
+    with pytest.raises(ValueError):
+        counter.inc(channel="C1")
+
+
+def test_openai_usage_records_tokens_and_cost():
+    key = ("usage-test", "gpt-4o-mini")
+    metrics.record_openai_usage(*key, prompt_tokens=1_000_000, completion_tokens=2_000_000)
+
+    assert metrics.OPENAI_TOKENS._values[key + ("prompt",)] == 1_000_000
+    assert metrics.OPENAI_TOKENS._values[key + ("completion",)] == 2_000_000
+    assert metrics.OPENAI_COST._values[key] == pytest.approx(0.15 + 1.20)
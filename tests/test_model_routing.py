@@ -0,0 +1,110 @@
+import logging
+import time
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+
+from utils import model_routing
+from utils.model_routing import ModelRouter, Route
+
+REQUEST = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+
+
+def slow_stream(delay):
+    for chunk in ("a", "b", "c"):
+        time.sleep(delay)
+        yield chunk
+
+
+def completion(content="ok", finish_reason="stop"):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content), finish_reason=finish_reason)])
+
+
+class FakeBackend:
+    """Stands in for create_chat_completion, failing or sleeping on some models."""
+    def __init__(self, errors=None, delays=None):
+        self.errors = errors or {}
+        self.delays = delays or {}
+        self.calls = []
+
+    def __call__(self, **kwargs):
+        self.calls.append(kwargs)
+        time.sleep(self.delays.get(kwargs["model"], 0))
+        if kwargs["model"] in self.errors:
+            raise self.errors[kwargs["model"]]
+        return completion()
+
+    @property
+    def models(self):
+        return [call["model"] for call in self.calls]
+
+
+def router(monkeypatch, backend, **kwargs):
+    monkeypatch.setattr(model_routing, "create_chat_completion", backend)
+    return ModelRouter({"site": Route("primary", slo=0.05, fallback=Route("fallback"))}, **kwargs)
+
+
+def test_stream_latency_excludes_the_consumer(monkeypatch):
+    monkeypatch.setattr(model_routing, "create_chat_completion", lambda **kwargs: slow_stream(0.01))
+    router = ModelRouter({"site": Route("model", slo=1, fallback=Route("model"))})
+
+    for _ in router.create("site", stream=True, messages=[]):
+        time.sleep(0.2)
+
+    assert 0.03 <= router._latency["site"] < 0.2
+
+
+def test_slo_breach_degrades_to_the_fallback_until_the_cooldown_ends(monkeypatch):
+    backend = FakeBackend(delays={"primary": 0.1})
+    routing = router(monkeypatch, backend, cooldown=0.2)
+
+    routing.create("site", messages=[])
+    routing.create("site", messages=[])
+    assert routing.select("site")[1:] == ("fallback", "slo")
+
+    time.sleep(0.25)
+    routing.create("site", messages=[])
+
+    assert backend.models == ["primary", "fallback", "primary"]
+
+
+def test_fast_route_stays_primary(monkeypatch):
+    backend = FakeBackend()
+    routing = router(monkeypatch, backend)
+
+    for _ in range(3):
+        routing.create("site", messages=[])
+
+    assert backend.models == ["primary"] * 3
+
+
+def test_timeout_falls_back_without_retrying_the_primary(monkeypatch):
+    backend = FakeBackend(errors={"primary": openai.APITimeoutError(request=REQUEST)})
+    routing = router(monkeypatch, backend)
+
+    assert routing.create("site", messages=[]).choices[0].message.content == "ok"
+
+    assert backend.models == ["primary", "fallback"]
+    assert [call["retry_timeouts"] for call in backend.calls] == [False, True]
+
+
+def test_other_errors_do_not_fall_back(monkeypatch):
+    error = openai.InternalServerError("boom", response=httpx.Response(500, request=REQUEST), body=None)
+    backend = FakeBackend(errors={"primary": error})
+    routing = router(monkeypatch, backend)
+
+    with pytest.raises(openai.InternalServerError):
+        routing.create("site", messages=[])
+
+    assert backend.models == ["primary"]
+
+
+def test_truncated_response_is_logged(monkeypatch, caplog):
+    monkeypatch.setattr(model_routing, "create_routed_completion", lambda call_site, **kwargs: completion("cut", "length"))
+
+    with caplog.at_level(logging.WARNING, logger=model_routing.__name__):
+        assert model_routing.complete_text("site", messages=[]) == "cut"
+
+    assert "cut off" in caplog.text
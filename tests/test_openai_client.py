@@ -0,0 +1,50 @@
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+
+from utils import openai_client
+from utils.disk_cache import DiskCache
+
+
+def rate_limited(headers):
+    return SimpleNamespace(response=SimpleNamespace(headers=headers))
+
+
+def test_retry_after_longer_than_the_backoff_cap_is_honored():
+    delay = openai_client._retry_delay(rate_limited({"retry-after": "120"}), attempt=0)
+
+    assert 120 <= delay <= 120 + openai_client.BASE_RETRY_DELAY
+
+
+def test_backoff_is_capped():
+    delay = openai_client._retry_delay(rate_limited({}), attempt=20)
+
+    assert delay <= openai_client.MAX_RETRY_DELAY
+
+
+def test_timeouts_are_not_retried_when_asked(monkeypatch):
+    monkeypatch.setattr(openai_client.time, "sleep", lambda seconds: None)
+    calls = []
+
+    def call():
+        calls.append(1)
+        raise openai.APITimeoutError(request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions"))
+
+    for retry_timeouts, attempts in ((False, 1), (True, openai_client.MAX_ATTEMPTS)):
+        calls.clear()
+        with pytest.raises(openai.APITimeoutError):
+            openai_client.with_retries(call, retry_timeouts=retry_timeouts)
+        assert len(calls) == attempts
+
+
+def test_only_requests_at_temperature_0_are_cached(fake_openai, monkeypatch, tmp_path):
+    monkeypatch.setattr(openai_client, "_response_cache", DiskCache(str(tmp_path / "llm.db")))
+    messages = [{"role": "user", "content": "Summarize the discussion."}]
+
+    for temperature, requests in ((0, 1), (0.7, 2)):
+        fake_openai.reset()
+        for _ in range(2):
+            openai_client.create_chat_completion(cache=True, model="gpt-4o-mini", messages=messages, temperature=temperature)
+        assert len(fake_openai.calls) == requests
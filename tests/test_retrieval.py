@@ -0,0 +1,54 @@
+from utils import retrieval
+from utils.retrieval import ChunkIndex, chunk_text, relevant_context
+
+CHUNKS = [
+    "The intern joined the data team in March.",
+    "Deadlines slipped on the dashboard project twice.",
+    "Code reviews show the intern rarely writes tests.",
+    "The team lunch moved to Thursdays.",
+]
+
+
+def test_search_ranks_passages_by_shared_terms():
+    index = ChunkIndex(CHUNKS)
+
+    assert index.search("missed deadlines on the dashboard", 2) == [1]
+    assert index.search("intern tests", 2) == [2, 0]
+
+
+def test_search_ignores_stopwords_and_unknown_terms():
+    index = ChunkIndex(CHUNKS)
+
+    assert index.search("the of and", 3) == []
+    assert index.search("budget forecast", 3) == []
+    assert index.search("intern", 0) == []
+
+
+def test_rare_terms_outweigh_common_ones():
+    index = ChunkIndex(CHUNKS)
+
+    # "intern" is in two passages, "lunch" in one
+    assert index.search("intern lunch", 1) == [3]
+
+
+def test_passages_keep_the_opening_and_document_order():
+    index = ChunkIndex(CHUNKS)
+
+    assert index.passages("lunch", 1) == "\n...\n".join([CHUNKS[0], CHUNKS[3]])
+
+
+def test_chunks_do_not_break_sentences():
+    text = "One two three. Four five six. Seven eight nine."
+
+    assert chunk_text(text, chunk_words=6) == ["One two three. Four five six.", "Seven eight nine."]
+
+
+def test_short_documents_are_sent_whole(monkeypatch):
+    monkeypatch.setattr(retrieval, "_indexes", retrieval.OrderedDict())
+    counted = []
+    monkeypatch.setattr(retrieval, "count_tokens", lambda text: counted.append(text) or 10)
+
+    assert relevant_context("A short report.", "anything") == "A short report."
+    assert relevant_context("A short report.", "something else") == "A short report."
+    # The length of a document is only counted once
+    assert counted == ["A short report."]
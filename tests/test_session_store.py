@@ -0,0 +1,38 @@
+import pytest
+
+from utils.session_store import InMemorySessionStore, SessionStore, SQLiteSessionStore, StaleStateError
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return InMemorySessionStore()
+    return SQLiteSessionStore(str(tmp_path / "sessions.db"))
+
+
+def test_interface_cannot_be_instantiated():
+    with pytest.raises(TypeError):
+        SessionStore()
+
+
+def test_update_replaces_the_state(store):
+    store.put("U1", {"step": None, "version": 1})
+
+    state = store.update("U1", lambda current: {**current, "version": current["version"] + 1})
+
+    assert state == {"step": None, "version": 2}
+    assert store.get("U1") == state
+
+
+def test_stale_update_leaves_the_state_unchanged(store):
+    store.put("U1", {"step": "initialize_discussion", "version": 2})
+
+    def apply(current):
+        if current["version"] != 1:
+            raise StaleStateError("changed")
+        return {"step": "ask_clarifying_questions", "version": 2}
+
+    with pytest.raises(StaleStateError):
+        store.update("U1", apply)
+
+    assert store.get("U1") == {"step": "initialize_discussion", "version": 2}
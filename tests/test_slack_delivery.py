@@ -0,0 +1,86 @@
+import time
+
+import pytest
+from slack_sdk.errors import SlackApiError
+
+from utils.slack_delivery import RateLimitedSlackClient, TokenBucket, _retry_after, deliver_concurrently
+
+
+class Response(dict):
+    def __init__(self, error, headers=None):
+        super().__init__(ok=False, error=error)
+        self.headers = headers or {}
+
+
+class FlakyClient:
+    """Answers chat_postMessage, rate limited for the first `limited` calls."""
+    def __init__(self, limited=0, error="ratelimited"):
+        self.limited = limited
+        self.error = error
+        self.calls = 0
+
+    def chat_postMessage(self, **kwargs):
+        self.calls += 1
+        if self.calls <= self.limited:
+            raise SlackApiError(self.error, Response(self.error, {"Retry-After": "0.05"}))
+        return {"ok": True, "channel": kwargs["channel"]}
+
+
+def test_bucket_allows_a_burst_then_refills_at_its_rate():
+    bucket = TokenBucket(rate_per_minute=600, capacity=2)
+
+    start = time.monotonic()
+    for _ in range(3):
+        bucket.acquire()
+
+    # Two tokens are available at once, the third one is refilled after 1/10s
+    assert 0.08 <= time.monotonic() - start < 0.3
+
+
+def test_paused_bucket_hands_out_nothing():
+    bucket = TokenBucket(rate_per_minute=6000)
+    bucket.pause(0.1)
+
+    start = time.monotonic()
+    bucket.acquire()
+
+    assert time.monotonic() - start >= 0.09
+
+
+def test_rate_limited_call_is_retried_after_the_delay():
+    client = RateLimitedSlackClient(FlakyClient(limited=1))
+
+    start = time.monotonic()
+    assert client.chat_postMessage(channel="C1", text="hi")["ok"]
+
+    assert client.client.calls == 2
+    assert time.monotonic() - start >= 0.04
+
+
+def test_other_errors_are_raised_right_away():
+    client = RateLimitedSlackClient(FlakyClient(limited=1, error="channel_not_found"))
+
+    with pytest.raises(SlackApiError):
+        client.chat_postMessage(channel="C1", text="hi")
+    assert client.client.calls == 1
+
+
+def test_each_channel_has_its_own_post_message_bucket():
+    client = RateLimitedSlackClient(FlakyClient())
+
+    assert client._bucket("chat_postMessage", "C1") is not client._bucket("chat_postMessage", "C2")
+    assert client._bucket("users_info", "C1") is client._bucket("users_info", "C2")
+
+
+def test_retry_after_header_is_read_whatever_its_case():
+    assert _retry_after({"retry-after": "3"}) == 3.0
+    assert _retry_after({"Retry-After": ["7"]}) == 7.0
+    assert _retry_after({}) == 1.0
+
+
+def test_deliveries_report_each_recipients_error():
+    def send(recipient):
+        if recipient == "U2":
+            raise SlackApiError("failed", Response("user_not_found"))
+
+    assert deliver_concurrently(send, ["U1", "U2"]) == {"U1": None, "U2": "user_not_found"}
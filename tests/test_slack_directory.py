@@ -0,0 +1,76 @@
+import time
+from collections import Counter
+
+from utils.slack_directory import SlackDirectory
+
+
+class FakeSlack:
+    """Answers the lookups SlackDirectory makes, counting calls by method."""
+    def __init__(self, users=("U1", "U2")):
+        self.users = list(users)
+        self.calls = Counter()
+
+    def auth_test(self):
+        self.calls["auth_test"] += 1
+        return {"user_id": "UBOT"}
+
+    def users_info(self, user):
+        self.calls["users_info"] += 1
+        return {"user": {"id": user, "real_name": f"Name {user}"}}
+
+    def conversations_open(self, users, return_im):
+        self.calls["conversations_open"] += 1
+        return {"channel": {"id": f"D{users[0]}"}}
+
+    def users_list(self, limit, cursor=None):
+        self.calls["users_list"] += 1
+        return {"members": [{"id": user, "real_name": f"Name {user}"} for user in self.users]}
+
+    def conversations_list(self, limit, types, cursor=None):
+        self.calls["conversations_list"] += 1
+        return {"channels": [{"id": f"D{user}", "user": user} for user in self.users]}
+
+
+def test_lookups_are_cached():
+    slack = FakeSlack()
+    directory = SlackDirectory(slack)
+
+    for _ in range(3):
+        assert directory.real_name("U1") == "Name U1"
+        assert directory.dm_channel("U1") == "DU1"
+        assert directory.bot_user_id() == "UBOT"
+
+    assert slack.calls == {"users_info": 1, "conversations_open": 1, "auth_test": 1}
+
+
+def test_entries_expire_after_the_ttl():
+    slack = FakeSlack()
+    directory = SlackDirectory(slack, ttl=0.05)
+
+    directory.real_name("U1")
+    time.sleep(0.1)
+    directory.real_name("U1")
+
+    assert slack.calls["users_info"] == 2
+
+
+def test_prefetching_a_few_users_looks_them_up_one_by_one():
+    slack = FakeSlack()
+    directory = SlackDirectory(slack)
+
+    directory.prefetch(["U1", "U2", "U1"])
+    directory.real_name("U2")
+
+    assert slack.calls == {"users_info": 2, "conversations_open": 2}
+
+
+def test_prefetching_many_users_lists_the_workspace_once():
+    users = [f"U{i}" for i in range(SlackDirectory.BULK_THRESHOLD + 1)]
+    slack = FakeSlack(users)
+    directory = SlackDirectory(slack)
+
+    directory.prefetch(users)
+    directory.prefetch(users + ["U404"])
+
+    assert slack.calls == {"users_list": 1, "conversations_list": 1, "users_info": 1, "conversations_open": 1}
+    assert directory.dm_channel(users[-1]) == f"D{users[-1]}"
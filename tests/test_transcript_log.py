@@ -0,0 +1,90 @@
+import pytest
+
+from utils import transcript_log
+from utils.transcript_log import TranscriptHistory, TranscriptLog
+
+
+@pytest.fixture
+def log(tmp_path, monkeypatch):
+    log = TranscriptLog(str(tmp_path / "transcripts"))
+    monkeypatch.setattr(transcript_log, "_log", log)
+    return log
+
+
+def message(content, role="user"):
+    return {"role": role, "content": content}
+
+
+def test_append_after_round_trip_adds_message_once(log):
+    history = TranscriptHistory("meeting", "U1")
+    history.reset([message("s", "system"), message("u1")])
+    history.append(message("a1", "assistant"))
+
+    restored = TranscriptHistory.from_dict(history.to_dict())
+    restored.append(message("u2"))
+
+    assert [m["content"] for m in restored.messages] == ["s", "u1", "a1", "u2"]
+    assert [m["content"] for m in log.read("meeting", "U1")] == ["s", "u1", "a1", "u2"]
+
+
+def test_round_trip_loads_messages_lazily(log):
+    history = TranscriptHistory("meeting", "U1")
+    history.reset([message("s", "system"), message("u1")])
+
+    restored = TranscriptHistory.from_dict(history.to_dict())
+
+    assert restored._messages is None
+    assert restored.messages == history.messages
+
+
+def test_uncommitted_messages_are_dropped_on_append(log):
+    history = TranscriptHistory("meeting", "U1")
+    history.reset([message("s", "system")])
+    saved = history.to_dict()
+    # A step that crashed before its state was saved
+    history.append(message("lost"))
+
+    restored = TranscriptHistory.from_dict(saved)
+    restored.append(message("u1"))
+
+    assert [m["content"] for m in log.read("meeting", "U1")] == ["s", "u1"]
+
+
+def test_participants_with_the_same_name_keep_separate_transcripts(log):
+    first = TranscriptHistory("meeting", "U1")
+    second = TranscriptHistory("meeting", "U2")
+    first.reset([message("first")])
+    second.reset([message("second")])
+    first.append(message("first again"))
+
+    assert [m["content"] for m in log.read("meeting", "U1")] == ["first", "first again"]
+    assert [m["content"] for m in log.read("meeting", "U2")] == ["second"]
+
+
+def test_reads_do_not_create_directories(log, tmp_path):
+    assert log.count("missing", "U1") == 0
+    assert log.read("missing", "U1") == []
+    assert not (tmp_path / "transcripts" / "missing").exists()
+
+
+def test_tail_and_compaction(log):
+    for i in range(5):
+        log.append("meeting", "U1", message(str(i)))
+
+    assert [m["content"] for m in log.tail("meeting", "U1", 2)] == ["3", "4"]
+
+    assert log.compact(compress_after=-1) == 1
+    assert [m["content"] for m in log.read("meeting", "U1", 1, 3)] == ["1", "2"]
+
+    log.append("meeting", "U1", message("5"))
+    assert log.count("meeting", "U1") == 6
+
+
+def test_unlogged_history_serializes_its_messages():
+    history = TranscriptHistory()
+    history.reset([message("s", "system")])
+    history.append(message("u1"))
+
+    restored = TranscriptHistory.from_dict(history.to_dict())
+
+    assert [m["content"] for m in restored.messages] == ["s", "u1"]
@@ -0,0 +1,88 @@
+from turn_scheduler import ERROR_RESPONSE, AddressedScheduler, ConvergenceCheck, TurnScheduler, order_drafts
+
+NAMES = ["Alice", "Bob", "Carol"]
+
+
+def entry(agent_name, response):
+    return {"agent_name": agent_name, "response": response}
+
+
+def test_repeated_response_converges():
+    transcript = [
+        entry("Alice", "We should ship the onboarding flow first and test it with two customers."),
+        entry("Bob", "What about the billing migration?"),
+        entry("Alice", "We should ship the onboarding flow first and test it with two customers."),
+    ]
+
+    assert ConvergenceCheck().converged(transcript, agent_count=2)
+
+
+def test_agreeing_round_converges():
+    transcript = [entry("Alice", "Let's start with the API."), entry("Bob", "Sounds good."), entry("Alice", "Agreed.")]
+
+    assert ConvergenceCheck().converged(transcript, agent_count=2)
+
+
+def test_repeated_errors_do_not_converge():
+    transcript = [entry("Alice", "Let's start with the API.")] + [
+        entry(name, f"{ERROR_RESPONSE}: Request timed out.") for name in ("Bob", "Alice", "Bob")
+    ]
+
+    assert not ConvergenceCheck().converged(transcript, agent_count=2)
+
+
+def test_errors_are_skipped_when_comparing_responses():
+    transcript = [
+        entry("Alice", "We should ship the onboarding flow first and test it with two customers."),
+        entry("Bob", f"{ERROR_RESPONSE}: Request timed out."),
+        entry("Alice", "What does the team think about the billing migration?"),
+    ]
+
+    assert not ConvergenceCheck().converged(transcript, agent_count=2)
+
+
+def test_drafts_follow_the_scheduler():
+    transcript = [entry("Alice", "Let's pick a launch date.")]
+    drafts = [entry("Alice", "Next week works."), entry("Bob", "I need two weeks."), entry("Carol", "Friday?")]
+
+    ordered = order_drafts(drafts, transcript, NAMES, TurnScheduler())
+
+    assert [draft["agent_name"] for draft in ordered] == ["Bob", "Carol", "Alice"]
+
+
+def test_addressed_agent_answers_first():
+    transcript = [entry("Alice", "Carol, can your team take the migration?")]
+    drafts = [entry("Alice", "Waiting on Carol."), entry("Bob", "I can help too."), entry("Carol", "Yes, next sprint.")]
+
+    ordered = order_drafts(drafts, transcript, NAMES, AddressedScheduler())
+
+    assert ordered[0]["agent_name"] == "Carol"
+
+
+def test_near_duplicate_drafts_are_dropped():
+    transcript = [entry("Alice", "We should ship the onboarding flow first and test it with two customers.")]
+    drafts = [
+        entry("Bob", "We should ship the onboarding flow first and test it with two customers."),
+        entry("Carol", "The billing migration has a hard deadline in March."),
+        entry("Alice", "The billing migration has a hard deadline in March."),
+    ]
+
+    ordered = order_drafts(drafts, transcript, NAMES, TurnScheduler())
+
+    assert [draft["agent_name"] for draft in ordered] == ["Carol"]
+    assert len(order_drafts(drafts, transcript, NAMES, TurnScheduler(), drop_duplicates=False)) == 3
+
+
+def test_one_draft_is_always_kept():
+    transcript = [entry("Alice", "Sounds good to me, let's go with it.")]
+    drafts = [entry("Bob", "Sounds good to me, let's go with it.")]
+
+    assert order_drafts(drafts, transcript, NAMES, TurnScheduler()) == drafts
+
+
+def test_error_drafts_are_never_dropped():
+    error = f"{ERROR_RESPONSE}: Request timed out."
+    transcript = [entry("Alice", error)]
+    drafts = [entry(name, error) for name in NAMES]
+
+    assert len(order_drafts(drafts, transcript, NAMES, TurnScheduler())) == 3
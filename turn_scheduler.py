@@ -0,0 +1,231 @@
+import re
+from typing import Dict, List, Optional, Sequence
+
+# Phrases marking a response that goes along with the previous ones
+AGREEMENT_PATTERN = re.compile(
+    r"\b(i agree|agreed|totally agree|fully agree|same here|sounds good|makes sense|exactly|"
+    r"good point|fair point|on board|let'?s go with|that works|i'?m in|no objection|couldn'?t agree more)\b",
+    re.IGNORECASE,
+)
+
+# Start of the response an agent falls back to when generating one fails
+ERROR_RESPONSE = "I encountered an error"
+
+_WORD_PATTERN = re.compile(r"[a-z0-9']+")
+
+
+class TurnScheduler:
+    """
+    Picks the agent speaking next in a discussion.
+
+    The default implementation goes round-robin, in the order of the agents.
+    """
+    def next_speaker(self, names: Sequence[str], transcript: List[Dict]) -> int:
+        """
+        Pick the next speaker.
+
+        Args:
+            names: Names of the agents, in their original order
+            transcript: Responses so far, as yielded by `start_discussion`
+
+        Returns:
+            Index of the next speaker in `names`
+        """
+        if not transcript:
+            return 0
+        return (names.index(transcript[-1]["agent_name"]) + 1) % len(names)
+
+
+class LeastSpokenScheduler(TurnScheduler):
+    """Gives the turn to the agent who has spoken least, going round-robin between ties."""
+    def next_speaker(self, names: Sequence[str], transcript: List[Dict]) -> int:
+        counts = {name: 0 for name in names}
+        for entry in transcript:
+            counts[entry["agent_name"]] += 1
+
+        # Scan from the agent after the last speaker, so ties are broken round-robin
+        start = super().next_speaker(names, transcript)
+        order = [(start + offset) % len(names) for offset in range(len(names))]
+        return min(order, key=lambda index: counts[names[index]])
+
+
+class AddressedScheduler(LeastSpokenScheduler):
+    """
+    Gives the turn to the agent the last response addressed by name, so questions get answered.
+
+    When nobody else is named, or the addressed agent already spoke `max_lead`
+    turns more than the quietest one, the agent who has spoken least speaks
+    next. This keeps two agents from monopolizing the discussion.
+    """
+    def __init__(self, max_lead: int = 2):
+        """
+        Initialize the scheduler.
+
+        Args:
+            max_lead: How many more turns than the quietest agent an addressed agent may have
+        """
+        self.max_lead = max_lead
+
+    def next_speaker(self, names: Sequence[str], transcript: List[Dict]) -> int:
+        if transcript:
+            addressed = addressed_agent(transcript[-1]["response"], names, exclude=transcript[-1]["agent_name"])
+            if addressed is not None:
+                counts = {name: 0 for name in names}
+                for entry in transcript:
+                    counts[entry["agent_name"]] += 1
+                if counts[names[addressed]] - min(counts.values()) < self.max_lead:
+                    return addressed
+        return super().next_speaker(names, transcript)
+
+
+def addressed_agent(text: str, names: Sequence[str], exclude: Optional[str] = None) -> Optional[int]:
+    """
+    Find the agent a message speaks to, by the first full or first name it mentions.
+
+    Args:
+        text: The message
+        names: Names of the agents
+        exclude: Name of the message's author, who can't address themselves
+
+    Returns:
+        Index of the addressed agent in `names`, or None if no other agent is mentioned
+    """
+    first_mention = None
+    for index, name in enumerate(names):
+        if name == exclude:
+            continue
+        for alias in dict.fromkeys([name, name.split()[0]]):
+            match = re.search(rf"(?<!\w){re.escape(alias)}(?!\w)", text, re.IGNORECASE)
+            if match and (first_mention is None or match.start() < first_mention[0]):
+                first_mention = (match.start(), index)
+    return first_mention[1] if first_mention else None
+
+
+class ConvergenceCheck:
+    """
+    Detects when a discussion has stopped moving forward, using only the responses' text.
+
+    The discussion has converged when the last response nearly repeats one
+    of the recent ones, or when a full round of agents in a row agreed
+    without asking anything. Error fallbacks are left out, so failing
+    requests never look like agents repeating themselves.
+    """
+    def __init__(self, similarity_threshold: float = 0.7, window: int = 6, min_turns: Optional[int] = None):
+        """
+        Initialize the check.
+
+        Args:
+            similarity_threshold: Word-bigram Jaccard similarity above which two responses are near-duplicates
+            window: Number of previous responses the last one is compared to
+            min_turns: Turns before the check may fire, by default one per agent
+        """
+        self.similarity_threshold = similarity_threshold
+        self.window = window
+        self.min_turns = min_turns
+
+    def converged(self, transcript: List[Dict], agent_count: int) -> bool:
+        """
+        Check whether the discussion should wrap up.
+
+        Args:
+            transcript: Responses so far, as yielded by `start_discussion`
+            agent_count: Number of agents in the discussion
+
+        Returns:
+            True if the discussion has converged
+        """
+        if transcript and transcript[-1]["response"].startswith(ERROR_RESPONSE):
+            return False
+        responses = [entry["response"] for entry in transcript if not entry["response"].startswith(ERROR_RESPONSE)]
+        if len(responses) < (self.min_turns if self.min_turns is not None else agent_count):
+            return False
+
+        if near_duplicate(responses[-1], responses[-self.window - 1:-1], self.similarity_threshold):
+            return True
+
+        round_ = responses[-max(agent_count, 2):]
+        return len(round_) >= 2 and all(AGREEMENT_PATTERN.search(response) and "?" not in response for response in round_)
+
+
+def near_duplicate(text: str, others: Sequence[str], threshold: float = 0.7) -> bool:
+    """
+    Check whether a response nearly repeats any of `others`.
+
+    Args:
+        text: The response
+        others: Responses to compare it to
+        threshold: Word-bigram Jaccard similarity above which two responses are near-duplicates
+
+    Returns:
+        True if the response is a near-duplicate of one of `others`
+    """
+    shingles = _shingles(text)
+    return any(similarity(shingles, _shingles(other)) >= threshold for other in others)
+
+
+def order_drafts(drafts: List[Dict], transcript: List[Dict], names: Sequence[str], scheduler: TurnScheduler,
+                 drop_duplicates: bool = True, threshold: float = 0.7, window: int = 6) -> List[Dict]:
+    """
+    Choose which of a round's concurrent drafts enter the transcript, and in which order.
+
+    The drafts are ordered as if the scheduler picked the speakers one turn
+    at a time, so e.g. an agent addressed by the last response answers
+    first. Drafts nearly repeating a recent response or an earlier draft of
+    the round are dropped, but at least one draft is always kept. Error
+    fallbacks are neither dropped nor compared to.
+
+    Args:
+        drafts: One draft per agent, as dicts with "agent_name" and "response"
+        transcript: Responses so far, as yielded by `start_discussion`
+        names: Names of the agents, in their original order
+        scheduler: Scheduler picking the order
+        drop_duplicates: Whether to drop near-duplicates
+        threshold: Word-bigram Jaccard similarity above which two responses are near-duplicates
+        window: Number of recent responses a draft is compared to
+
+    Returns:
+        The selected drafts, in order
+    """
+    remaining = {draft["agent_name"]: draft for draft in drafts}
+    ordered = []
+    while remaining:
+        index = scheduler.next_speaker(names, transcript + ordered)
+        # Agents whose draft is already placed can't speak again this round, so take the next one that can
+        name = next(names[(index + offset) % len(names)] for offset in range(len(names))
+                    if names[(index + offset) % len(names)] in remaining)
+        ordered.append(remaining.pop(name))
+
+    if not drop_duplicates:
+        return ordered
+    recent = [entry["response"] for entry in transcript[-window:] if not entry["response"].startswith(ERROR_RESPONSE)]
+    selected = []
+    for draft in ordered:
+        if draft["response"].startswith(ERROR_RESPONSE):
+            selected.append(draft)
+        elif not near_duplicate(draft["response"], recent, threshold):
+            selected.append(draft)
+            recent.append(draft["response"])
+    return selected or ordered[:1]
+
+
+def similarity(a: set, b: set) -> float:
+    """Jaccard similarity of two sets, 0 when both are empty."""
+    if not a and not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _shingles(text: str) -> set:
+    """Word bigrams of a text, or its single word."""
+    words = _WORD_PATTERN.findall(text.lower())
+    if len(words) < 2:
+        return set(words)
+    return set(zip(words, words[1:]))
+
+
+# Schedulers by the name used in the configuration
+SCHEDULERS = {
+    "round_robin": TurnScheduler,
+    "least_spoken": LeastSpokenScheduler,
+    "addressed": AddressedScheduler,
+}
@@ -0,0 +1,170 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from typing import Optional
+
+from utils.paths import safe_name
+
+
+class ArtifactStore:
+    """
+    Stores reports and conversation contexts on disk, indexed by meeting.
+
+    Every artifact is identified by a meeting ID, a kind (e.g. "leadership_report")
+    and an optional participant, the Slack user ID of the person it is about.
+    Files are written atomically under `root/<meeting_id>/`, and a SQLite
+    index gives the latest version of an artifact without listing the
+    directory.
+    """
+    def __init__(self, root: str):
+        """
+        Initialize the store, creating the directory and index if needed.
+
+        Args:
+            root: Directory holding the artifacts and their index
+        """
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._local = threading.local()
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS artifacts ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, meeting_id TEXT NOT NULL, kind TEXT NOT NULL, "
+            "participant TEXT NOT NULL, path TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS artifacts_key ON artifacts (meeting_id, kind, participant, id)"
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return this thread's connection to the index."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(os.path.join(self.root, "index.db"), timeout=30, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def write(self, meeting_id: str, kind: str, content: str, participant: str = "") -> str:
+        """
+        Atomically write a new version of an artifact.
+
+        Args:
+            meeting_id: Meeting the artifact belongs to
+            kind: Artifact kind, e.g. "team_member_report"
+            content: Text content of the artifact
+            participant: Slack user ID of the participant the artifact is about, if any
+
+        Returns:
+            Path of the written file
+        """
+        directory = os.path.join(self.root, safe_name(meeting_id))
+        os.makedirs(directory, exist_ok=True)
+
+        timestamp = time.strftime("%Y%m%d-%H%M%S")
+        name = "_".join(part for part in (kind, safe_name(participant), timestamp, uuid.uuid4().hex[:8]) if part)
+        path = os.path.join(directory, f"{name}.txt")
+
+        # Write to a temporary file first so readers never see a partial artifact
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+        self._connection().execute(
+            "INSERT INTO artifacts (meeting_id, kind, participant, path, created_at) VALUES (?, ?, ?, ?, ?)",
+            (meeting_id, kind, participant, path, time.time())
+        )
+        return path
+
+    def latest_path(self, meeting_id: str, kind: str, participant: str = "") -> Optional[str]:
+        """
+        Find the latest version of an artifact.
+
+        Returns:
+            Path of the artifact file, or None if it was never written
+        """
+        row = self._connection().execute(
+            "SELECT path FROM artifacts WHERE meeting_id = ? AND kind = ? AND participant = ? "
+            "ORDER BY id DESC LIMIT 1",
+            (meeting_id, kind, participant)
+        ).fetchone()
+        return row[0] if row else None
+
+    def read_latest(self, meeting_id: str, kind: str, participant: str = "") -> Optional[str]:
+        """
+        Read the latest version of an artifact.
+
+        Returns:
+            The artifact content, or None if it was never written
+        """
+        path = self.latest_path(meeting_id, kind, participant)
+        if path is None:
+            return None
+        with open(path, "r") as f:
+            return f.read()
+
+    def prune(self, keep_versions: int = 1, max_age: Optional[float] = None) -> int:
+        """
+        Delete old artifacts.
+
+        Args:
+            keep_versions: Number of versions to keep for each artifact
+            max_age: If set, delete whole meetings whose latest artifact is older than this many seconds
+
+        Returns:
+            Number of artifacts deleted
+        """
+        conn = self._connection()
+        stale = conn.execute(
+            "SELECT id, path FROM ("
+            "SELECT id, path, ROW_NUMBER() OVER (PARTITION BY meeting_id, kind, participant ORDER BY id DESC) AS version "
+            "FROM artifacts) WHERE version > ?",
+            (keep_versions,)
+        ).fetchall()
+
+        expired_meetings = []
+        if max_age is not None:
+            expired_meetings = [row[0] for row in conn.execute(
+                "SELECT meeting_id FROM artifacts GROUP BY meeting_id HAVING MAX(created_at) < ?",
+                (time.time() - max_age,)
+            )]
+            for meeting_id in expired_meetings:
+                stale += conn.execute("SELECT id, path FROM artifacts WHERE meeting_id = ?", (meeting_id,)).fetchall()
+
+        stale = dict(stale)
+        for path in stale.values():
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        conn.executemany("DELETE FROM artifacts WHERE id = ?", [(artifact_id,) for artifact_id in stale])
+
+        for meeting_id in expired_meetings:
+            shutil.rmtree(os.path.join(self.root, safe_name(meeting_id)), ignore_errors=True)
+
+        return len(stale)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_artifact_store() -> ArtifactStore:
+    """Return the process-wide artifact store, rooted at CONVERGE_ARTIFACT_DIR."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ArtifactStore(os.getenv("CONVERGE_ARTIFACT_DIR", "artifacts"))
+        return _store
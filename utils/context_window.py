@@ -0,0 +1,147 @@
+import threading
+from typing import Callable, Dict, List, Optional
+
+_encoding = None
+_encoding_loaded = False
+
+
+def count_tokens(text: str) -> int:
+    """
+    Count the tokens in a piece of text.
+
+    Args:
+        text: Text to count
+
+    Returns:
+        Exact token count if tiktoken is installed, an estimate otherwise
+    """
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("o200k_base")
+        except Exception:
+            # tiktoken is optional, fall back to the usual ~4 characters per token estimate
+            _encoding = None
+        _encoding_loaded = True
+
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return len(text) // 4 + 1
+
+
+class ContextWindow:
+    """
+    A conversation history with a bounded token size.
+
+    The most recent turns are kept verbatim. Once the history grows past
+    twice `keep_last` turns or past `token_budget` tokens, `compact` folds
+    the older turns into a rolling summary, so the prompt stays roughly the
+    same size however long the conversation runs.
+    """
+    def __init__(self, token_budget: int = 2000, keep_last: int = 8):
+        """
+        Initialize an empty history.
+
+        Args:
+            token_budget: Maximum tokens for the summary and verbatim turns together
+            keep_last: Number of recent turns kept verbatim after compaction
+        """
+        self.token_budget = token_budget
+        self.keep_last = keep_last
+        self.summary = ""
+        self.summary_tokens = 0
+        self.turns: List[Dict] = []
+        self.turn_tokens = 0
+        self._compacting = False
+        self._lock = threading.Lock()
+
+    def to_dict(self) -> Dict:
+        """
+        Serialize the history, e.g. to checkpoint a discussion.
+
+        Returns:
+            A JSON-serializable dict, see `from_dict`
+        """
+        with self._lock:
+            return {
+                "token_budget": self.token_budget,
+                "keep_last": self.keep_last,
+                "summary": self.summary,
+                "turns": [dict(turn) for turn in self.turns],
+            }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "ContextWindow":
+        """
+        Restore a history from the output of `to_dict`.
+
+        Args:
+            data: Serialized history
+        """
+        window = cls(token_budget=data["token_budget"], keep_last=data["keep_last"])
+        window.summary = data["summary"]
+        window.summary_tokens = count_tokens(window.summary) if window.summary else 0
+        window.turns = [dict(turn) for turn in data["turns"]]
+        window.turn_tokens = sum(turn['tokens'] for turn in window.turns)
+        return window
+
+    def add(self, sender: str, content: str) -> None:
+        """
+        Add a turn to the history.
+
+        Args:
+            sender: Name of the message sender
+            content: Content of the message
+        """
+        tokens = count_tokens(content)
+        with self._lock:
+            self.turns.append({'sender': sender, 'content': content, 'tokens': tokens})
+            self.turn_tokens += tokens
+
+    def needs_compaction(self) -> bool:
+        """Whether the history has outgrown its turn or token limits."""
+        return len(self.turns) > 2 * self.keep_last or self.summary_tokens + self.turn_tokens > self.token_budget
+
+    def compact(self, summarize: Callable[[str, List[Dict]], Optional[str]]) -> None:
+        """
+        Fold older turns into the summary if the history is over its limits.
+
+        The summary is written without holding the lock, so turns can be
+        added meanwhile. Only one compaction runs at a time, others return
+        right away.
+
+        Args:
+            summarize: Called with the current summary and the turns to fold, returns the new summary, or None
+                to keep the turns verbatim until the next compaction, e.g. because summarizing failed
+        """
+        with self._lock:
+            if self._compacting or not self.needs_compaction():
+                return
+
+            # Keep fewer verbatim turns if they alone would take most of the budget
+            keep = self.keep_last
+            while keep > 1 and sum(turn['tokens'] for turn in self.turns[-keep:]) > self.token_budget // 2:
+                keep -= 1
+
+            folded = self.turns[:-keep]
+            if not folded:
+                return
+            summary = self.summary
+            self._compacting = True
+
+        try:
+            summary = summarize(summary, folded)
+            summary_tokens = count_tokens(summary) if summary is not None else 0
+        finally:
+            with self._lock:
+                self._compacting = False
+        if summary is None:
+            return
+
+        with self._lock:
+            # Turns are only removed here, so the folded turns are still the oldest ones
+            self.summary = summary
+            self.summary_tokens = summary_tokens
+            self.turns = self.turns[len(folded):]
+            self.turn_tokens = sum(turn['tokens'] for turn in self.turns)
@@ -0,0 +1,134 @@
+import time
+from typing import Dict, List, Optional, Tuple
+
+from utils.session_store import SessionStore
+
+
+class DiscussionLeaseLost(Exception):
+    """Raised when another worker took over a discussion this worker was running."""
+
+
+class DiscussionCheckpoints:
+    """
+    Checkpoints of running agent discussions, kept in the session store.
+
+    A worker claims a discussion before running it, and renews its lease with
+    every checkpoint. A discussion whose lease expired, e.g. because its
+    worker died, can be claimed by another worker and resumed from its last
+    checkpoint. Unfinished discussions are listed under one key, so finding
+    them doesn't require scanning the store.
+    """
+    ACTIVE_KEY = "discussions:active"
+
+    def __init__(self, store: SessionStore, lease: float = 300):
+        """
+        Initialize the checkpoints.
+
+        Args:
+            store: Session store holding the checkpoints
+            lease: Seconds without a checkpoint after which a discussion may be taken over
+        """
+        self.store = store
+        self.lease = lease
+
+    def claim(self, meeting_id: str, owner: str) -> Tuple[bool, Optional[Dict]]:
+        """
+        Take ownership of a discussion, unless another worker is running it or it is finished.
+
+        Args:
+            meeting_id: ID of the discussion's meeting
+            owner: Unique ID of the claiming worker
+
+        Returns:
+            Whether the discussion was claimed, and the checkpoint to resume from, or None to start over
+        """
+        claimed = False
+
+        def take(record):
+            nonlocal claimed
+            record = record or {"owner": None, "heartbeat": 0, "finished": False, "checkpoint": None}
+            if record["finished"] or (record["owner"] not in (None, owner) and time.time() - record["heartbeat"] < self.lease):
+                return record
+            claimed = True
+            return {**record, "owner": owner, "heartbeat": time.time()}
+
+        record = self.store.update(self._key(meeting_id), take)
+        if claimed:
+            self.store.update(self.ACTIVE_KEY, lambda active: _with_member(active, meeting_id, True))
+        return claimed, record["checkpoint"] if claimed else None
+
+    def save(self, meeting_id: str, owner: str, checkpoint: Dict) -> None:
+        """
+        Store the latest checkpoint of a discussion and renew the lease.
+
+        Args:
+            meeting_id: ID of the discussion's meeting
+            owner: Unique ID of the worker running the discussion
+            checkpoint: Checkpoint produced by `start_discussion`
+
+        Raises:
+            DiscussionLeaseLost: If another worker claimed the discussion in the meantime
+        """
+        def put(record):
+            if record is None or record["owner"] != owner:
+                raise DiscussionLeaseLost(f"Discussion of meeting {meeting_id} was taken over")
+            return {**record, "heartbeat": time.time(), "checkpoint": checkpoint}
+
+        self.store.update(self._key(meeting_id), put)
+
+    def finish(self, meeting_id: str, owner: str) -> None:
+        """
+        Mark a discussion finished, dropping its checkpoint.
+
+        Args:
+            meeting_id: ID of the discussion's meeting
+            owner: Unique ID of the worker running the discussion
+        """
+        def close(record):
+            if record is None or record["owner"] != owner:
+                raise DiscussionLeaseLost(f"Discussion of meeting {meeting_id} was taken over")
+            return {**record, "heartbeat": time.time(), "finished": True, "checkpoint": None}
+
+        self.store.update(self._key(meeting_id), close)
+        self.store.update(self.ACTIVE_KEY, lambda active: _with_member(active, meeting_id, False))
+
+    def release(self, meeting_id: str, owner: str) -> None:
+        """
+        Give up a discussion that failed, keeping its checkpoint so another attempt can resume it.
+
+        Args:
+            meeting_id: ID of the discussion's meeting
+            owner: Unique ID of the worker running the discussion. Nothing changes if it no longer owns it
+        """
+        def drop(record):
+            if record is None or record["owner"] != owner:
+                return record
+            return {**record, "owner": None}
+
+        if self.store.get(self._key(meeting_id)) is not None:
+            self.store.update(self._key(meeting_id), drop)
+
+    def stale(self) -> List[str]:
+        """Return the meeting IDs of unfinished discussions that were released or whose lease expired."""
+        active = self.store.get(self.ACTIVE_KEY) or {"meeting_ids": []}
+        stale = []
+        for meeting_id in active["meeting_ids"]:
+            record = self.store.get(self._key(meeting_id))
+            if record is None or record["finished"]:
+                continue
+            if record["owner"] is None or time.time() - record["heartbeat"] >= self.lease:
+                stale.append(meeting_id)
+        return stale
+
+    @staticmethod
+    def _key(meeting_id: str) -> str:
+        """Session store key of a discussion."""
+        return f"discussion:{meeting_id}"
+
+
+def _with_member(active: Optional[Dict], meeting_id: str, present: bool) -> Dict:
+    """Add or remove a meeting ID in the list of active discussions."""
+    meeting_ids = [existing for existing in (active or {"meeting_ids": []})["meeting_ids"] if existing != meeting_id]
+    if present:
+        meeting_ids.append(meeting_id)
+    return {"meeting_ids": meeting_ids}
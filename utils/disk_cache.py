@@ -0,0 +1,112 @@
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Optional
+
+from utils import metrics
+
+
+class DiskCache:
+    """
+    A persistent key-value cache backed by SQLite, with LRU and TTL eviction.
+
+    Values are compressed strings. Entries expire `ttl` seconds after they
+    were written, and once the cache holds more than `max_entries` the least
+    recently read ones are evicted. The database can be shared by several
+    processes on the same machine. Reads are counted as hits or misses in
+    the converge_cache_lookups_total metric, by cache name.
+    """
+    # Number of writes between two eviction passes
+    EVICT_EVERY = 100
+
+    def __init__(self, path: str, max_entries: int = 10000, ttl: Optional[float] = None, name: str = "cache"):
+        """
+        Initialize the cache, creating the database if needed.
+
+        Args:
+            path: Path of the SQLite database file
+            max_entries: Maximum number of entries kept after eviction
+            ttl: Seconds an entry stays valid, or None to keep entries until evicted
+            name: Name of the cache in the metrics
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.name = name
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed_at ON cache (accessed_at)")
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return this thread's connection to the database."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Read a cached value.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            The cached value, or None if it is missing or expired
+        """
+        conn = self._connection()
+        now = time.time()
+        row = conn.execute("SELECT value, created_at FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None or (self.ttl is not None and row[1] < now - self.ttl):
+            metrics.CACHE_LOOKUPS.inc(cache=self.name, result="miss")
+            return None
+
+        conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+        metrics.CACHE_LOOKUPS.inc(cache=self.name, result="hit")
+        return zlib.decompress(row[0]).decode("utf-8")
+
+    def set(self, key: str, value: str) -> None:
+        """
+        Write a value to the cache.
+
+        Args:
+            key: Cache key
+            value: Value to cache
+        """
+        now = time.time()
+        self._connection().execute(
+            "INSERT OR REPLACE INTO cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+            (key, zlib.compress(value.encode("utf-8")), now, now)
+        )
+
+        with self._lock:
+            self._writes += 1
+            evict = self._writes % self.EVICT_EVERY == 0
+        if evict:
+            self.evict()
+
+    def evict(self) -> None:
+        """Delete expired entries, then the least recently read ones above `max_entries`."""
+        conn = self._connection()
+        if self.ttl is not None:
+            conn.execute("DELETE FROM cache WHERE created_at < ?", (time.time() - self.ttl,))
+        conn.execute(
+            "DELETE FROM cache WHERE key IN ("
+            "SELECT key FROM cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
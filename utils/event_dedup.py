@@ -0,0 +1,112 @@
+import os
+import sqlite3
+import threading
+import time
+
+from utils import metrics
+
+
+class EventDeduplicator:
+    """
+    Remembers recently seen Slack event IDs, to skip re-delivered events.
+
+    IDs are kept in a SQLite database for `window` seconds, so every worker
+    process on the machine shares the same view. The table is capped at
+    `max_entries` IDs. Duplicates are counted in the
+    converge_duplicate_events_total metric.
+    """
+    # Number of new IDs between two pruning passes
+    PRUNE_EVERY = 500
+
+    def __init__(self, path: str, window: float = 3600, max_entries: int = 100000):
+        """
+        Initialize the deduplicator, creating the database if needed.
+
+        Args:
+            path: Path of the SQLite database file
+            window: Seconds an ID is remembered
+            max_entries: Maximum number of IDs kept
+        """
+        self.path = path
+        self.window = window
+        self.max_entries = max_entries
+        self._inserts = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS seen_events (id TEXT PRIMARY KEY, seen_at REAL NOT NULL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS seen_events_seen_at ON seen_events (seen_at)")
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return this thread's connection to the database."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def is_duplicate(self, *ids) -> bool:
+        """
+        Record a set of IDs identifying one event, and check whether the event was already seen.
+
+        Args:
+            *ids: IDs of the event, e.g. its event_id and client_msg_id. Empty IDs are ignored
+
+        Returns:
+            True if any of the IDs was seen within the window
+        """
+        ids = [event_id for event_id in ids if event_id]
+        if not ids:
+            return False
+
+        conn = self._connection()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            duplicate = conn.execute(
+                f"SELECT 1 FROM seen_events WHERE seen_at >= ? AND id IN ({', '.join('?' * len(ids))}) LIMIT 1",
+                (now - self.window, *ids)
+            ).fetchone() is not None
+            conn.executemany(
+                "INSERT OR REPLACE INTO seen_events (id, seen_at) VALUES (?, ?)",
+                [(event_id, now) for event_id in ids]
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+        if duplicate:
+            metrics.DUPLICATE_EVENTS.inc()
+        with self._lock:
+            self._inserts += 1
+            prune = self._inserts % self.PRUNE_EVERY == 0
+        if prune:
+            self.prune()
+        return duplicate
+
+    def prune(self) -> None:
+        """Forget IDs older than the window, then the oldest ones above `max_entries`."""
+        conn = self._connection()
+        conn.execute("DELETE FROM seen_events WHERE seen_at < ?", (time.time() - self.window,))
+        conn.execute(
+            "DELETE FROM seen_events WHERE id IN ("
+            "SELECT id FROM seen_events ORDER BY seen_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+
+
+def create_event_deduplicator() -> EventDeduplicator:
+    """
+    Create the deduplicator configured by the environment.
+
+    CONVERGE_EVENTS_DB sets the database path and CONVERGE_EVENT_DEDUP_WINDOW
+    how many seconds IDs are remembered.
+    """
+    return EventDeduplicator(
+        os.getenv("CONVERGE_EVENTS_DB", "converge_events.db"),
+        window=float(os.getenv("CONVERGE_EVENT_DEDUP_WINDOW", "3600")),
+    )
@@ -1,29 +1,190 @@
-import requests
-from llama_parse import LlamaParse
-from llama_index.core import SimpleDirectoryReader
-from llama_index.readers.remote import RemoteReader
+import logging
+import multiprocessing
 import os
-import dotenv
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
-dotenv.load_dotenv()
+from utils import metrics
+from utils.slack_files import download_slack_file, get_media_cache, time_left
+from utils.tracing import propagate
 
-def extract_text_from_pdf_url(pdf_url, headers=None):
+logger = logging.getLogger(__name__)
+
+# Pages yielding less text than this are probably scanned, and are parsed with LlamaParse instead
+MIN_PAGE_CHARS = 50
+
+# Number of pages extracted by each worker process
+PAGES_PER_TASK = 8
+
+# Largest PDF accepted for download
+MAX_PDF_BYTES = 50 * 1024 * 1024
+
+_parser = None
+_parser_lock = threading.Lock()
+
+_page_pool = None
+_page_pool_lock = threading.Lock()
+
+
+def extract_text_from_pdf_url(pdf_url, headers=None, file_id=None, deadline=None):
     """
-    Extract text content from a PDF file using LlamaParse.
-    
+    Extract text content from a PDF file hosted on Slack.
+
+    Results are cached by Slack file ID and by content hash, so repeated
+    uploads of the same document are neither downloaded nor parsed again.
+
     Args:
         pdf_url (str): URL of the PDF file to process
         headers (dict, optional): Headers to use for the request, e.g. for authentication
-        
+        file_id (str, optional): Slack file ID, used to skip the download of files already parsed
+        deadline (float, optional): `time.monotonic()` time to give up at, stopping the download and extraction
+
+    Returns:
+        str: Extracted text content from the PDF
+
+    Raises:
+        TimeoutError: If the deadline passes first
+    """
+    cache = get_media_cache()
+    file_key = f"pdf:file:{file_id}" if file_id else None
+    if file_key:
+        text = cache.get(file_key)
+        if text is not None:
+            return text
+
+    path, content_hash = download_slack_file(pdf_url, headers=headers, suffix=".pdf", max_bytes=MAX_PDF_BYTES, deadline=deadline)
+    try:
+        content_key = f"pdf:sha256:{content_hash}"
+        text = cache.get(content_key)
+        if text is None:
+            text = extract_text_from_pdf_file(path, deadline)
+            cache.set(content_key, text)
+    finally:
+        os.unlink(path)
+
+    if file_key:
+        cache.set(file_key, text)
+    return text
+
+
+def extract_text_from_pdf_file(path, deadline=None):
+    """
+    Extract text content from a local PDF file.
+
+    Text is extracted locally, with large documents split across worker
+    processes. Pages yielding little text are sent to LlamaParse.
+
+    Args:
+        path (str): Path of the PDF file
+        deadline (float, optional): `time.monotonic()` time to give up at. Pages not started by then are skipped
+
     Returns:
         str: Extracted text content from the PDF
-        
-    Note:
-        Currently uses a local test file. TODO: Implement remote PDF fetching.
+
+    Raises:
+        TimeoutError: If the deadline passes first
     """
-    parser = LlamaParse(result_type="text", api_key=os.getenv("LLAMA_CLOUD_API_KEY"))
+    from pypdf import PdfReader
+
+    page_count = len(PdfReader(path).pages)
+    ranges = [(start, min(start + PAGES_PER_TASK, page_count)) for start in range(0, page_count, PAGES_PER_TASK)]
+
+    if len(ranges) > 1:
+        chunks = _get_page_pool().map(_extract_pages, [path] * len(ranges), *zip(*ranges), timeout=time_left(deadline))
+        pages = [text for chunk in chunks for text in chunk]
+    else:
+        pages = _extract_pages(path, 0, page_count)
+
+    # Parse each run of consecutive sparse pages with LlamaParse, keeping the page order
+    runs = []
+    for i, text in enumerate(pages):
+        if len(text.strip()) < MIN_PAGE_CHARS:
+            if runs and runs[-1][1] == i:
+                runs[-1][1] = i + 1
+            else:
+                runs.append([i, i + 1])
+
+    if runs:
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            parsed = list(executor.map(propagate(lambda run: _parse_with_llamaparse(path, *run, deadline)), runs))
+        for (start, end), text in zip(runs, parsed):
+            if text:
+                pages[start:end] = [text] + [""] * (end - start - 1)
+
+    return "\n\n".join(page.strip() for page in pages if page.strip())
+
+
+def _extract_pages(path, start, end):
+    """Extract the text of pages [start, end) with the local extractor."""
+    from pypdf import PdfReader
+
+    reader = PdfReader(path)
+    return [reader.pages[i].extract_text() or "" for i in range(start, end)]
+
+
+def _parse_with_llamaparse(path, start, end, deadline=None):
+    """
+    Parse pages [start, end) of a PDF with LlamaParse.
+
+    Returns:
+        str: Parsed text, or an empty string if parsing failed
+
+    Raises:
+        TimeoutError: If the deadline has passed
+    """
+    time_left(deadline)
+    from pypdf import PdfReader, PdfWriter
+
+    writer = PdfWriter()
+    reader = PdfReader(path)
+    for i in range(start, end):
+        writer.add_page(reader.pages[i])
+
+    fd, pages_path = tempfile.mkstemp(suffix=".pdf")
+    started = time.perf_counter()
+    try:
+        with os.fdopen(fd, "wb") as f:
+            writer.write(f)
+        documents = _get_parser().load_data(pages_path)
+        metrics.LLAMAPARSE_PAGES.inc(end - start, outcome="ok")
+        metrics.LLAMAPARSE_COST.inc((end - start) * metrics.LLAMAPARSE_PAGE_PRICE)
+        return "\n".join(document.text for document in documents)
+    except Exception as e:
+        metrics.LLAMAPARSE_PAGES.inc(end - start, outcome="error")
+        logger.error("Error parsing PDF pages %d-%d with LlamaParse: %s", start, end, e)
+        return ""
+    finally:
+        metrics.LLAMAPARSE_DURATION.observe(time.perf_counter() - started)
+        os.unlink(pages_path)
+
+
+def _get_page_pool():
+    """
+    Return the worker processes shared by every PDF extraction, starting them on first use.
+
+    Workers are started from a fork server, or spawned where the platform
+    has none, rather than forked from the app process, which runs many
+    threads. They keep running between documents.
+    """
+    global _page_pool
+    with _page_pool_lock:
+        if _page_pool is None:
+            if "forkserver" in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context("forkserver")
+                context.set_forkserver_preload([__name__])
+            else:
+                context = multiprocessing.get_context("spawn")
+            _page_pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 1, mp_context=context)
+        return _page_pool
+
 
-    file_extractor = {".pdf": parser}
-    documents = SimpleDirectoryReader(input_files=['kylian_bezos_internship_review.pdf'], file_extractor=file_extractor).load_data()
-    
-    return documents[0].text
+def _get_parser():
+    """Return the shared LlamaParse parser."""
+    global _parser
+    with _parser_lock:
+        if _parser is None:
+            from llama_parse import LlamaParse
+            _parser = LlamaParse(result_type="text", api_key=os.getenv("LLAMA_CLOUD_API_KEY"))
+        return _parser
@@ -0,0 +1,96 @@
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueueFull(Exception):
+    """Raised when the job queue cannot accept more work."""
+
+
+class KeyedJobQueue:
+    """
+    A bounded worker pool that runs jobs in the background.
+
+    Jobs submitted with the same key run one at a time, in submission order,
+    while jobs for different keys run concurrently on up to `max_workers`
+    threads. Keys are scheduled round-robin, so a key with a long backlog
+    cannot starve the others.
+    """
+    def __init__(self, max_workers=8, max_pending=100, name="converge-worker"):
+        """
+        Initialize the worker pool.
+
+        Args:
+            max_workers: Number of worker threads running jobs
+            max_pending: Maximum number of jobs waiting or running at once
+            name: Prefix for the worker thread names
+        """
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._not_full = threading.Condition(self._lock)
+        self._ready = threading.Condition(self._lock)
+        self._jobs = {}
+        self._ready_keys = deque()
+        self._pending = 0
+
+        for i in range(max_workers):
+            worker = threading.Thread(target=self._work, name=f"{name}-{i}", daemon=True)
+            worker.start()
+
+    @property
+    def pending(self) -> int:
+        """Number of jobs waiting or running."""
+        with self._lock:
+            return self._pending
+
+    def submit(self, key, fn, *args, timeout=0, **kwargs) -> None:
+        """
+        Queue a job to run in the background.
+
+        Args:
+            key: Jobs sharing this key run sequentially in submission order
+            fn: Callable to run
+            *args, **kwargs: Arguments passed to `fn`
+            timeout: Seconds to wait for room in the queue before giving up
+
+        Raises:
+            JobQueueFull: If the queue is still full after `timeout` seconds
+        """
+        with self._lock:
+            if not self._not_full.wait_for(lambda: self._pending < self.max_pending, timeout=timeout):
+                raise JobQueueFull(f"{self._pending} jobs pending")
+
+            self._pending += 1
+            if key in self._jobs:
+                # The key is already scheduled, its worker will pick this job up in turn
+                self._jobs[key].append((fn, args, kwargs))
+            else:
+                self._jobs[key] = deque([(fn, args, kwargs)])
+                self._ready_keys.append(key)
+                self._ready.notify()
+
+    def _work(self) -> None:
+        """Worker loop: run one job for the next ready key, then requeue the key."""
+        while True:
+            with self._lock:
+                self._ready.wait_for(lambda: self._ready_keys)
+                key = self._ready_keys.popleft()
+                fn, args, kwargs = self._jobs[key][0]
+
+            try:
+                fn(*args, **kwargs)
+            except Exception:
+                logger.exception("Error running job for %s", key)
+
+            with self._lock:
+                self._jobs[key].popleft()
+                self._pending -= 1
+                if self._jobs[key]:
+                    self._ready_keys.append(key)
+                    self._ready.notify()
+                else:
+                    del self._jobs[key]
+                self._not_full.notify()
@@ -0,0 +1,246 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Default histogram buckets, in seconds
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# Estimated USD prices per 1M prompt and completion tokens, by model
+TOKEN_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+}
+
+# Estimated USD price of a minute of audio transcribed by Whisper
+WHISPER_MINUTE_PRICE = 0.006
+
+# Estimated USD price of a page parsed by LlamaParse
+LLAMAPARSE_PAGE_PRICE = 0.003
+
+
+class _Metric:
+    """Base of the metric types: a named family of series, one per label combination."""
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        """Order label values as declared, rejecting unknown or missing labels."""
+        if set(labels) != set(self.labels):
+            raise ValueError(f"{self.name} expects labels {self.labels}, got {tuple(labels)}")
+        return tuple(str(labels[label]) for label in self.labels)
+
+    def _format_labels(self, key: Tuple[str, ...], extra: Optional[Tuple[str, str]] = None) -> str:
+        """Render label values in the exposition format."""
+        pairs = list(zip(self.labels, key)) + ([extra] if extra else [])
+        if not pairs:
+            return ""
+        escaped = (value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, value in pairs)
+        return "{" + ",".join(f'{label}="{value}"' for (label, _), value in zip(pairs, escaped)) + "}"
+
+    def render(self) -> List[str]:
+        """Render the metric in the Prometheus text exposition format."""
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """A value that only goes up, e.g. a number of requests."""
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        """
+        Increase the series matching `labels`.
+
+        Args:
+            amount: Non-negative increment
+            **labels: Value of each label of the metric
+        """
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{self._format_labels(key)} {value}" for key, value in values]
+
+
+class Gauge(_Metric):
+    """A value read from a callback when metrics are collected, e.g. a queue length."""
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, function: Callable[[], float]):
+        super().__init__(name, documentation)
+        self.function = function
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name} {self.function()}"]
+
+
+class Histogram(_Metric):
+    """Counts observations, e.g. latencies, in cumulative buckets."""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        # Per series: count in each bucket (the last one is +Inf), and sum of observations
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        """
+        Record an observation in the series matching `labels`.
+
+        Args:
+            value: Observed value
+            **labels: Value of each label of the metric
+        """
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._series.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[index] += 1
+            total[0] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the `with` block, in seconds."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            series = sorted((key, list(counts), total[0]) for key, (counts, total) in self._series.items())
+
+        samples = []
+        for key, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                samples.append(f"{self.name}_bucket{self._format_labels(key, ('le', le))} {cumulative}")
+            samples.append(f"{self.name}_sum{self._format_labels(key)} {total}")
+            samples.append(f"{self.name}_count{self._format_labels(key)} {cumulative}")
+        return samples
+
+
+REGISTRY: List[_Metric] = []
+
+
+def render() -> str:
+    """
+    Render every metric of this process in the Prometheus text exposition format.
+
+    Metrics are kept per process: with several web workers, each one is
+    scraped separately.
+    """
+    return "\n".join(line for metric in list(REGISTRY) for line in metric.render()) + "\n"
+
+
+STEP_DURATION = Histogram(
+    "converge_step_duration_seconds",
+    "Time spent running a step of a user's conversation flow",
+    labels=("step",),
+)
+STEP_ERRORS = Counter(
+    "converge_step_errors_total",
+    "Conversation steps that raised an exception",
+    labels=("step",),
+)
+
+OPENAI_REQUEST_DURATION = Histogram(
+    "converge_openai_request_duration_seconds",
+    "Latency of OpenAI requests, including retries",
+    labels=("call_site", "model"),
+)
+OPENAI_REQUESTS = Counter(
+    "converge_openai_requests_total",
+    "OpenAI requests by outcome: ok, error, or cached",
+    labels=("call_site", "model", "outcome"),
+)
+OPENAI_TOKENS = Counter(
+    "converge_openai_tokens_total",
+    "Tokens used by OpenAI requests, estimated for streamed responses",
+    labels=("call_site", "model", "kind"),
+)
+OPENAI_COST = Counter(
+    "converge_openai_cost_usd_total",
+    "Estimated cost of OpenAI requests in USD",
+    labels=("call_site", "model"),
+)
+MODEL_ROUTES = Counter(
+    "converge_model_route_decisions_total",
+    "Chat completions by route tier (primary or fallback) and reason: ok, slo, or error",
+    labels=("call_site", "model", "tier", "reason"),
+)
+
+LLAMAPARSE_DURATION = Histogram(
+    "converge_llamaparse_duration_seconds",
+    "Latency of LlamaParse requests",
+)
+LLAMAPARSE_PAGES = Counter(
+    "converge_llamaparse_pages_total",
+    "PDF pages sent to LlamaParse, by outcome: ok or error",
+    labels=("outcome",),
+)
+LLAMAPARSE_COST = Counter(
+    "converge_llamaparse_cost_usd_total",
+    "Estimated cost of LlamaParse requests in USD",
+)
+
+CACHE_LOOKUPS = Counter(
+    "converge_cache_lookups_total",
+    "Disk cache reads by cache (llm or media) and result: hit or miss",
+    labels=("cache", "result"),
+)
+
+DUPLICATE_EVENTS = Counter(
+    "converge_duplicate_events_total",
+    "Slack events skipped because they were already delivered",
+)
+
+SLACK_CALLS = Counter(
+    "converge_slack_api_calls_total",
+    "Slack Web API calls, including rate limited retries",
+    labels=("method",),
+)
+SLACK_ERRORS = Counter(
+    "converge_slack_api_errors_total",
+    "Slack Web API calls that returned an error",
+    labels=("method", "error"),
+)
+
+
+def record_openai_usage(call_site: str, model: str, prompt_tokens: int, completion_tokens: int) -> None:
+    """
+    Record the tokens and estimated cost of a successful OpenAI request.
+
+    Args:
+        call_site: Part of the code making the request, e.g. "generate_response"
+        model: Model answering the request
+        prompt_tokens: Tokens in the request
+        completion_tokens: Tokens in the response
+    """
+    OPENAI_REQUESTS.inc(call_site=call_site, model=model, outcome="ok")
+    OPENAI_TOKENS.inc(prompt_tokens, call_site=call_site, model=model, kind="prompt")
+    OPENAI_TOKENS.inc(completion_tokens, call_site=call_site, model=model, kind="completion")
+    prices = TOKEN_PRICES.get(model)
+    if prices:
+        OPENAI_COST.inc((prompt_tokens * prices[0] + completion_tokens * prices[1]) / 1e6, call_site=call_site, model=model)
@@ -0,0 +1,285 @@
+import json
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from utils import metrics
+from utils.openai_client import REQUEST_TIMEOUT, create_chat_completion, is_timeout
+
+logger = logging.getLogger(__name__)
+
+
+class Route:
+    """The model, token cap and timeout used for the requests of one call site, and what to fall back to."""
+    def __init__(self, model: str, max_tokens: Optional[int] = None, timeout: float = REQUEST_TIMEOUT,
+                 slo: Optional[float] = None, fallback: Optional["Route"] = None):
+        """
+        Initialize the route.
+
+        Args:
+            model: Model answering the requests
+            max_tokens: Cap on the tokens of a response, None to leave it to the caller
+            timeout: Seconds before a single request is abandoned
+            slo: Target latency in seconds. While requests are slower, the fallback route is used
+            fallback: Faster route, used while this one misses its SLO or when its request fails
+        """
+        self.model = model
+        self.max_tokens = max_tokens
+        self.timeout = timeout
+        self.slo = slo
+        self.fallback = fallback
+
+    def updated(self, overrides: Dict) -> "Route":
+        """
+        Return a copy of the route with some settings replaced.
+
+        Args:
+            overrides: Settings to replace, as in the constructor. "fallback" is itself a dict of overrides
+        """
+        fallback = self.fallback
+        if "fallback" in overrides:
+            fallback = None
+            if overrides["fallback"] is not None:
+                fallback = (self.fallback or Route(self.model)).updated(overrides["fallback"])
+        return Route(
+            model=overrides.get("model", self.model),
+            max_tokens=overrides.get("max_tokens", self.max_tokens),
+            timeout=overrides.get("timeout", self.timeout),
+            slo=overrides.get("slo", self.slo),
+            fallback=fallback,
+        )
+
+
+# Routes by call site. Agent turns keep their short cap and history summaries are bounded, while replies
+# users read and long reports are left uncapped. Fallbacks give up sooner but never cut replies shorter
+DEFAULT_ROUTES = {
+    "generate_response": Route("gpt-4o-mini", max_tokens=100, timeout=20, slo=4,
+                               fallback=Route("gpt-4o-mini", max_tokens=100, timeout=10)),
+    "summarize_history": Route("gpt-4o-mini", max_tokens=250, timeout=30, slo=8,
+                               fallback=Route("gpt-4o-mini", max_tokens=250, timeout=15)),
+    "wrap_up": Route("gpt-4o-mini", timeout=30, slo=10,
+                     fallback=Route("gpt-4o-mini", timeout=15)),
+    "leadership.ask_clarifying_questions": Route("gpt-4o-mini", timeout=30, slo=6,
+                                                 fallback=Route("gpt-4o-mini", timeout=15)),
+    "leadership.generate_final_report": Route("gpt-4o-mini", timeout=30, slo=6,
+                                              fallback=Route("gpt-4o-mini", timeout=15)),
+    "leadership.generate_team_member_report": Route("gpt-4o-mini", timeout=90, slo=30,
+                                                    fallback=Route("gpt-4o-mini", timeout=45)),
+    "team_member.ask_clarifying_questions": Route("gpt-4o-mini", timeout=30, slo=6,
+                                                  fallback=Route("gpt-4o-mini", timeout=15)),
+    "team_member.generate_team_member_report": Route("gpt-4o-mini", timeout=90, slo=30,
+                                                     fallback=Route("gpt-4o-mini", timeout=45)),
+}
+
+# Route of call sites missing from the table
+DEFAULT_ROUTE = Route("gpt-4o-mini")
+
+
+class ModelRouter:
+    """
+    Sends each chat completion to the model and limits of its call site.
+
+    The router tracks a moving average of each route's latency. Once it
+    exceeds the route's SLO, requests go to the fallback route for
+    `cooldown` seconds, after which the primary route is tried again. A
+    request timing out on the primary route is not retried there but once
+    on the fallback, other errors are retried on the same route only. Every decision is counted in the
+    converge_model_route_decisions_total metric, by call site, model, tier
+    and reason.
+    """
+    def __init__(self, routes: Dict[str, Route], cooldown: float = 60.0, smoothing: float = 0.3):
+        """
+        Initialize the router.
+
+        Args:
+            routes: Route of each call site
+            cooldown: Seconds a route missing its SLO is bypassed
+            smoothing: Weight of the latest request in the moving average of latencies
+        """
+        self.routes = routes
+        self.cooldown = cooldown
+        self.smoothing = smoothing
+        self._latency: Dict[str, float] = {}
+        self._degraded_until: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def select(self, call_site: str) -> Tuple[Route, str, str]:
+        """
+        Pick the route for a request.
+
+        Args:
+            call_site: Part of the code making the request
+
+        Returns:
+            The route, its tier ("primary" or "fallback"), and the reason ("ok" or "slo")
+        """
+        route = self.routes.get(call_site, DEFAULT_ROUTE)
+        with self._lock:
+            degraded_until = self._degraded_until.get(call_site)
+            if degraded_until is not None and time.monotonic() >= degraded_until:
+                # Give the primary route a fresh chance
+                del self._degraded_until[call_site]
+                self._latency.pop(call_site, None)
+                degraded_until = None
+        if degraded_until is not None and route.fallback is not None:
+            return route.fallback, "fallback", "slo"
+        return route, "primary", "ok"
+
+    def observe(self, call_site: str, latency: float) -> None:
+        """
+        Record the latency of a request on a primary route, degrading the route if it misses its SLO.
+
+        Args:
+            call_site: Part of the code that made the request
+            latency: Seconds the request took
+        """
+        route = self.routes.get(call_site, DEFAULT_ROUTE)
+        with self._lock:
+            previous = self._latency.get(call_site)
+            average = latency if previous is None else self.smoothing * latency + (1 - self.smoothing) * previous
+            self._latency[call_site] = average
+            degraded = route.slo is not None and route.fallback is not None and average > route.slo
+            if degraded and call_site not in self._degraded_until:
+                self._degraded_until[call_site] = time.monotonic() + self.cooldown
+                logger.warning("%s averages %.1fs over its %.1fs SLO, falling back to %s for %.0fs",
+                               call_site, average, route.slo, route.fallback.model, self.cooldown)
+
+    def create(self, call_site: str, cache: bool = False, **kwargs):
+        """
+        Create a chat completion on the route of `call_site`.
+
+        Args:
+            call_site: Part of the code making the request, selecting its route
+            cache: Whether to read and write the response cache
+            **kwargs: Arguments of `client.chat.completions.create`, except the model and timeout. A
+                max_tokens argument is capped by the route's
+
+        Returns:
+            The completion, or a stream of chunks if `stream=True`
+        """
+        route, tier, reason = self.select(call_site)
+        try:
+            return self._request(route, tier, reason, call_site, cache, kwargs)
+        except Exception as e:
+            if tier != "primary" or route.fallback is None or not is_timeout(e):
+                raise
+            logger.warning("%s failed on %s (%s), retrying on %s", call_site, route.model, e, route.fallback.model)
+            return self._request(route.fallback, "fallback", "error", call_site, cache, kwargs)
+
+    def _request(self, route: Route, tier: str, reason: str, call_site: str, cache: bool, kwargs: Dict):
+        """Send a request on a route, recording the decision and, on the primary route, the latency."""
+        metrics.MODEL_ROUTES.inc(call_site=call_site, model=route.model, tier=tier, reason=reason)
+        params = dict(kwargs, model=route.model, timeout=route.timeout)
+        caps = [cap for cap in (kwargs.get("max_tokens"), route.max_tokens) if cap is not None]
+        if caps:
+            params["max_tokens"] = min(caps)
+
+        # A primary route with a fallback leaves timeouts to it instead of retrying them
+        retry_timeouts = tier != "primary" or route.fallback is None
+        start = time.perf_counter()
+        try:
+            response = create_chat_completion(cache=cache, call_site=call_site, retry_timeouts=retry_timeouts, **params)
+        except Exception as e:
+            # Timeouts count toward the latency, so a route that keeps timing out degrades
+            if tier == "primary" and is_timeout(e):
+                self.observe(call_site, time.perf_counter() - start)
+            raise
+        if tier != "primary":
+            return response
+        if kwargs.get("stream"):
+            return self._observed_stream(response, call_site, start)
+        self.observe(call_site, time.perf_counter() - start)
+        return response
+
+    def _observed_stream(self, stream, call_site: str, start: float):
+        """Pass a stream through, recording once it ends the time spent waiting on the model, not on the consumer."""
+        waited = time.perf_counter() - start
+        chunks = iter(stream)
+        try:
+            while True:
+                before = time.perf_counter()
+                try:
+                    chunk = next(chunks)
+                finally:
+                    waited += time.perf_counter() - before
+                yield chunk
+        except StopIteration:
+            return
+        finally:
+            self.observe(call_site, waited)
+
+
+def load_routes(overrides: Optional[str]) -> Dict[str, Route]:
+    """
+    Build the routing table from the defaults and a JSON object of overrides by call site.
+
+    Example: {"wrap_up": {"model": "gpt-4o", "slo": 15, "fallback": {"model": "gpt-4o-mini"}}}
+    """
+    routes = dict(DEFAULT_ROUTES)
+    for call_site, settings in json.loads(overrides or "{}").items():
+        routes[call_site] = routes.get(call_site, DEFAULT_ROUTE).updated(settings)
+    return routes
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_model_router() -> ModelRouter:
+    """
+    Return the process-wide model router.
+
+    CONVERGE_MODEL_ROUTES overrides routes of the default table, see
+    `load_routes`, and CONVERGE_ROUTE_COOLDOWN is the number of seconds a
+    route missing its SLO is bypassed.
+    """
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = ModelRouter(
+                load_routes(os.getenv("CONVERGE_MODEL_ROUTES")),
+                cooldown=float(os.getenv("CONVERGE_ROUTE_COOLDOWN", "60")),
+            )
+        return _router
+
+
+def create_routed_completion(call_site: str, cache: bool = False, **kwargs):
+    """
+    Create a chat completion on the process-wide router, see `ModelRouter.create`.
+
+    Args:
+        call_site: Part of the code making the request, e.g. "generate_response"
+        cache: Whether to read and write the response cache
+        **kwargs: Arguments of `client.chat.completions.create`, except the model and timeout
+    """
+    return get_model_router().create(call_site, cache=cache, **kwargs)
+
+
+def complete_text(call_site: str, on_token: Optional[Callable[[str], None]] = None, **kwargs) -> str:
+    """
+    Return the text of a chat completion on the process-wide router, streaming it if asked to.
+
+    Args:
+        call_site: Part of the code making the request, e.g. "generate_response"
+        on_token: If set, the response is streamed and this is called with each new piece of text
+        **kwargs: Arguments of `create_routed_completion`
+    """
+    if on_token is None:
+        choice = create_routed_completion(call_site, **kwargs).choices[0]
+        content, finish_reason = choice.message.content, choice.finish_reason
+    else:
+        content, finish_reason = "", None
+        for chunk in create_routed_completion(call_site, stream=True, **kwargs):
+            if not chunk.choices:
+                continue
+            token = chunk.choices[0].delta.content
+            if token:
+                content += token
+                on_token(token)
+            finish_reason = chunk.choices[0].finish_reason or finish_reason
+
+    if finish_reason == "length":
+        logger.warning("%s response was cut off by its max_tokens", call_site)
+    return content
@@ -0,0 +1,314 @@
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import TYPE_CHECKING
+
+from utils import metrics
+from utils.context_window import count_tokens
+from utils.disk_cache import DiskCache
+
+# The OpenAI SDK takes a few hundred milliseconds to import, so it is only loaded by the first request
+if TYPE_CHECKING:
+    from openai import OpenAI
+    from openai.types.chat import ChatCompletion
+
+logger = logging.getLogger(__name__)
+
+# Retry settings for transient OpenAI errors
+MAX_ATTEMPTS = int(os.getenv("OPENAI_MAX_ATTEMPTS", "5"))
+BASE_RETRY_DELAY = 0.5
+# Cap on the computed backoff, a longer Retry-After from the server is still honored
+MAX_RETRY_DELAY = 30.0
+
+# Default timeout of a single request, in seconds
+REQUEST_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "60"))
+
+_client = None
+_client_lock = threading.Lock()
+
+_response_cache = None
+_response_cache_loaded = False
+
+
+def get_openai_client() -> "OpenAI":
+    """
+    Return the process-wide OpenAI client.
+
+    Every bot and agent shares this client and its HTTP connection pool.
+    Retries are disabled on the client itself, see `with_retries`. The SDK
+    is imported by the first call.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            import httpx
+            from openai import OpenAI
+
+            max_connections = int(os.getenv("OPENAI_MAX_CONNECTIONS", "20"))
+            http_client = httpx.Client(
+                limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+                timeout=httpx.Timeout(REQUEST_TIMEOUT, connect=5.0),
+            )
+            _client = OpenAI(
+                api_key=os.getenv("OPENAI_API_KEY"),
+                http_client=http_client,
+                max_retries=0,
+                timeout=REQUEST_TIMEOUT,
+            )
+        return _client
+
+
+def with_retries(call, retry_timeouts: bool = True):
+    """
+    Run an OpenAI call, retrying transient failures.
+
+    Connection errors, timeouts, rate limits and server errors are retried
+    with jittered exponential backoff, waiting at least as long as the
+    server's Retry-After header asks.
+
+    Args:
+        call: Function making the request
+        retry_timeouts: Whether to retry requests that timed out, or raise right away
+
+    Returns:
+        The return value of `call`
+    """
+    from openai import APIConnectionError, APIStatusError
+
+    for attempt in range(MAX_ATTEMPTS):
+        try:
+            return call()
+        except (APIConnectionError, APIStatusError) as e:
+            if attempt == MAX_ATTEMPTS - 1 or not is_retryable(e) or (is_timeout(e) and not retry_timeouts):
+                raise
+            delay = _retry_delay(e, attempt)
+            logger.warning("OpenAI request failed (%s), retrying in %.1fs", e.__class__.__name__, delay)
+            time.sleep(delay)
+
+
+def create_chat_completion(cache: bool = False, call_site: str = "other", retry_timeouts: bool = True, **kwargs):
+    """
+    Create a chat completion on the shared client, with retries.
+
+    Completions can be cached on disk, keyed on the model, messages and
+    sampling parameters, so identical requests are only paid for once. Only
+    requests at temperature 0 use the cache, whatever `cache` says: a cached
+    response would replace every new sample of a sampled request.
+
+    Args:
+        cache: Whether to read and write the response cache, for requests at temperature 0
+        call_site: Part of the code making the request, for the latency, token and cost metrics
+        retry_timeouts: Whether to retry a request that timed out, see `with_retries`
+        **kwargs: Arguments of `client.chat.completions.create`
+
+    Returns:
+        The completion, or a stream of chunks if `stream=True`
+    """
+    response_cache = get_response_cache() if cache and kwargs.get("temperature") == 0 else None
+    if response_cache is None:
+        return _measured_chat_completion(call_site, kwargs, retry_timeouts)
+
+    key = _cache_key(kwargs)
+    cached = response_cache.get(key)
+    if cached is not None:
+        metrics.OPENAI_REQUESTS.inc(call_site=call_site, model=kwargs.get("model", ""), outcome="cached")
+        from openai.types.chat import ChatCompletion
+        completion = ChatCompletion.model_validate_json(cached)
+        return _replay_stream(completion) if kwargs.get("stream") else completion
+
+    response = _measured_chat_completion(call_site, kwargs, retry_timeouts)
+    if kwargs.get("stream"):
+        return _record_stream(response, response_cache, key)
+
+    response_cache.set(key, response.model_dump_json())
+    return response
+
+
+def _measured_chat_completion(call_site: str, kwargs: dict, retry_timeouts: bool = True):
+    """Send a chat completion request, recording its latency, tokens and cost."""
+    model = kwargs.get("model", "")
+    start = time.perf_counter()
+    try:
+        response = with_retries(lambda: get_openai_client().chat.completions.create(**kwargs), retry_timeouts)
+    except Exception:
+        metrics.OPENAI_REQUESTS.inc(call_site=call_site, model=model, outcome="error")
+        metrics.OPENAI_REQUEST_DURATION.observe(time.perf_counter() - start, call_site=call_site, model=model)
+        raise
+
+    if kwargs.get("stream"):
+        return _measured_stream(response, call_site, kwargs, start)
+
+    metrics.OPENAI_REQUEST_DURATION.observe(time.perf_counter() - start, call_site=call_site, model=model)
+    usage = response.usage
+    if usage is not None:
+        metrics.record_openai_usage(call_site, model, usage.prompt_tokens, usage.completion_tokens)
+    else:
+        metrics.OPENAI_REQUESTS.inc(call_site=call_site, model=model, outcome="ok")
+    return response
+
+
+def _measured_stream(stream, call_site: str, kwargs: dict, start: float):
+    """Pass a stream through, recording its latency and estimated tokens once it finishes."""
+    model = kwargs.get("model", "")
+    content = ""
+    try:
+        for chunk in stream:
+            if chunk.choices:
+                content += chunk.choices[0].delta.content or ""
+            yield chunk
+    except Exception:
+        metrics.OPENAI_REQUESTS.inc(call_site=call_site, model=model, outcome="error")
+        raise
+    else:
+        # Streamed responses carry no usage, so count the tokens ourselves
+        prompt_tokens = sum(count_tokens(message["content"]) for message in kwargs.get("messages", []))
+        metrics.record_openai_usage(call_site, model, prompt_tokens, count_tokens(content))
+    finally:
+        metrics.OPENAI_REQUEST_DURATION.observe(time.perf_counter() - start, call_site=call_site, model=model)
+
+
+def get_response_cache():
+    """
+    Return the process-wide chat completion cache.
+
+    The cache lives in CONVERGE_LLM_CACHE_DB and is disabled if that is set
+    to an empty string. CONVERGE_LLM_CACHE_MAX_ENTRIES and
+    CONVERGE_LLM_CACHE_TTL (seconds) bound its size and entry lifetime.
+    """
+    global _response_cache, _response_cache_loaded
+    with _client_lock:
+        if not _response_cache_loaded:
+            path = os.getenv("CONVERGE_LLM_CACHE_DB", "converge_llm_cache.db")
+            if path:
+                _response_cache = DiskCache(
+                    path,
+                    max_entries=int(os.getenv("CONVERGE_LLM_CACHE_MAX_ENTRIES", "10000")),
+                    ttl=float(os.getenv("CONVERGE_LLM_CACHE_TTL", str(7 * 86400))),
+                    name="llm",
+                )
+            _response_cache_loaded = True
+        return _response_cache
+
+
+def _cache_key(kwargs: dict) -> str:
+    """Hash the parts of a request that determine its completion."""
+    request = {name: value for name, value in kwargs.items() if name not in ("stream", "timeout")}
+    canonical = json.dumps(request, sort_keys=True, separators=(",", ":"), default=str)
+    return "chat:" + hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _replay_stream(completion: "ChatCompletion"):
+    """Replay a cached completion as a stream with a single chunk."""
+    from openai.types.chat import ChatCompletionChunk
+
+    choice = completion.choices[0]
+    yield ChatCompletionChunk(
+        id=completion.id,
+        created=completion.created,
+        model=completion.model,
+        object="chat.completion.chunk",
+        choices=[{"index": 0, "delta": {"role": "assistant", "content": choice.message.content}, "finish_reason": choice.finish_reason}],
+    )
+
+
+def _record_stream(stream, response_cache: DiskCache, key: str):
+    """Pass a stream through, caching the completion once it finishes."""
+    content = ""
+    finish_reason = None
+    last_chunk = None
+    for chunk in stream:
+        last_chunk = chunk
+        if chunk.choices:
+            content += chunk.choices[0].delta.content or ""
+            finish_reason = chunk.choices[0].finish_reason or finish_reason
+        yield chunk
+
+    # Only complete responses are cached
+    if last_chunk is not None and finish_reason is not None:
+        from openai.types.chat import ChatCompletion
+        completion = ChatCompletion(
+            id=last_chunk.id,
+            created=last_chunk.created,
+            model=last_chunk.model,
+            object="chat.completion",
+            choices=[{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": finish_reason}],
+        )
+        response_cache.set(key, completion.model_dump_json())
+
+
+def create_transcription(call_site: str = "whisper", **kwargs):
+    """
+    Transcribe audio on the shared client, with retries.
+
+    Args:
+        call_site: Part of the code making the request, for the latency metrics
+        **kwargs: Arguments of `client.audio.transcriptions.create`
+
+    Returns:
+        The transcription
+    """
+    model = kwargs.get("model", "")
+    with metrics.OPENAI_REQUEST_DURATION.time(call_site=call_site, model=model):
+        try:
+            transcription = with_retries(lambda: get_openai_client().audio.transcriptions.create(**kwargs))
+        except Exception:
+            metrics.OPENAI_REQUESTS.inc(call_site=call_site, model=model, outcome="error")
+            raise
+    metrics.OPENAI_REQUESTS.inc(call_site=call_site, model=model, outcome="ok")
+    return transcription
+
+
+def is_retryable(error: Exception) -> bool:
+    """Whether a failed OpenAI request may succeed when retried: timeouts, connection errors, rate limits and server errors."""
+    from openai import APIConnectionError, APIStatusError
+
+    if isinstance(error, APIStatusError):
+        return error.status_code in (408, 409, 429) or error.status_code >= 500
+    return isinstance(error, APIConnectionError)
+
+
+def is_timeout(error: Exception) -> bool:
+    """Whether a failed OpenAI request took too long, as opposed to being refused or failing."""
+    from openai import APIStatusError, APITimeoutError
+
+    return isinstance(error, APITimeoutError) or (isinstance(error, APIStatusError) and error.status_code == 408)
+
+
+def _retry_delay(error: Exception, attempt: int) -> float:
+    """Seconds to wait before the next attempt."""
+    backoff = random.uniform(0, min(MAX_RETRY_DELAY, BASE_RETRY_DELAY * 2 ** attempt))
+    retry_after = _retry_after(error)
+    if retry_after is not None:
+        # Honor the server's delay in full, only the backoff added to it is capped
+        return retry_after + backoff / 4
+    return backoff
+
+
+def _retry_after(error: Exception):
+    """Read the delay requested by the server's Retry-After headers, if any."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+
+    retry_after_ms = response.headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+
+    retry_after = response.headers.get("retry-after")
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    return None
@@ -0,0 +1,6 @@
+import re
+
+
+def safe_name(name: str) -> str:
+    """Make a string safe to use in a file name, e.g. a meeting or Slack user ID."""
+    return re.sub(r"[^A-Za-z0-9._-]+", "-", name).strip("-")
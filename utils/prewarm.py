@@ -0,0 +1,62 @@
+import importlib
+import logging
+import threading
+import time
+from typing import Optional
+
+from utils.openai_client import get_openai_client
+
+logger = logging.getLogger(__name__)
+
+# Libraries loaded on first use by the PDF, voice note and download code paths
+LAZY_MODULES = ("pypdf", "requests", "llama_parse", "pydub")
+
+
+def prewarm(background: bool = True) -> Optional[threading.Thread]:
+    """
+    Load the libraries the app imports lazily, and create the OpenAI client, ahead of their first use.
+
+    Messages are served while this runs: nothing waits for it, and a library
+    that isn't installed is skipped. Call it in each worker process once it
+    has started, never before forking.
+
+    Args:
+        background: Run in a daemon thread instead of blocking
+
+    Returns:
+        The thread, or None if `background` is False
+    """
+    if not background:
+        _load()
+        return None
+    thread = threading.Thread(target=_load, name="prewarm", daemon=True)
+    thread.start()
+    return thread
+
+
+def _load() -> None:
+    """Import every lazily loaded library, then create the OpenAI client."""
+    start = time.perf_counter()
+    for module in LAZY_MODULES:
+        try:
+            importlib.import_module(module)
+        except ImportError as e:
+            logger.debug("Skipping pre-warm of %s: %s", module, e)
+    try:
+        get_openai_client()
+    except Exception as e:
+        # The first request will raise the same error where it can be handled
+        logger.warning("Could not create the OpenAI client: %s", e)
+    logger.info("Pre-warmed lazy imports in %.2fs", time.perf_counter() - start)
+
+
+def post_fork(server, worker) -> None:
+    """Gunicorn hook pre-warming each worker, used with `gunicorn -c python:utils.prewarm app:flask_app`."""
+    prewarm()
+
+
+def post_worker_init(worker) -> None:
+    """Gunicorn hook starting the app's background tasks in each worker, once it has loaded the app."""
+    from app import start_background_tasks
+
+    start_background_tasks()
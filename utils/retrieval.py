@@ -0,0 +1,162 @@
+import heapq
+import math
+import re
+import threading
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from utils.context_window import count_tokens
+
+# Documents shorter than this many tokens are used whole rather than retrieved from
+MIN_RETRIEVAL_TOKENS = 600
+
+# Words per chunk of an indexed document
+CHUNK_WORDS = 80
+
+# Number of documents whose token count and index are kept in memory
+MAX_CACHED_INDEXES = 64
+
+_WORD_PATTERN = re.compile(r"[a-z0-9']+")
+_SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+|\n+")
+
+# Words too common to tell passages apart
+STOPWORDS = frozenset(
+    "a an and are as at be but by do for from has have he her his i if in is it its me my no not of on or our "
+    "she so that the their them they this to was we were what when which who will with you your".split()
+)
+
+
+def chunk_text(text: str, chunk_words: int = CHUNK_WORDS) -> List[str]:
+    """
+    Split a document into passages of about `chunk_words` words, without breaking sentences.
+
+    Args:
+        text: The document
+        chunk_words: Target number of words per passage. Longer sentences make a passage of their own
+
+    Returns:
+        The passages, in document order
+    """
+    chunks = []
+    current: List[str] = []
+    length = 0
+    for sentence in _SENTENCE_PATTERN.split(text):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        words = len(sentence.split())
+        if current and length + words > chunk_words:
+            chunks.append(" ".join(current))
+            current, length = [], 0
+        current.append(sentence)
+        length += words
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+def _terms(text: str) -> List[str]:
+    """Lowercase words of a text, without stopwords."""
+    return [word for word in _WORD_PATTERN.findall(text.lower()) if word not in STOPWORDS]
+
+
+class ChunkIndex:
+    """
+    BM25 index of the passages of one document.
+
+    The BM25 weight of every term in every passage containing it is computed
+    once and kept in postings lists, so scoring a query only visits the
+    passages sharing a term with it, and the index takes memory in
+    proportion to the document rather than to its passages times its
+    vocabulary.
+    """
+    def __init__(self, chunks: List[str], k1: float = 1.5, b: float = 0.75):
+        """
+        Index passages.
+
+        Args:
+            chunks: The passages, in document order
+            k1: Term frequency saturation
+            b: Passage length normalization
+        """
+        self.chunks = chunks
+        rows = [Counter(_terms(chunk)) for chunk in chunks]
+        lengths = [sum(counts.values()) for counts in rows]
+        average_length = max(sum(lengths) / len(lengths), 1.0) if lengths else 1.0
+
+        document_frequency = Counter(term for counts in rows for term in counts)
+        self.postings: Dict[str, List[Tuple[int, float]]] = {}
+        for row, (counts, length) in enumerate(zip(rows, lengths)):
+            norm = k1 * (1 - b + b * length / average_length)
+            for term, count in counts.items():
+                idf = math.log1p((len(chunks) - document_frequency[term] + 0.5) / (document_frequency[term] + 0.5))
+                self.postings.setdefault(term, []).append((row, idf * count * (k1 + 1) / (count + norm)))
+
+    def search(self, query: str, k: int) -> List[int]:
+        """
+        Find the passages best matching a query.
+
+        Args:
+            query: Text to match, e.g. the last messages of a discussion
+            k: Maximum number of passages
+
+        Returns:
+            Positions of the matching passages, best first. Passages sharing no term with the query are left out
+        """
+        if k <= 0:
+            return []
+        scores: Dict[int, float] = {}
+        for term in _terms(query):
+            for row, weight in self.postings.get(term, ()):
+                scores[row] = scores.get(row, 0.0) + weight
+        best = heapq.nlargest(k, scores.items(), key=lambda item: (item[1], -item[0]))
+        return [row for row, score in best if score > 0]
+
+    def passages(self, query: str, k: int) -> str:
+        """
+        Return the opening passage and the `k` passages best matching a query, in document order.
+
+        The opening passage usually introduces the document, so it is always included.
+        """
+        positions = sorted({0, *self.search(query, k)}) if self.chunks else []
+        return "\n...\n".join(self.chunks[position] for position in positions)
+
+
+# Token count of each recently seen document, and its index if it is long enough to retrieve from
+_indexes: "OrderedDict[str, Tuple[int, Optional[ChunkIndex]]]" = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def _get_document(text: str) -> Tuple[int, Optional[ChunkIndex]]:
+    """Return the token count of a document and its index, reusing them if the same document was seen recently."""
+    with _indexes_lock:
+        entry = _indexes.get(text)
+        if entry is not None:
+            _indexes.move_to_end(text)
+            return entry
+
+    tokens = count_tokens(text)
+    entry = (tokens, ChunkIndex(chunk_text(text)) if tokens >= MIN_RETRIEVAL_TOKENS else None)
+    with _indexes_lock:
+        _indexes[text] = entry
+        while len(_indexes) > MAX_CACHED_INDEXES:
+            _indexes.popitem(last=False)
+    return entry
+
+
+def relevant_context(text: str, query: str, k: int = 4) -> str:
+    """
+    Select the parts of a document relevant to a query, to send instead of the whole document.
+
+    Args:
+        text: The document, e.g. a team member report
+        query: Text the passages should relate to
+        k: Number of passages retrieved, besides the opening one
+
+    Returns:
+        The document itself if it is shorter than MIN_RETRIEVAL_TOKENS, the selected passages otherwise
+    """
+    if not text:
+        return text
+    _, index = _get_document(text)
+    return index.passages(query, k) if index is not None else text
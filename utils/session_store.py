@@ -0,0 +1,173 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional
+
+
+def encode_state(state: Dict) -> bytes:
+    """Serialize a session state to compact, compressed JSON."""
+    return zlib.compress(json.dumps(state, separators=(",", ":")).encode("utf-8"))
+
+
+def decode_state(data: bytes) -> Dict:
+    """Deserialize a session state produced by `encode_state`."""
+    return json.loads(zlib.decompress(data).decode("utf-8"))
+
+
+class StaleStateError(Exception):
+    """Raised by an `update` function to abandon a write, because the state changed since it was read."""
+
+
+class SessionStore(ABC):
+    """
+    Interface for storing conversation state between Slack messages.
+
+    States are plain JSON-serializable dicts. Backends always hand out fresh
+    copies, so mutating a state has no effect until it is `put` back.
+    """
+    @abstractmethod
+    def get(self, key: str) -> Optional[Dict]:
+        """Return the state stored under `key`, or None if there is none."""
+
+    @abstractmethod
+    def put(self, key: str, state: Dict) -> None:
+        """Store `state` under `key`, replacing any previous state."""
+
+    @abstractmethod
+    def update(self, key: str, fn: Callable[[Optional[Dict]], Dict]) -> Dict:
+        """
+        Atomically replace the state stored under `key`.
+
+        Args:
+            key: Key of the state
+            fn: Called with the current state (None if there is none), returns the new state. Raising, e.g.
+                StaleStateError, leaves the state unchanged
+
+        Returns:
+            The new state
+        """
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Remove the state stored under `key`, if any."""
+
+    @abstractmethod
+    def keys(self) -> List[str]:
+        """Return every key with a stored state."""
+
+
+class InMemorySessionStore(SessionStore):
+    """Session store kept in process memory. State is lost on restart."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data: Dict[str, bytes] = {}
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            data = self._data.get(key)
+        return decode_state(data) if data is not None else None
+
+    def put(self, key: str, state: Dict) -> None:
+        data = encode_state(state)
+        with self._lock:
+            self._data[key] = data
+
+    def update(self, key: str, fn: Callable[[Optional[Dict]], Dict]) -> Dict:
+        with self._lock:
+            data = self._data.get(key)
+            state = fn(decode_state(data) if data is not None else None)
+            self._data[key] = encode_state(state)
+        return state
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def keys(self) -> List[str]:
+        with self._lock:
+            return list(self._data)
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Session store backed by a SQLite database in WAL mode.
+
+    Several processes on the same machine can share one database file, which
+    lets the app run under multiple web workers and survive restarts.
+    """
+    def __init__(self, path: str):
+        """
+        Initialize the store, creating the database if needed.
+
+        Args:
+            path: Path of the SQLite database file
+        """
+        self.path = path
+        self._local = threading.local()
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "key TEXT PRIMARY KEY, data BLOB NOT NULL, updated_at REAL NOT NULL)"
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return this thread's connection to the database."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[Dict]:
+        row = self._connection().execute("SELECT data FROM sessions WHERE key = ?", (key,)).fetchone()
+        return decode_state(row[0]) if row else None
+
+    def put(self, key: str, state: Dict) -> None:
+        self._connection().execute(
+            "INSERT OR REPLACE INTO sessions (key, data, updated_at) VALUES (?, ?, ?)",
+            (key, encode_state(state), time.time())
+        )
+
+    def update(self, key: str, fn: Callable[[Optional[Dict]], Dict]) -> Dict:
+        conn = self._connection()
+        # Take the write lock before reading, so concurrent updates from other processes are serialized
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT data FROM sessions WHERE key = ?", (key,)).fetchone()
+            state = fn(decode_state(row[0]) if row else None)
+            conn.execute(
+                "INSERT OR REPLACE INTO sessions (key, data, updated_at) VALUES (?, ?, ?)",
+                (key, encode_state(state), time.time())
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return state
+
+    def delete(self, key: str) -> None:
+        self._connection().execute("DELETE FROM sessions WHERE key = ?", (key,))
+
+    def keys(self) -> List[str]:
+        return [row[0] for row in self._connection().execute("SELECT key FROM sessions")]
+
+
+def create_session_store() -> SessionStore:
+    """
+    Create the session store configured by the environment.
+
+    CONVERGE_SESSION_STORE selects the backend ("sqlite" or "memory"), and
+    CONVERGE_SESSION_DB sets the SQLite database path.
+    """
+    backend = os.getenv("CONVERGE_SESSION_STORE", "sqlite")
+    if backend == "memory":
+        return InMemorySessionStore()
+    if backend == "sqlite":
+        return SQLiteSessionStore(os.getenv("CONVERGE_SESSION_DB", "converge_sessions.db"))
+    raise ValueError(f"Unknown session store backend: {backend}")
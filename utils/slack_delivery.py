@@ -0,0 +1,159 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from slack_sdk.errors import SlackApiError
+
+from utils import metrics
+from utils.tracing import propagate
+
+logger = logging.getLogger(__name__)
+
+# Requests per minute allowed by Slack's rate limit tiers
+TIER_RATES = {1: 1, 2: 20, 3: 50, 4: 100}
+
+# Rate limit tier of the Web API methods the app uses, by client method name
+METHOD_TIERS = {
+    "auth_test": 4,
+    "users_info": 4,
+    "users_list": 2,
+    "conversations_list": 2,
+    "conversations_open": 3,
+    "conversations_create": 2,
+    "chat_update": 3,
+}
+
+# chat.postMessage has its own limit of about one message per second in each channel
+POST_MESSAGE_RATE = 60
+
+
+class TokenBucket:
+    """A thread-safe token bucket refilled at a constant rate."""
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        """
+        Initialize a full bucket.
+
+        Args:
+            rate_per_minute: Tokens added per minute
+            capacity: Maximum number of tokens, which bounds bursts. Defaults to a tenth of the rate
+        """
+        self.rate = rate_per_minute / 60
+        self.capacity = capacity or max(1.0, rate_per_minute / 10)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Take a token, sleeping until one is available."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+                if now >= self._paused_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                delay = max(self._paused_until - now, (1 - self._tokens) / self.rate)
+            time.sleep(delay)
+
+    def pause(self, seconds: float) -> None:
+        """Hand out no tokens for the next `seconds` seconds."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+class RateLimitedSlackClient:
+    """
+    Wraps a Slack client so every Web API call respects Slack's rate limits.
+
+    Each method draws from a token bucket sized for its rate tier, and
+    chat.postMessage from a bucket per channel. When Slack still answers
+    `ratelimited`, the bucket is paused for the Retry-After delay and the
+    call is retried.
+    """
+    def __init__(self, client, max_attempts: int = 3):
+        """
+        Initialize the wrapper.
+
+        Args:
+            client: Slack client instance
+            max_attempts: Attempts per call before a rate limit error is raised
+        """
+        self.client = client
+        self.max_attempts = max_attempts
+        self._buckets: Dict[Tuple[str, Optional[str]], TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        method = getattr(self.client, name)
+        if not callable(method):
+            return method
+
+        def call(*args, **kwargs):
+            bucket = self._bucket(name, kwargs.get("channel"))
+            for attempt in range(self.max_attempts):
+                bucket.acquire()
+                metrics.SLACK_CALLS.inc(method=name)
+                try:
+                    return method(*args, **kwargs)
+                except SlackApiError as e:
+                    metrics.SLACK_ERRORS.inc(method=name, error=e.response.get("error", "unknown"))
+                    if e.response.get("error") != "ratelimited" or attempt == self.max_attempts - 1:
+                        raise
+                    retry_after = _retry_after(e.response.headers)
+                    logger.warning("Slack rate limited %s, retrying in %.0fs", name, retry_after)
+                    bucket.pause(retry_after)
+
+        return call
+
+    def _bucket(self, name: str, channel: Optional[str] = None) -> TokenBucket:
+        """Return the token bucket of a client method, or of a channel for chat.postMessage."""
+        key = (name, channel if name == "chat_postMessage" else None)
+        with self._lock:
+            if key not in self._buckets:
+                if name == "chat_postMessage":
+                    rate = POST_MESSAGE_RATE
+                else:
+                    rate = TIER_RATES[METHOD_TIERS.get(name, 3)]
+                self._buckets[key] = TokenBucket(rate)
+            return self._buckets[key]
+
+
+def _retry_after(headers) -> float:
+    """Seconds to wait from the Retry-After header of a rate limited response, whatever its case, or 1."""
+    for header, value in (headers or {}).items():
+        if header.lower() == "retry-after":
+            return float(value[0] if isinstance(value, list) else value)
+    return 1.0
+
+
+def deliver_concurrently(send: Callable[[str], None], recipients: Iterable[str], max_workers: int = 8) -> Dict[str, Optional[str]]:
+    """
+    Run a delivery function for several recipients concurrently.
+
+    Args:
+        send: Delivers to one recipient, raising on failure
+        recipients: Recipients to deliver to
+        max_workers: Maximum number of deliveries running at once
+
+    Returns:
+        Dict mapping each recipient to None on success, or an error message on failure
+    """
+    recipients = list(recipients)
+    if not recipients:
+        return {}
+
+    def attempt(recipient):
+        try:
+            send(recipient)
+            return None
+        except SlackApiError as e:
+            return e.response.get("error", str(e))
+        except Exception as e:
+            return str(e)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return dict(zip(recipients, executor.map(propagate(attempt), recipients)))
@@ -0,0 +1,154 @@
+import threading
+import time
+from typing import Iterable, Optional
+
+
+class SlackDirectory:
+    """
+    A TTL cache in front of Slack's user and conversation lookups.
+
+    Caches user ID -> real name, user ID -> DM channel ID and the bot's own
+    user ID. Prefetching many users at once fills the misses with one
+    paginated bulk listing instead of one call per user.
+    """
+    # Page size of the bulk listings
+    PAGE_SIZE = 200
+
+    # Prefetches with more misses than this use a bulk listing, which pages through the whole workspace
+    BULK_THRESHOLD = 10
+
+    def __init__(self, client, ttl: float = 3600):
+        """
+        Initialize an empty directory.
+
+        Args:
+            client: Slack client instance
+            ttl: Seconds a cached entry stays valid
+        """
+        self.client = client
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._names = {}
+        self._dm_channels = {}
+        self._bot_user_id = None
+        self._listed_at = {}
+
+    def bot_user_id(self) -> str:
+        """Return the user ID of the bot itself."""
+        with self._lock:
+            cached = self._fresh(self._bot_user_id)
+        if cached is not None:
+            return cached
+
+        user_id = self.client.auth_test()["user_id"]
+        with self._lock:
+            self._bot_user_id = (user_id, time.monotonic() + self.ttl)
+        return user_id
+
+    def real_name(self, user_id: str) -> str:
+        """
+        Return the real name of a user.
+
+        Args:
+            user_id: Slack user ID
+        """
+        with self._lock:
+            cached = self._fresh(self._names.get(user_id))
+        if cached is not None:
+            return cached
+
+        user_info = self.client.users_info(user=user_id)
+        name = user_info["user"]["real_name"]
+        self._store(self._names, user_id, name)
+        return name
+
+    def dm_channel(self, user_id: str) -> str:
+        """
+        Return the ID of the bot's DM channel with a user, opening it if needed.
+
+        Args:
+            user_id: Slack user ID
+        """
+        with self._lock:
+            cached = self._fresh(self._dm_channels.get(user_id))
+        if cached is not None:
+            return cached
+
+        # Returns the existing channel if there is one
+        ch = self.client.conversations_open(users=[user_id], return_im=True)
+        channel_id = ch["channel"]["id"]
+        self._store(self._dm_channels, user_id, channel_id)
+        return channel_id
+
+    def prefetch(self, user_ids: Iterable[str]) -> None:
+        """
+        Fill the cache for several users, with bulk listings if many of them are missing.
+
+        Args:
+            user_ids: Slack user IDs that are about to be looked up
+        """
+        user_ids = list(dict.fromkeys(user_ids))
+        with self._lock:
+            missing_names = [user for user in user_ids if self._fresh(self._names.get(user)) is None]
+            missing_channels = [user for user in user_ids if self._fresh(self._dm_channels.get(user)) is None]
+
+        # A few misses are cheaper to resolve one by one than by listing the whole workspace
+        if len(missing_names) > self.BULK_THRESHOLD:
+            self._load_names()
+        else:
+            for user_id in missing_names:
+                self.real_name(user_id)
+        if len(missing_channels) > self.BULK_THRESHOLD:
+            self._load_dm_channels()
+        else:
+            for user_id in missing_channels:
+                self.dm_channel(user_id)
+
+    def _load_names(self) -> None:
+        """Cache the real name of every user in the workspace, unless done within the TTL."""
+        if not self._claim_listing("users"):
+            return
+        for page in self._pages(self.client.users_list):
+            for member in page["members"]:
+                name = member.get("real_name") or member.get("profile", {}).get("real_name")
+                if name:
+                    self._store(self._names, member["id"], name)
+
+    def _load_dm_channels(self) -> None:
+        """Cache every DM channel the bot is in, unless done within the TTL."""
+        if not self._claim_listing("dm_channels"):
+            return
+        for page in self._pages(self.client.conversations_list, types="im"):
+            for conv in page["channels"]:
+                self._store(self._dm_channels, conv["user"], conv["id"])
+
+    def _claim_listing(self, listing: str) -> bool:
+        """Record that a bulk listing is starting, unless it already ran within the TTL."""
+        with self._lock:
+            now = time.monotonic()
+            if self._listed_at.get(listing, -self.ttl) + self.ttl > now:
+                return False
+            self._listed_at[listing] = now
+            return True
+
+    def _pages(self, method, **kwargs):
+        """Iterate over all pages of a paginated Slack method."""
+        while True:
+            page = method(limit=self.PAGE_SIZE, **kwargs)
+            yield page
+            cursor = page.get("response_metadata", {}).get("next_cursor")
+            if not cursor:
+                return
+            kwargs["cursor"] = cursor
+
+    def _store(self, cache: dict, key: str, value: str) -> None:
+        """Cache a value until the TTL runs out."""
+        with self._lock:
+            cache[key] = (value, time.monotonic() + self.ttl)
+
+    @staticmethod
+    def _fresh(entry) -> Optional[str]:
+        """Return a cached value if it hasn't expired."""
+        if entry is None or entry[1] < time.monotonic():
+            return None
+        return entry[0]
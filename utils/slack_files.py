@@ -0,0 +1,96 @@
+import hashlib
+import os
+import tempfile
+import threading
+import time
+
+from utils.disk_cache import DiskCache
+
+# Size of the chunks a file is downloaded in
+CHUNK_SIZE = 1 << 16
+
+_media_cache = None
+_media_cache_lock = threading.Lock()
+
+
+def time_left(deadline):
+    """
+    Return the seconds left before a deadline.
+
+    Args:
+        deadline (float, optional): `time.monotonic()` time the work must be done by, None for no deadline
+
+    Returns:
+        float: Seconds left, or None without a deadline
+
+    Raises:
+        TimeoutError: If the deadline has passed
+    """
+    if deadline is None:
+        return None
+    left = deadline - time.monotonic()
+    if left <= 0:
+        raise TimeoutError("Deadline exceeded")
+    return left
+
+
+def download_slack_file(url, headers=None, suffix="", max_bytes=None, deadline=None):
+    """
+    Stream a Slack file to a temporary file on disk.
+
+    Args:
+        url (str): URL of the file, e.g. its `url_private_download`
+        headers (dict, optional): Headers to use for the request, e.g. for authentication
+        suffix (str, optional): Suffix of the temporary file name, e.g. '.pdf'
+        max_bytes (int, optional): Abort the download past this size
+        deadline (float, optional): `time.monotonic()` time to abort the download at
+
+    Returns:
+        tuple: Path of the temporary file, which the caller must delete, and the SHA-256 of its content
+
+    Raises:
+        TimeoutError: If the deadline passes before the download ends
+        Exception: If the download fails or the file is too large
+    """
+    import requests
+
+    left = time_left(deadline)
+    timeout = (5, 60) if left is None else (min(5, left), min(60, left))
+    digest = hashlib.sha256()
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    try:
+        with requests.get(url, headers=headers, stream=True, timeout=timeout) as response, os.fdopen(fd, "wb") as f:
+            if response.status_code != 200:
+                raise Exception(f"Failed to download file: {response.status_code}")
+
+            size = 0
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                time_left(deadline)
+                size += len(chunk)
+                if max_bytes is not None and size > max_bytes:
+                    raise Exception(f"File is larger than {max_bytes} bytes")
+                digest.update(chunk)
+                f.write(chunk)
+    except BaseException:
+        os.unlink(path)
+        raise
+
+    return path, digest.hexdigest()
+
+
+def get_media_cache() -> DiskCache:
+    """
+    Return the process-wide cache of transcripts and extracted document text.
+
+    The cache lives in CONVERGE_MEDIA_CACHE_DB.
+    """
+    global _media_cache
+    with _media_cache_lock:
+        if _media_cache is None:
+            _media_cache = DiskCache(
+                os.getenv("CONVERGE_MEDIA_CACHE_DB", "converge_media_cache.db"),
+                max_entries=int(os.getenv("CONVERGE_MEDIA_CACHE_MAX_ENTRIES", "1000")),
+                ttl=float(os.getenv("CONVERGE_MEDIA_CACHE_TTL", str(30 * 86400))),
+                name="media",
+            )
+        return _media_cache
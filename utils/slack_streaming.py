@@ -0,0 +1,89 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class SlackMessageStream:
+    """
+    A Slack message that is posted right away and updated as text arrives.
+
+    A placeholder is posted on creation, then `append` edits the message with
+    `chat_update` as tokens come in. Updates are throttled per channel, across
+    every stream in the process, to stay under Slack's rate limits. If the
+    text can't be generated, `finish(None)` replaces the message with an
+    error.
+    """
+    _last_update = {}
+    _lock = threading.Lock()
+
+    def __init__(self, client, channel, thread_ts=None, placeholder="_Thinking..._", min_interval=1.0,
+                 error_text="_Sorry, I ran into an error writing this message._", **message_kwargs):
+        """
+        Post the placeholder message.
+
+        Args:
+            client: Slack client instance
+            channel: Channel to post to
+            thread_ts: Thread to post in, if any
+            placeholder: Text shown until the first update
+            min_interval: Minimum seconds between two updates in the same channel
+            error_text: Text shown if the text can't be generated
+            **message_kwargs: Extra `chat_postMessage` arguments, e.g. username
+        """
+        self.client = client
+        self.min_interval = min_interval
+        self.error_text = error_text
+        self.text = ""
+        self._sent_text = placeholder
+
+        response = client.chat_postMessage(channel=channel, text=placeholder, thread_ts=thread_ts, **message_kwargs)
+        # chat_update needs the channel ID, which may differ from the name we posted to
+        self.channel = response["channel"]
+        self.ts = response["ts"]
+
+    def append(self, token: str) -> None:
+        """
+        Add streamed text to the message, updating it if the channel's rate limit allows.
+
+        Args:
+            token: Text to append
+        """
+        self.text += token
+        if self._reserve_update(wait=False):
+            self._update()
+
+    def finish(self, text) -> None:
+        """
+        Write the final text to the message, waiting for the rate limit if needed.
+
+        Args:
+            text: Final message text, or None if generating it failed, which shows the error text instead
+        """
+        self.text = text or self.error_text
+        if self.text != self._sent_text:
+            self._reserve_update(wait=True)
+            self._update()
+
+    def _reserve_update(self, wait: bool) -> bool:
+        """Claim the channel's next update slot, optionally sleeping until it is free."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                delay = self._last_update.get(self.channel, 0) + self.min_interval - now
+                if delay <= 0:
+                    self._last_update[self.channel] = now
+                    return True
+            if not wait:
+                return False
+            time.sleep(delay)
+
+    def _update(self) -> None:
+        """Send the current text to Slack."""
+        text = self.text
+        try:
+            self.client.chat_update(channel=self.channel, ts=self.ts, text=text)
+            self._sent_text = text
+        except Exception as e:
+            logger.warning("Error updating streamed message: %s", e)
@@ -0,0 +1,79 @@
+import contextvars
+import logging
+import os
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+# ID of the meeting the current thread is working on, shown in every log line
+_trace_id = contextvars.ContextVar("trace_id", default="-")
+
+
+def current_trace_id() -> str:
+    """Return the trace ID of the current context, or "-" outside of any meeting."""
+    return _trace_id.get()
+
+
+def set_trace_id(trace_id: Optional[str]) -> None:
+    """
+    Set the trace ID of the current context, e.g. once a new meeting gets its ID.
+
+    Args:
+        trace_id: Usually the meeting ID
+    """
+    _trace_id.set(trace_id or "-")
+
+
+@contextmanager
+def trace(trace_id: Optional[str]):
+    """
+    Run the `with` block under a trace ID, restoring the previous one afterwards.
+
+    Args:
+        trace_id: Usually the meeting ID
+    """
+    token = _trace_id.set(trace_id or "-")
+    try:
+        yield
+    finally:
+        _trace_id.reset(token)
+
+
+def propagate(fn: Callable) -> Callable:
+    """
+    Bind a function to the current trace ID, for running it on another thread.
+
+    Thread pools don't inherit the submitting thread's context, so wrap
+    functions with this before submitting them.
+
+    Args:
+        fn: Function to run on another thread
+
+    Returns:
+        A function running `fn` under the current trace ID
+    """
+    trace_id = current_trace_id()
+
+    def run(*args, **kwargs):
+        with trace(trace_id):
+            return fn(*args, **kwargs)
+
+    return run
+
+
+class TraceIdFilter(logging.Filter):
+    """Adds the current trace ID to log records, as `trace_id`."""
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.trace_id = current_trace_id()
+        return True
+
+
+def configure_logging() -> None:
+    """
+    Log to stderr with the trace ID in every line.
+
+    CONVERGE_LOG_LEVEL sets the minimum level logged (default INFO).
+    """
+    handler = logging.StreamHandler()
+    handler.addFilter(TraceIdFilter())
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(trace_id)s] %(name)s: %(message)s"))
+    logging.basicConfig(level=os.getenv("CONVERGE_LOG_LEVEL", "INFO"), handlers=[handler])
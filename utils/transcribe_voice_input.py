@@ -1,18 +1,71 @@
-from openai import OpenAI
+import hashlib
+import io
+import logging
 import os
-from dotenv import load_dotenv
-import requests
+import re
+from concurrent.futures import ThreadPoolExecutor
 
-load_dotenv()
+from utils import metrics
+from utils.openai_client import create_transcription
+from utils.slack_files import download_slack_file, get_media_cache, time_left
+from utils.tracing import propagate
 
-client = OpenAI(
-    api_key=os.getenv("OPENAI_API_KEY")
-)
+logger = logging.getLogger(__name__)
 
-def process_speech_bytes_to_text(file_type, file_bytes=None, content_type=None, lang="en", url=None, headers=None):
+# Audio file extensions Whisper accepts, by MIME type
+MIMETYPE_EXTENSIONS = {
+    "audio/mp4": "m4a",
+    "audio/x-m4a": "m4a",
+    "audio/m4a": "m4a",
+    "audio/mpeg": "mp3",
+    "audio/mp3": "mp3",
+    "audio/wav": "wav",
+    "audio/x-wav": "wav",
+    "audio/webm": "webm",
+    "audio/ogg": "ogg",
+    "audio/flac": "flac",
+    "video/mp4": "mp4",
+    "video/webm": "webm",
+}
+
+# Long recordings are transcribed in segments of this length, overlapping so no word is cut in half
+SEGMENT_MS = 120_000
+SEGMENT_OVERLAP_MS = 3_000
+
+# Pauses longer than this are shortened before transcription
+MIN_SILENCE_MS = 1_000
+
+# Maximum number of segments transcribed at once
+MAX_WORKERS = 4
+
+# Maximum number of words repeated at the boundary of two overlapping segments
+MAX_OVERLAP_WORDS = 20
+
+
+def extension_for_mimetype(mimetype, default="m4a"):
+    """
+    Pick the audio file extension matching a MIME type.
+
+    Args:
+        mimetype (str): MIME type of the audio file, e.g. 'audio/webm'
+        default (str, optional): Extension used for unknown MIME types
+
+    Returns:
+        str: File extension without the dot
+    """
+    return MIMETYPE_EXTENSIONS.get((mimetype or "").split(";")[0].strip(), default)
+
+
+def process_speech_bytes_to_text(file_type, file_bytes=None, content_type=None, lang="en", url=None, headers=None, file_id=None,
+                                 max_bytes=None, deadline=None):
     """
     Process speech to text, either from bytes or from a Slack URL.
 
+    The audio is downloaded in chunks, long pauses are trimmed, and long
+    recordings are split into overlapping segments that are transcribed
+    concurrently and stitched back together. Transcripts are cached by Slack
+    file ID and by content hash.
+
     Args:
         file_type (str): The audio file extension (e.g. 'mp3', 'wav')
         file_bytes (bytes, optional): Raw audio file bytes
@@ -20,27 +73,123 @@ def process_speech_bytes_to_text(file_type, file_bytes=None, content_type=None,
         lang (str, optional): Language code for transcription. Defaults to 'en'
         url (str, optional): URL to download audio file from Slack
         headers (dict, optional): Headers required for Slack API request
+        file_id (str, optional): Slack file ID, used to skip the download of files already transcribed
+        max_bytes (int, optional): Abort the download of files larger than this
+        deadline (float, optional): `time.monotonic()` time to give up at, stopping the download and transcription
 
     Returns:
         str: Transcribed text from the audio
 
     Raises:
+        TimeoutError: If the deadline passes first
         Exception: If Slack file download fails
         ValueError: If neither file_bytes nor url+headers are provided
     """
-    if url and headers:
-        response = requests.get(url, headers=headers)
-        if response.status_code != 200:
-            raise Exception(f"Failed to download audio file: {response.status_code}")
-        file_bytes = response.content
-    
-    if not file_bytes:
-        raise ValueError("Either file_bytes or url+headers must be provided")
-
-    transcript = client.audio.transcriptions.create(
+    cache = get_media_cache()
+    file_key = f"transcript:file:{file_id}:{lang}" if file_id else None
+    if file_key:
+        transcript = cache.get(file_key)
+        if transcript is not None:
+            return transcript
+
+    path = None
+    try:
+        if url and headers:
+            path, content_hash = download_slack_file(url, headers=headers, suffix="." + file_type, max_bytes=max_bytes,
+                                                     deadline=deadline)
+        elif file_bytes:
+            content_hash = hashlib.sha256(file_bytes).hexdigest()
+        else:
+            raise ValueError("Either file_bytes or url+headers must be provided")
+
+        content_key = f"transcript:sha256:{content_hash}:{lang}"
+        transcript = cache.get(content_key)
+        if transcript is None:
+            segments, duration_ms = _prepare_segments(path or file_bytes, file_type, content_type or "audio/mp4")
+            with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+                transcripts = list(executor.map(propagate(lambda segment: _transcribe(segment, lang, deadline)), segments))
+            transcript = _stitch(transcripts)
+            if duration_ms is not None:
+                metrics.OPENAI_COST.inc(duration_ms / 60_000 * metrics.WHISPER_MINUTE_PRICE, call_site="whisper", model="whisper-1")
+            cache.set(content_key, transcript)
+    finally:
+        if path:
+            os.unlink(path)
+
+    if file_key:
+        cache.set(file_key, transcript)
+    return transcript
+
+
+def _transcribe(segment, lang, deadline=None):
+    """Send one audio segment to Whisper, unless the deadline has passed."""
+    left = time_left(deadline)
+    kwargs = {} if left is None else {"timeout": left}
+    return create_transcription(
         model="whisper-1",
-        file=("temp." + file_type, file_bytes, content_type or "audio/mp4"),
+        file=segment,
         response_format="text",
         language=lang,
+        **kwargs,
     )
-    return transcript
+
+
+def _prepare_segments(source, file_type, content_type):
+    """
+    Trim long pauses and split the audio into overlapping segments.
+
+    Falls back to the original file in a single segment when the audio can't
+    be decoded, e.g. because pydub or ffmpeg isn't installed.
+
+    Args:
+        source: Path of the audio file, or its raw bytes
+        file_type (str): The audio file extension
+        content_type (str): MIME type of the audio file
+
+    Returns:
+        tuple: Segments as (filename, bytes, content type) tuples in order, and the
+            duration of audio they cover in milliseconds, or None if unknown
+    """
+    try:
+        from pydub import AudioSegment
+        from pydub.silence import split_on_silence
+
+        audio = AudioSegment.from_file(source if isinstance(source, str) else io.BytesIO(source), format=file_type)
+        if audio.dBFS != float("-inf"):
+            chunks = split_on_silence(audio, min_silence_len=MIN_SILENCE_MS, silence_thresh=audio.dBFS - 16, keep_silence=300)
+            if chunks:
+                audio = sum(chunks[1:], chunks[0])
+
+        step = SEGMENT_MS - SEGMENT_OVERLAP_MS
+        starts = range(0, max(len(audio) - SEGMENT_OVERLAP_MS, 1), step)
+        segments = []
+        for i, start in enumerate(starts):
+            buffer = io.BytesIO()
+            audio[start:start + SEGMENT_MS].export(buffer, format="mp3", bitrate="64k")
+            segments.append((f"segment_{i}.mp3", buffer.getvalue(), "audio/mpeg"))
+        return segments, len(audio) + SEGMENT_OVERLAP_MS * (len(segments) - 1)
+    except Exception as e:
+        logger.warning("Could not preprocess audio, transcribing it as is: %s", e)
+        if isinstance(source, str):
+            with open(source, "rb") as f:
+                source = f.read()
+        return [(f"audio.{file_type}", source, content_type)], None
+
+
+def _stitch(transcripts):
+    """Join segment transcripts, dropping the words repeated where segments overlap."""
+    words = []
+    for transcript in transcripts:
+        next_words = transcript.split()
+        overlap = 0
+        for size in range(min(MAX_OVERLAP_WORDS, len(words), len(next_words)), 0, -1):
+            if [_normalize(word) for word in words[-size:]] == [_normalize(word) for word in next_words[:size]]:
+                overlap = size
+                break
+        words += next_words[overlap:]
+    return " ".join(words)
+
+
+def _normalize(word):
+    """Lowercase a word and strip its punctuation, for comparing overlaps."""
+    return re.sub(r"[^\w']", "", word.lower())
@@ -0,0 +1,336 @@
+import gzip
+import json
+import os
+import shutil
+import struct
+import threading
+import time
+from typing import Dict, List, Optional
+
+from utils.paths import safe_name
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows, where the log is only safe within one process
+    fcntl = None
+
+# Each index entry is the end offset of a record in the log, as a little-endian unsigned 64-bit integer
+_OFFSET = struct.Struct("<Q")
+
+
+class TranscriptLog:
+    """
+    Append-only conversation transcripts, one JSON message per line.
+
+    Each participant of a meeting has a transcript at
+    `root/<meeting_id>/<participant>.jsonl`, next to an index of record
+    offsets (`.idx`). The index lets readers count messages, read a range or
+    the tail of a transcript without parsing it from the start. Transcripts
+    of old meetings are compressed by `compact`, losing their index.
+    """
+    def __init__(self, root: str):
+        """
+        Initialize the log, creating its directory if needed.
+
+        Args:
+            root: Directory holding the transcripts
+        """
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+
+    def append(self, meeting_id: str, participant: str, message: Dict) -> int:
+        """
+        Append a message to a participant's transcript.
+
+        Args:
+            meeting_id: Meeting the conversation belongs to
+            participant: Slack user ID of the participant
+            message: JSON-serializable message, e.g. {"role": ..., "content": ...}
+
+        Returns:
+            Position of the message in the transcript
+        """
+        line = (json.dumps(message, separators=(",", ":")) + "\n").encode("utf-8")
+        log_path, index_path = self._paths(meeting_id, participant)
+        with self._locked(log_path):
+            self._restore(log_path, index_path)
+            with open(log_path, "ab") as log, open(index_path, "ab") as index:
+                count = index.tell() // _OFFSET.size
+                end = self._end_offset(index_path, count)
+
+                # Drop the bytes of a write that was interrupted before its offset reached the index
+                if log.tell() != end:
+                    log.truncate(end)
+                    log.seek(end)
+
+                log.write(line)
+                log.flush()
+                index.write(_OFFSET.pack(end + len(line)))
+        return count
+
+    def count(self, meeting_id: str, participant: str) -> int:
+        """Return the number of messages in a participant's transcript."""
+        log_path, index_path = self._paths(meeting_id, participant)
+        if os.path.exists(index_path):
+            return os.path.getsize(index_path) // _OFFSET.size
+        if os.path.exists(log_path + ".gz"):
+            return len(self._read_compressed(log_path))
+        return 0
+
+    def read(self, meeting_id: str, participant: str, start: int = 0, stop: Optional[int] = None) -> List[Dict]:
+        """
+        Read a range of messages from a participant's transcript.
+
+        Args:
+            meeting_id: Meeting the conversation belongs to
+            participant: Slack user ID of the participant
+            start: Position of the first message
+            stop: Position after the last message, by default the end of the transcript
+
+        Returns:
+            The messages, oldest first
+        """
+        log_path, index_path = self._paths(meeting_id, participant)
+        if not os.path.exists(index_path):
+            if os.path.exists(log_path + ".gz"):
+                return self._read_compressed(log_path)[start:stop]
+            return []
+
+        count = os.path.getsize(index_path) // _OFFSET.size
+        stop = count if stop is None else min(stop, count)
+        if start >= stop:
+            return []
+
+        begin = self._end_offset(index_path, start)
+        end = self._end_offset(index_path, stop)
+        with open(log_path, "rb") as log:
+            log.seek(begin)
+            data = log.read(end - begin)
+        return [json.loads(line) for line in data.splitlines()]
+
+    def tail(self, meeting_id: str, participant: str, n: int) -> List[Dict]:
+        """Read the last `n` messages of a participant's transcript, oldest first."""
+        return self.read(meeting_id, participant, max(0, self.count(meeting_id, participant) - n))
+
+    def truncate(self, meeting_id: str, participant: str, length: int) -> None:
+        """
+        Drop the messages after the first `length` of a transcript, e.g. ones a crashed step never committed.
+
+        Args:
+            meeting_id: Meeting the conversation belongs to
+            participant: Slack user ID of the participant
+            length: Number of messages to keep
+        """
+        log_path, index_path = self._paths(meeting_id, participant)
+        with self._locked(log_path):
+            self._restore(log_path, index_path)
+            if not os.path.exists(index_path) or os.path.getsize(index_path) <= length * _OFFSET.size:
+                return
+            end = self._end_offset(index_path, length)
+            with open(log_path, "r+b") as log:
+                log.truncate(end)
+            with open(index_path, "r+b") as index:
+                index.truncate(length * _OFFSET.size)
+
+    def compact(self, compress_after: float, max_age: Optional[float] = None) -> int:
+        """
+        Compress the transcripts of meetings idle for `compress_after` seconds, and delete those idle for `max_age`.
+
+        Returns:
+            Number of meetings compressed or deleted
+        """
+        now = time.time()
+        compacted = 0
+        for meeting_dir in os.scandir(self.root):
+            if not meeting_dir.is_dir():
+                continue
+            files = list(os.scandir(meeting_dir.path))
+            last_write = max((entry.stat().st_mtime for entry in files), default=0)
+            if max_age is not None and now - last_write > max_age:
+                shutil.rmtree(meeting_dir.path, ignore_errors=True)
+                compacted += 1
+            elif now - last_write > compress_after and any(entry.name.endswith(".jsonl") for entry in files):
+                for entry in files:
+                    if entry.name.endswith(".jsonl"):
+                        self._compress(entry.path)
+                compacted += 1
+        return compacted
+
+    def _compress(self, log_path: str) -> None:
+        """Replace a transcript and its index with a gzipped copy."""
+        with self._locked(log_path):
+            with open(log_path, "rb") as log, gzip.open(log_path + ".gz.tmp", "wb") as compressed:
+                end = self._end_offset(log_path[:-len(".jsonl")] + ".idx", None)
+                compressed.write(log.read(end))
+            os.replace(log_path + ".gz.tmp", log_path + ".gz")
+            os.remove(log_path)
+            os.remove(log_path[:-len(".jsonl")] + ".idx")
+
+    def _restore(self, log_path: str, index_path: str) -> None:
+        """Decompress a compacted transcript and rebuild its index, so it can be appended to."""
+        if os.path.exists(index_path) or not os.path.exists(log_path + ".gz"):
+            return
+        with gzip.open(log_path + ".gz", "rb") as compressed:
+            lines = compressed.read().splitlines(keepends=True)
+        end = 0
+        with open(log_path, "wb") as log, open(index_path, "wb") as index:
+            for line in lines:
+                log.write(line)
+                end += len(line)
+                index.write(_OFFSET.pack(end))
+        os.remove(log_path + ".gz")
+
+    def _read_compressed(self, log_path: str) -> List[Dict]:
+        """Read every message of a compacted transcript."""
+        with gzip.open(log_path + ".gz", "rb") as compressed:
+            return [json.loads(line) for line in compressed.read().splitlines()]
+
+    @staticmethod
+    def _end_offset(index_path: str, count: Optional[int]) -> int:
+        """Offset where the first `count` records end, all records if None."""
+        if count is None:
+            count = os.path.getsize(index_path) // _OFFSET.size
+        if count == 0:
+            return 0
+        with open(index_path, "rb") as index:
+            index.seek((count - 1) * _OFFSET.size)
+            data = index.read(_OFFSET.size)
+        return _OFFSET.unpack(data)[0] if len(data) == _OFFSET.size else 0
+
+    def _paths(self, meeting_id: str, participant: str):
+        """Paths of a transcript and its index."""
+        base = os.path.join(self.root, safe_name(meeting_id), safe_name(participant) or "_")
+        return base + ".jsonl", base + ".idx"
+
+    def _locked(self, path: str):
+        """Lock a transcript against writers in this and other processes, creating its directory if needed."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._locks_lock:
+            lock = self._locks.setdefault(path, threading.Lock())
+        return _FileLock(lock, path + ".lock")
+
+
+class _FileLock:
+    """Holds a thread lock and, where supported, an exclusive lock on a file."""
+    def __init__(self, lock: threading.Lock, path: str):
+        self.lock = lock
+        self.path = path
+        self.file = None
+
+    def __enter__(self):
+        self.lock.acquire()
+        if fcntl is not None:
+            self.file = open(self.path, "a")
+            fcntl.flock(self.file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        self.lock.release()
+
+
+class TranscriptHistory:
+    """
+    A bot's conversation history, backed by its participant's transcript.
+
+    Messages are appended to the transcript as they are added. The history
+    only remembers its range in the transcript between messages, and loads
+    the messages on first access. Without a meeting and participant, the
+    messages are kept in memory and serialized with the history instead.
+    """
+    def __init__(self, meeting_id: Optional[str] = None, participant: Optional[str] = None):
+        """
+        Initialize an empty history.
+
+        Args:
+            meeting_id: Meeting the conversation belongs to
+            participant: Slack user ID of the participant the bot is talking to
+        """
+        self.meeting_id = meeting_id
+        self.participant = participant
+        self.start = 0
+        self.end = 0
+        self._messages: Optional[List[Dict]] = []
+        if self.logged:
+            self.start = self.end = get_transcript_log().count(meeting_id, participant)
+
+    @property
+    def logged(self) -> bool:
+        """Whether the messages are written to the transcript log."""
+        return bool(self.meeting_id and self.participant)
+
+    @property
+    def messages(self) -> List[Dict]:
+        """The messages of the conversation, in OpenAI chat format. Add messages with `append`."""
+        if self._messages is None:
+            self._messages = get_transcript_log().read(self.meeting_id, self.participant, self.start, self.end)
+        return self._messages
+
+    def append(self, message: Dict) -> None:
+        """Add a message to the conversation."""
+        # Load the messages before the new one is in the transcript, or loading would read it too
+        messages = self.messages
+        if self.logged:
+            log = get_transcript_log()
+            if log.count(self.meeting_id, self.participant) != self.end:
+                # Messages past our end were written by a step that never completed
+                log.truncate(self.meeting_id, self.participant, self.end)
+            log.append(self.meeting_id, self.participant, message)
+            self.end += 1
+        messages.append(message)
+
+    def reset(self, messages: List[Dict]) -> None:
+        """Start the conversation over with `messages`."""
+        if self.logged:
+            self.start = self.end = get_transcript_log().count(self.meeting_id, self.participant)
+        self._messages = []
+        for message in messages:
+            self.append(message)
+
+    def to_dict(self) -> Dict:
+        """
+        Serialize the history.
+
+        Returns:
+            A JSON-serializable dict, see `from_dict`
+        """
+        if self.logged:
+            return {"meeting_id": self.meeting_id, "participant": self.participant, "start": self.start, "end": self.end}
+        return {"messages": self.messages}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "TranscriptHistory":
+        """
+        Restore a history from the output of `to_dict`, without reading the transcript yet.
+
+        Args:
+            data: Serialized history
+        """
+        history = cls()
+        if "messages" in data:
+            history._messages = data["messages"]
+        else:
+            history.meeting_id = data["meeting_id"]
+            history.participant = data["participant"]
+            history.start = data["start"]
+            history.end = data["end"]
+            history._messages = None
+        return history
+
+
+_log = None
+_log_lock = threading.Lock()
+
+
+def get_transcript_log() -> TranscriptLog:
+    """Return the process-wide transcript log, rooted at CONVERGE_TRANSCRIPT_DIR."""
+    global _log
+    with _log_lock:
+        if _log is None:
+            _log = TranscriptLog(os.getenv("CONVERGE_TRANSCRIPT_DIR", "transcripts"))
+        return _log